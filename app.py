@@ -1,18 +1,16 @@
 import streamlit as st
+import time
+from concurrent.futures import as_completed
 from datetime import datetime, timedelta
 import pandas as pd
 
 # --- 모듈 임포트 ---
 from auth import firebase_auth
-from data_fetcher import (
-    fetch_dart_financial_data,
-    fetch_stock_price_data,
-    fetch_company_info,
-    get_krx_stock_list,
-)
-from financial_analysis import calculate_financial_ratios
-from technical_analysis import calculate_technical_indicators
-from interpret import interpret_financials, interpret_technical_signals # interpret_technicals -> interpret_technical_signals
+from symbol_master import get_symbol_master
+from pipeline import default_report_year, run_watchlist, start_analysis
+from interpret import interpret_financials, build_signal_timeline, describe_signal_state
+from backtest import STRATEGIES, run_backtest
+from config import BACKTEST_COST_BPS, WATCHLIST_MAX_SYMBOLS
 from visualization import plot_financial_kpis, plot_candlestick_with_indicators # plot_financial_summary -> plot_financial_kpis
 from db_handler import save_user_search, get_user_history, get_user_setting, save_user_setting
 from utils import get_logger
@@ -24,12 +22,8 @@ logger = get_logger(__name__)
 st.set_page_config(page_title="국내 주식 분석 MVP", layout="wide")
 
 # --- 세션 상태 초기화 ---
-if 'krx_stocks_df' not in st.session_state:
-    st.session_state.krx_stocks_df = get_krx_stock_list()
-    if st.session_state.krx_stocks_df.empty:
-        logger.warning("KRX stock list is empty after loading!")
-    else:
-        logger.info(f"Loaded KRX stock list. Total: {len(st.session_state.krx_stocks_df)}")
+# KRX 종목 목록은 세션마다 복사하지 않고 프로세스 공용 종목 마스터를 참조합니다.
+symbol_master = get_symbol_master()
 
 if 'current_stock_code' not in st.session_state:
     user_id_for_init = firebase_auth.get_current_user_id()
@@ -89,15 +83,44 @@ start_date = end_date - timedelta(days=days_to_subtract)
 
 analyze_button = st.sidebar.button("📊 분석 실행", use_container_width=True, key="analyze_button_unified", type="primary")
 
+# --- 관심 종목 ---
+st.sidebar.markdown("---")
+st.sidebar.header("⭐ 관심 종목")
+saved_favorites = get_user_setting(user_id, "favorite_stocks", [])
+if isinstance(saved_favorites, str):  # 예전 형식: 쉼표로 구분한 문자열
+    saved_favorites = [code.strip() for code in saved_favorites.split(",") if code.strip()]
+# 종목 목록에 없는 코드는 선택지에 보이지 않을 뿐 저장 값에서는 지우지 않습니다.
+hidden_favorites = [code for code in saved_favorites if len(symbol_master) > 0 and code not in symbol_master]
+shown_favorites = [code for code in saved_favorites if code not in hidden_favorites]
+if len(shown_favorites) > WATCHLIST_MAX_SYMBOLS:
+    st.sidebar.warning(f"관심 종목은 최대 {WATCHLIST_MAX_SYMBOLS}개까지 분석합니다. 앞의 {WATCHLIST_MAX_SYMBOLS}개만 선택됩니다.")
+    shown_favorites = shown_favorites[:WATCHLIST_MAX_SYMBOLS]
+
+
+def save_favorite_stocks():
+    """사용자가 관심 종목 선택을 바꿨을 때만 저장합니다. (페이지 로드만으로는 저장하지 않음)"""
+    save_user_setting(user_id, "favorite_stocks", st.session_state.favorite_stocks_multiselect + hidden_favorites)
+
+
+favorite_stocks = st.sidebar.multiselect(
+    "관심 종목 선택",
+    options=list(symbol_master.names) or saved_favorites,
+    default=shown_favorites,
+    format_func=lambda code: f"{symbol_master.name(code, code)} ({code})",
+    max_selections=WATCHLIST_MAX_SYMBOLS,
+    key="favorite_stocks_multiselect",
+    on_change=save_favorite_stocks
+)
+watchlist_button = st.sidebar.button("⭐ 관심 종목 대시보드", use_container_width=True, key="watchlist_button",
+                                     disabled=not favorite_stocks)
+
 # --- 메인 화면 ---
 final_stock_code_to_analyze = st.session_state.current_stock_code
 
 try:
-    all_stocks = st.session_state.krx_stocks_df
-    if not all_stocks.empty:
-        current_stock_name_series = all_stocks[all_stocks['Symbol'] == final_stock_code_to_analyze]['Name']
-        if not current_stock_name_series.empty:
-            current_stock_name = current_stock_name_series.iloc[0]
+    if len(symbol_master) > 0:
+        current_stock_name = symbol_master.name(final_stock_code_to_analyze)
+        if current_stock_name is not None:
             st.title(f"📈 {current_stock_name} ({final_stock_code_to_analyze})")
         else:
             st.title(f"📈 {final_stock_code_to_analyze}") # 이름 못 찾으면 코드로 표시
@@ -113,11 +136,116 @@ except Exception as e:
         st.warning(f"{final_stock_code_to_analyze} 종목 정보를 표시하는데 문제가 발생했습니다.")
 
 
+def render_financial_tab(stage_future, company_name):
+    """재무 분석 단계 결과를 그립니다."""
+    try:
+        result = stage_future.result().value
+        df, msg, financial_ratios = result['df'], result['msg'], result['ratios']
+
+        if not df.empty:
+            if financial_ratios and "error" not in financial_ratios:
+                col1_kpi, col2_kpi, col3_kpi = st.columns(3)
+                roe_fig, debt_fig, sales_fig = plot_financial_kpis(financial_ratios)
+                with col1_kpi:
+                    st.plotly_chart(roe_fig, use_container_width=True)
+                with col2_kpi:
+                    st.plotly_chart(debt_fig, use_container_width=True)
+                with col3_kpi:
+                    st.plotly_chart(sales_fig, use_container_width=True)
+
+                st.info(interpret_financials(financial_ratios, company_name))
+            else:
+                st.error("재무 지표를 계산하는데 실패했습니다.")
+        else:
+            st.warning(msg)
+    except Exception as e:
+        st.error(f"기업 분석 중 오류 발생: {e}")
+        logger.error(f"Error in financial analysis pipeline: {e}", exc_info=True)
+
+
+def render_technical_tab(stage_future, company_name):
+    """주가/기술적 분석 단계 결과를 그립니다."""
+    try:
+        result = stage_future.result().value
+        price_df_with_indicators, fib_levels = result['indicators_df'], result['fib_levels']
+
+        if price_df_with_indicators is not None:
+            st.plotly_chart(plot_candlestick_with_indicators(price_df_with_indicators, company_name, show_signals=True),
+                            use_container_width=True)
+
+            st.markdown("---")
+            st.subheader("🤖 AI 기술적 신호 분석")
+
+            if not price_df_with_indicators.empty:
+                # 전체 기간의 신호 상태/이벤트를 한 번에 계산하고, 현재 해석은 마지막 행에서 만듭니다.
+                signal_states, signal_events = build_signal_timeline(price_df_with_indicators, fib_levels)
+                signals = describe_signal_state(signal_states.iloc[-1])
+                
+                if signals:
+                    for signal in signals:
+                        st.markdown(f"&nbsp;&nbsp;{signal}") # Markdown으로 신호 표시
+                else:
+                    st.info("현재 명확하게 식별되는 기술적 신호가 없습니다.")
+
+                if not signal_events.empty:
+                    with st.expander("🕒 최근 신호 이벤트"):
+                        recent_events = signal_events.tail(10).iloc[::-1]
+                        st.dataframe(
+                            recent_events.assign(Date=pd.to_datetime(recent_events['Date']).dt.strftime('%Y-%m-%d'))
+                            [['Date', 'label', 'Close']].rename(columns={'Date': '날짜', 'label': '신호', 'Close': '종가'}),
+                            hide_index=True, use_container_width=True
+                        )
+
+                with st.expander("📈 신호 백테스트 (이 기간에 신호대로 매매했다면)"):
+                    # 전략마다 같은 지표 DataFrame을 재사용하므로 추가 데이터 수집 없이 바로 계산됩니다.
+                    backtests = {name: run_backtest(price_df_with_indicators, name, fib_levels) for name in STRATEGIES}
+                    summary = pd.DataFrame({
+                        STRATEGIES[name][0]: {
+                            '누적 수익률(%)': result.metrics['total_return'] * 100,
+                            '보유(Buy&Hold) 수익률(%)': result.metrics['buy_hold_return'] * 100,
+                            '최대 낙폭(%)': result.metrics['max_drawdown'] * 100,
+                            '거래 횟수': result.metrics['trades'],
+                            '적중률(%)': result.metrics['hit_rate'] * 100,
+                            '평균 보유일': result.metrics['avg_holding_bars'],
+                        }
+                        for name, result in backtests.items()
+                    }).T
+                    st.dataframe(summary.round(2), use_container_width=True)
+                    equity_curves = pd.DataFrame(
+                        {STRATEGIES[name][0]: result.equity['strategy'].to_numpy() for name, result in backtests.items()},
+                        index=pd.to_datetime(price_df_with_indicators['Date'])
+                    ).assign(**{'보유(Buy&Hold)': next(iter(backtests.values())).equity['buy_hold'].to_numpy()})
+                    st.line_chart(equity_curves)
+                    st.caption(f"신호 당일 종가 체결, 매수/매도 1회당 거래비용 {BACKTEST_COST_BPS}bp 가정. "
+                               "과거 성과가 미래 수익을 보장하지 않습니다.")
+            else:
+                st.warning("기술적 신호를 생성하기 위한 데이터가 충분하지 않습니다.")
+            
+            st.caption("*주의: 본 분석은 기술적 지표에 기반한 참고 자료이며, 투자 추천이 아닙니다. 모든 투자 결정의 책임은 본인에게 있습니다.*")
+        else:
+            st.warning("주가 데이터를 가져올 수 없습니다.")
+    except Exception as e:
+        st.error(f"기술적 분석 중 오류 발생: {e}")
+        logger.error(f"Error in technical analysis pipeline: {e}", exc_info=True)
+
+
 if analyze_button and final_stock_code_to_analyze:
     logger.info(f"Analysis started for stock code: {final_stock_code_to_analyze} by user: {user_id}")
+    analysis_started = time.perf_counter()
+
+    # 기업 정보, DART 재무, 주가 수집을 동시에 시작합니다.
+    current_year = default_report_year()
+    stage_futures = start_analysis(
+        final_stock_code_to_analyze, current_year,
+        start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+    )
 
     with st.spinner("기업 정보 조회 중..."):
-        company_info = fetch_company_info(final_stock_code_to_analyze)
+        try:
+            company_info = stage_futures['company'].result().value
+        except Exception as e:
+            logger.error(f"Error fetching company info: {e}", exc_info=True)
+            company_info = {}
         company_name = company_info.get('corp_name', f"종목({final_stock_code_to_analyze})")
 
     st.header(f"분석 결과: {company_name} ({final_stock_code_to_analyze})")
@@ -127,67 +255,52 @@ if analyze_button and final_stock_code_to_analyze:
 
     with tab1:
         st.subheader("재무 분석 및 해석")
-        try:
-            with st.spinner("DART 재무 데이터 수집 중..."):
-                now = datetime.now()
-                current_year = str(now.year - 1 if now.month >= 5 else now.year - 2)
-                df, msg = fetch_dart_financial_data(
-                    final_stock_code_to_analyze, year=current_year, report_code="11011"
-                )
-            
-            if not df.empty:
-                financial_ratios = calculate_financial_ratios(df)
-                if financial_ratios and "error" not in financial_ratios:
-                    col1_kpi, col2_kpi, col3_kpi = st.columns(3)
-                    roe_fig, debt_fig, sales_fig = plot_financial_kpis(financial_ratios)
-                    with col1_kpi:
-                        st.plotly_chart(roe_fig, use_container_width=True)
-                    with col2_kpi:
-                        st.plotly_chart(debt_fig, use_container_width=True)
-                    with col3_kpi:
-                        st.plotly_chart(sales_fig, use_container_width=True)
-
-                    st.info(interpret_financials(financial_ratios, company_name))
-                else:
-                    st.error("재무 지표를 계산하는데 실패했습니다.")
-            else:
-                st.warning(msg)
-        except Exception as e:
-            st.error(f"기업 분석 중 오류 발생: {e}")
-            logger.error(f"Error in financial analysis pipeline: {e}", exc_info=True)
-
+        financial_placeholder = st.empty()
+        financial_placeholder.info("DART 재무 데이터 수집 중...")
     with tab2:
         st.subheader("차트 분석 및 기술적 신호")
-        try:
-            with st.spinner(f"주가 데이터 수집 및 분석 중..."):
-                price_data_df = fetch_stock_price_data(final_stock_code_to_analyze, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
-            
-            if price_data_df is not None and not price_data_df.empty:
-                price_df_with_indicators, fib_levels = calculate_technical_indicators(price_data_df.copy())
-                
-                st.plotly_chart(plot_candlestick_with_indicators(price_df_with_indicators, company_name), use_container_width=True)
-
-                st.markdown("---")
-                st.subheader("🤖 AI 기술적 신호 분석")
-
-                if not price_df_with_indicators.empty:
-                    latest_row = price_df_with_indicators.iloc[-1]
-                    signals = interpret_technical_signals(latest_row, price_df_with_indicators, fib_levels)
-                    
-                    if signals:
-                        for signal in signals:
-                            st.markdown(f"&nbsp;&nbsp;{signal}") # Markdown으로 신호 표시
-                    else:
-                        st.info("현재 명확하게 식별되는 기술적 신호가 없습니다.")
-                else:
-                    st.warning("기술적 신호를 생성하기 위한 데이터가 충분하지 않습니다.")
-                
-                st.caption("*주의: 본 분석은 기술적 지표에 기반한 참고 자료이며, 투자 추천이 아닙니다. 모든 투자 결정의 책임은 본인에게 있습니다.*")
-            else:
-                st.warning("주가 데이터를 가져올 수 없습니다.")
-        except Exception as e:
-            st.error(f"기술적 분석 중 오류 발생: {e}")
-            logger.error(f"Error in technical analysis pipeline: {e}", exc_info=True)
+        technical_placeholder = st.empty()
+        technical_placeholder.info("주가 데이터 수집 및 분석 중...")
+
+    # 먼저 끝난 단계부터 해당 탭에 그립니다.
+    tab_renderers = {
+        stage_futures['financial']: (financial_placeholder, render_financial_tab),
+        stage_futures['technical']: (technical_placeholder, render_technical_tab),
+    }
+    for stage_future in as_completed(tab_renderers):
+        placeholder, renderer = tab_renderers[stage_future]
+        with placeholder.container():
+            renderer(stage_future, company_name)
+
+    stage_timings = {
+        name: future.result().seconds for name, future in stage_futures.items() if future.exception() is None
+    }
+    total_seconds = time.perf_counter() - analysis_started
+    logger.info(f"Analysis timings for {final_stock_code_to_analyze}: {stage_timings} (total {total_seconds:.3f}s)")
+    with st.expander("⏱️ 단계별 소요 시간"):
+        st.caption(" · ".join(f"{name}: {seconds:.2f}s" for name, seconds in stage_timings.items())
+                   + f" · 전체: {total_seconds:.2f}s")
+
+elif watchlist_button and favorite_stocks:
+    st.header(f"⭐ 관심 종목 대시보드 ({len(favorite_stocks)}개)")
+    watchlist_started = time.perf_counter()
+    progress = st.progress(0.0, text="관심 종목 분석 중...")
+    table_placeholder = st.empty()
+    rows = []
+    # 끝나는 종목부터 표에 추가합니다. (동시 실행 수는 세션당 상한으로 제한)
+    for row in run_watchlist(favorite_stocks, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')):
+        row['종목명'] = symbol_master.name(row['종목코드'], row['종목코드'])
+        rows.append(row)
+        progress.progress(len(rows) / len(favorite_stocks), text=f"관심 종목 분석 중... ({len(rows)}/{len(favorite_stocks)})")
+        table_df = pd.DataFrame(rows).set_index('종목코드')
+        table_placeholder.dataframe(
+            table_df[['종목명', '종가', '등락률(%)', 'RSI', 'MACD', '신호', '오류']].sort_index(),
+            use_container_width=True
+        )
+    progress.empty()
+    logger.info(f"Watchlist of {len(favorite_stocks)} stocks analysed in {time.perf_counter() - watchlist_started:.3f}s")
+    st.caption(f"*{len(rows)}개 종목 분석 완료 ({time.perf_counter() - watchlist_started:.2f}s). "
+               "종목을 자세히 보려면 검색 후 '분석 실행'을 누르세요.*")
 
 elif analyze_button and not final_stock_code_to_analyze:
     st.error("먼저 종목을 선택해주세요.")
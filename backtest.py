@@ -0,0 +1,281 @@
+"""
+기술적 신호 백테스트.
+
+interpret의 신호 규칙(RSI 과매수/과매도 진입, MACD 크로스, 볼린저 밴드 복귀/돌파, VWAP 돌파)과 이동평균 교차를
+진입/청산 마스크로 바꾸고, 자산 곡선·적중률·낙폭·진입 후 보유 수익률을 NumPy 배열 연산으로 계산합니다.
+(봉 단위 파이썬 루프 없음) 신호는 당일 종가에 판정하고 당일 종가에 체결한 것으로 보며, 수익은 다음 봉부터 반영합니다.
+
+파라미터 탐색은 price_store에 저장된 주가만 사용합니다. 예:
+    python backtest.py --strategy rsi --symbols 005930 000660 --days 730
+"""
+import argparse
+import itertools
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+import config
+from interpret import (RSI_OVERBOUGHT, RSI_OVERSOLD, SIGNAL_INDICATOR_COLUMNS, build_signal_states,
+                       signal_event_mask)
+from technical_analysis import IndicatorGraph, calculate_technical_indicators
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+TRADING_DAYS_PER_YEAR = 252
+
+# 전략 이름 -> (표시 이름, 진입 이벤트, 청산 이벤트). 이벤트 코드는 interpret.SIGNAL_EVENT_RULES와 같습니다.
+STRATEGIES = {
+    'rsi': ("RSI 과매도 매수 / 과매수 매도", ('rsi_oversold',), ('rsi_overbought',)),
+    'macd': ("MACD 골든크로스 매수 / 데드크로스 매도", ('macd_cross_up',), ('macd_cross_down',)),
+    'bollinger': ("볼린저 하단 복귀 매수 / 상단 돌파 매도", ('bb_reentry_from_below',), ('bb_break_up',)),
+    'vwap': ("VWAP 상향 돌파 매수 / 하향 돌파 매도", ('vwap_cross_up',), ('vwap_cross_down',)),
+    'sma_cross': ("이동평균 골든크로스 매수 / 데드크로스 매도", (), ()),
+}
+
+# 전략별 기본 파라미터와 탐색 격자
+DEFAULT_PARAMS = {
+    'rsi': {'oversold': RSI_OVERSOLD, 'overbought': RSI_OVERBOUGHT},
+    'sma_cross': {'fast': 5, 'slow': 20},
+}
+DEFAULT_GRIDS = {
+    'rsi': {'oversold': [20, 25, 30, 35], 'overbought': [65, 70, 75, 80]},
+    'sma_cross': {'fast': [5, 10, 20], 'slow': [20, 60, 120]},
+}
+
+
+class BacktestResult(NamedTuple):
+    metrics: Dict[str, float]
+    equity: pd.DataFrame
+    trades: pd.DataFrame
+
+
+def _crossovers(fast: np.ndarray, slow: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(상향 교차, 하향 교차) bool 배열. 전일이나 당일 값이 NaN이면 교차로 보지 않습니다."""
+    above = fast > slow
+    valid = ~(np.isnan(fast) | np.isnan(slow))
+    prev_above, prev_valid = np.roll(above, 1), np.roll(valid, 1)
+    prev_valid[:1] = False
+    both = valid & prev_valid
+    return both & above & ~prev_above, both & ~above & prev_above
+
+
+def signal_masks(df: pd.DataFrame, strategy: str, fib_levels: Optional[Dict[str, float]] = None,
+                 graph: Optional[IndicatorGraph] = None, **params) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    지표 DataFrame(calculate_technical_indicators 결과)에서 전략의 (진입, 청산) bool 배열을 만듭니다.
+    df에 없는 이동평균은 graph(없으면 종가로 새로 만듦)에서 계산하므로, 같은 graph를 넘기면 조합 간에 재사용됩니다.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"알 수 없는 전략: {strategy}")
+    params = {**DEFAULT_PARAMS.get(strategy, {}), **params}
+
+    if strategy == 'sma_cross':
+        graph = graph or IndicatorGraph(df['Close'].astype(float))
+        fast, slow = (df[f'SMA_{w}'] if f'SMA_{w}' in df.columns else graph.get(('sma', w))
+                      for w in (params['fast'], params['slow']))
+        return _crossovers(fast.to_numpy(dtype=float), slow.to_numpy(dtype=float))
+
+    states = build_signal_states(df, fib_levels,
+                                 rsi_overbought=params.get('overbought', RSI_OVERBOUGHT),
+                                 rsi_oversold=params.get('oversold', RSI_OVERSOLD))
+    _, entry_events, exit_events = STRATEGIES[strategy]
+    entry = np.logical_or.reduce([signal_event_mask(states, event) for event in entry_events])
+    exit_ = np.logical_or.reduce([signal_event_mask(states, event) for event in exit_events])
+    return entry, exit_
+
+
+def positions_from_masks(entry: np.ndarray, exit_: np.ndarray) -> np.ndarray:
+    """
+    진입/청산 마스크를 봉별 보유 상태(1/0)로 바꿉니다. 마지막 신호를 앞으로 채우는 방식이며,
+    같은 봉에 둘 다 있으면 청산이 우선합니다.
+    """
+    signal = np.where(exit_, 0.0, np.where(entry, 1.0, np.nan))
+    has_signal = ~np.isnan(signal)
+    last = np.maximum.accumulate(np.where(has_signal, np.arange(len(signal)), -1))
+    return np.where(last >= 0, signal[np.clip(last, 0, None)], 0.0)
+
+
+def forward_returns(close: np.ndarray, at: np.ndarray, horizon: int) -> np.ndarray:
+    """at 위치에서 horizon 봉 뒤까지의 수익률 (끝까지 horizon 봉이 남지 않은 위치는 제외)"""
+    at = at[at + horizon < len(close)]
+    return close[at + horizon] / close[at] - 1
+
+
+def run_backtest_masks(close: np.ndarray, entry: np.ndarray, exit_: np.ndarray,
+                       cost_bps: float = config.BACKTEST_COST_BPS,
+                       horizons: Sequence[int] = config.BACKTEST_HORIZONS) -> Tuple[Dict[str, float], Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    """
+    종가 배열과 진입/청산 마스크로 백테스트합니다.
+    반환: (지표 딕셔너리, 봉별 배열 {'position', 'strategy', 'buy_hold', 'drawdown'}, 거래 배열 {'entry', 'exit', 'return', 'open'})
+    """
+    close = np.asarray(close, dtype=float)
+    n = len(close)
+    cost = cost_bps / 10000
+    position = positions_from_masks(entry, exit_)
+    # 종가가 없는 봉(거래정지 등)은 전일 종가로 채워 수익률 0으로 취급합니다.
+    valid_idx = np.maximum.accumulate(np.where(~np.isnan(close), np.arange(n), 0))
+    close = close[valid_idx]
+
+    returns = np.zeros(n)
+    returns[1:] = close[1:] / close[:-1] - 1
+    returns = np.nan_to_num(returns, nan=0.0, posinf=0.0, neginf=0.0)
+    held = np.concatenate(([0.0], position[:-1]))
+    turnover = np.abs(np.diff(position, prepend=0.0))
+    strategy_returns = (1 + held * returns) * (1 - turnover * cost) - 1
+
+    equity = np.cumprod(1 + strategy_returns)
+    buy_hold = np.cumprod(1 + returns)
+    drawdown = equity / np.maximum.accumulate(equity) - 1
+
+    # 거래: 보유 상태가 0->1로 바뀐 봉에서 진입, 1->0에서 청산. 끝까지 보유 중이면 마지막 봉으로 평가합니다.
+    changes = np.diff(position, prepend=0.0)
+    entries, exits = np.flatnonzero(changes > 0), np.flatnonzero(changes < 0)
+    is_open = np.zeros(len(entries), dtype=bool)
+    if len(exits) < len(entries):
+        exits = np.append(exits, n - 1)
+        is_open[-1] = True
+    trade_returns = close[exits] / close[entries] * (1 - cost) ** 2 - 1 if len(entries) else np.array([])
+    holding = exits - entries
+
+    daily_std = strategy_returns[1:].std() if n > 1 else 0.0
+    years = max(n - 1, 1) / TRADING_DAYS_PER_YEAR
+    metrics = {key: float(value) for key, value in {
+        'total_return': equity[-1] - 1 if n else 0.0,
+        'buy_hold_return': buy_hold[-1] - 1 if n else 0.0,
+        'cagr': equity[-1] ** (1 / years) - 1 if n and equity[-1] > 0 else -1.0,
+        'max_drawdown': drawdown.min() if n else 0.0,
+        'sharpe': strategy_returns[1:].mean() / daily_std * np.sqrt(TRADING_DAYS_PER_YEAR) if daily_std > 0 else 0.0,
+        'exposure': held.mean() if n else 0.0,
+        'hit_rate': (trade_returns > 0).mean() if len(trade_returns) else np.nan,
+        'avg_trade_return': trade_returns.mean() if len(trade_returns) else np.nan,
+        'avg_holding_bars': holding.mean() if len(holding) else np.nan,
+    }.items()}
+    metrics['trades'] = int(len(entries))
+    # 청산 규칙과 무관하게, 진입 신호 후 N봉 보유했을 때의 수익률 (신호 자체의 예측력)
+    signal_at = np.flatnonzero(entry)
+    for horizon in horizons:
+        fwd = forward_returns(close, signal_at, horizon)
+        metrics[f'fwd_{horizon}d_mean'] = float(fwd.mean()) if len(fwd) else np.nan
+        metrics[f'fwd_{horizon}d_hit_rate'] = float((fwd > 0).mean()) if len(fwd) else np.nan
+
+    curves = {'position': position, 'strategy': equity, 'buy_hold': buy_hold, 'drawdown': drawdown}
+    trades = {'entry': entries, 'exit': exits, 'return': trade_returns, 'open': is_open}
+    return metrics, curves, trades
+
+
+def run_backtest(indicators_df: pd.DataFrame, strategy: str, fib_levels: Optional[Dict[str, float]] = None,
+                 cost_bps: float = config.BACKTEST_COST_BPS, **params) -> BacktestResult:
+    """지표 DataFrame 한 종목에 대해 전략을 백테스트합니다. (자산 곡선/거래 목록은 Date 컬럼 기준)"""
+    close = indicators_df['Close'].to_numpy(dtype=float)
+    entry, exit_ = signal_masks(indicators_df, strategy, fib_levels, **params)
+    metrics, curves, trades = run_backtest_masks(close, entry, exit_, cost_bps)
+
+    dates = (indicators_df['Date'] if 'Date' in indicators_df.columns else indicators_df.index.to_series()).to_numpy()
+    equity = pd.DataFrame({'Date': dates, **curves})
+    trade_df = pd.DataFrame({
+        'entry_date': dates[trades['entry']], 'exit_date': dates[trades['exit']],
+        'entry_price': close[trades['entry']], 'exit_price': close[trades['exit']],
+        'holding_bars': trades['exit'] - trades['entry'], 'return': trades['return'], 'open': trades['open'],
+    })
+    return BacktestResult(metrics, equity, trade_df)
+
+
+def parameter_grid(grid: Mapping[str, Iterable]) -> List[Dict[str, float]]:
+    """{'oversold': [20, 30], 'overbought': [70, 80]} -> 모든 조합의 파라미터 딕셔너리 목록 (fast >= slow 조합은 제외)"""
+    keys = list(grid)
+    combos = [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+    return [combo for combo in combos
+            if combo.get('fast', 0) < combo.get('slow', float('inf'))
+            and combo.get('oversold', 0) < combo.get('overbought', float('inf'))]
+
+
+def _backtest_symbol(symbol: str, price_df: pd.DataFrame, strategy: str, combos: List[Dict[str, float]],
+                     cost_bps: float) -> List[Dict]:
+    """한 종목의 지표를 한 번만 계산하고 모든 파라미터 조합을 백테스트합니다. (워커 프로세스에서 실행)"""
+    # 이동평균 교차는 조합마다 필요한 윈도우만 graph에서 계산(조합 간 공유)하고, 나머지 전략은 신호 지표만 계산합니다.
+    columns = () if strategy == 'sma_cross' else SIGNAL_INDICATOR_COLUMNS
+    indicators_df, fib_levels = calculate_technical_indicators(price_df, columns=columns)
+    close = indicators_df['Close'].to_numpy(dtype=float)
+    graph = IndicatorGraph(indicators_df['Close'].astype(float))
+    rows = []
+    for params in combos:
+        entry, exit_ = signal_masks(indicators_df, strategy, fib_levels, graph, **params)
+        metrics, _, _ = run_backtest_masks(close, entry, exit_, cost_bps)
+        rows.append({'symbol': symbol, **params, **metrics})
+    return rows
+
+
+def _symbol_frames(matrices: Dict[str, pd.DataFrame]) -> Iterable[Tuple[str, pd.DataFrame]]:
+    """load_price_matrix 결과를 종목별 가격 DataFrame(Date, Close, High, Low, Volume)으로 나눕니다."""
+    close = matrices['Close']
+    for symbol in close.columns:
+        frame = pd.DataFrame({field: matrix[symbol] for field, matrix in matrices.items()}).dropna(subset=['Close'])
+        if not frame.empty:
+            yield symbol, frame.rename_axis('Date').reset_index()
+
+
+def sweep_parameters(symbols: Optional[Sequence[str]], start: pd.Timestamp, end: Optional[pd.Timestamp] = None,
+                     strategy: str = 'rsi', grid: Optional[Mapping[str, Iterable]] = None,
+                     workers: int = config.BACKTEST_WORKERS, cost_bps: float = config.BACKTEST_COST_BPS) -> pd.DataFrame:
+    """
+    price_store에 저장된 주가로 여러 종목 × 파라미터 조합을 백테스트해 (종목, 파라미터, 지표) 행으로 반환합니다.
+    symbols가 None이면 저장된 전 종목. 종목별 계산은 프로세스 풀로 나눠 실행합니다. (workers=1이면 현재 프로세스)
+    """
+    import price_store
+
+    combos = parameter_grid(grid if grid is not None else DEFAULT_GRIDS.get(strategy, {})) or [{}]
+    matrices = price_store.load_price_matrix(start, end, symbols)
+    if matrices['Close'].empty:
+        logger.warning("백테스트할 저장 주가가 없습니다. (batch_precompute 등으로 먼저 수집하세요)")
+        return pd.DataFrame()
+
+    frames = list(_symbol_frames(matrices))
+    logger.info(f"백테스트 파라미터 탐색: 전략 {strategy}, 종목 {len(frames)}개 × 조합 {len(combos)}개, 워커 {workers}개")
+    args = ([symbol for symbol, _ in frames], [frame for _, frame in frames],
+            itertools.repeat(strategy), itertools.repeat(combos), itertools.repeat(cost_bps))
+    if workers <= 1:
+        results = map(_backtest_symbol, *args)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_backtest_symbol, *args, chunksize=max(len(frames) // (workers * 4), 1)))
+    return pd.DataFrame([row for rows in results for row in rows])
+
+
+def summarize_sweep(results: pd.DataFrame, sort_by: str = 'total_return') -> pd.DataFrame:
+    """파라미터 조합별로 종목 평균 지표와 종목 수를 모아 sort_by 내림차순으로 정렬합니다."""
+    if results.empty:
+        return results
+    known_params = {key for grid in DEFAULT_GRIDS.values() for key in grid}
+    params = [column for column in results.columns if column in known_params]
+    metrics = [column for column in results.columns if column != 'symbol' and column not in known_params]
+    grouped = results.groupby(params or (lambda _: 'all'))
+    summary = grouped[metrics].mean().assign(symbols=grouped['symbol'].nunique())
+    return summary.sort_values(sort_by, ascending=False).reset_index(drop=not params)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="저장된 주가로 기술적 신호 전략 백테스트/파라미터 탐색")
+    parser.add_argument("--strategy", choices=list(STRATEGIES), default='rsi', help="전략")
+    parser.add_argument("--symbols", nargs="+", help="대상 종목코드 (기본: 저장된 전 종목)")
+    parser.add_argument("--days", type=int, default=730, help="오늘부터 거슬러 올라갈 기간(일)")
+    parser.add_argument("--workers", type=int, default=config.BACKTEST_WORKERS, help="프로세스 수")
+    parser.add_argument("--cost-bps", type=float, default=config.BACKTEST_COST_BPS, help="매수/매도 1회당 거래비용(bp)")
+    parser.add_argument("--top", type=int, default=10, help="출력할 상위 조합 수")
+    args = parser.parse_args(argv)
+
+    start = pd.Timestamp(datetime.now() - timedelta(days=args.days)).normalize()
+    results = sweep_parameters(args.symbols, start, strategy=args.strategy, workers=args.workers, cost_bps=args.cost_bps)
+    if results.empty:
+        return 1
+    print(f"{STRATEGIES[args.strategy][0]} - 종목 {results['symbol'].nunique()}개")
+    print(summarize_sweep(results).head(args.top).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+야간 일괄 사전 계산 배치.
+
+KRX 전 종목에 대해 주가(기간별 기술적 지표)와 DART 재무비율을 미리 계산해 precompute_store에 저장합니다.
+앱은 같은 조건의 결과가 있으면 그것을 먼저 사용하므로, 첫 조회도 로컬 조회로 끝납니다.
+주가/재무제표 원본도 price_store, financial_store에 쌓이므로 이후 증분 수집만 필요합니다.
+
+앱의 분석 기간은 '오늘' 기준이므로 자정 이후(장 시작 전)에 실행하세요. 장이 열려 당일 봉이 생기면
+앱은 전일까지만 담긴 기술적 지표 결과 대신 새로 계산합니다. 예:
+    python batch_precompute.py --workers 4
+    python batch_precompute.py --run-id 20250101 --retry-failed   # 중단된 실행 재개
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import config
+import precompute_store
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+
+def analysis_windows(now: datetime, period_days: Sequence[int]) -> List[Tuple[str, str]]:
+    """app.py와 같은 방식으로 (시작일, 종료일) 문자열 구간을 만듭니다. 긴 기간부터 처리하면 주가 수집이 한 번으로 끝납니다."""
+    end = now.strftime('%Y-%m-%d')
+    return [((now - timedelta(days=days)).strftime('%Y-%m-%d'), end) for days in sorted(period_days, reverse=True)]
+
+
+def _init_worker(workers: int):
+    """DART 초당/일일 호출 한도를 프로세스 수로 나눠, 전체 합이 한도를 넘지 않게 합니다."""
+    import http_client
+    client = http_client.dart_client
+    client.rate_limiter = http_client.TokenBucket(max(config.DART_CALLS_PER_SECOND / workers, 0.1), capacity=1)
+    client.daily_budget = http_client.DailyBudget(max(config.DART_DAILY_CALL_LIMIT // workers, 1))
+
+
+def _precompute_symbol(symbol: str, windows: List[Tuple[str, str]], year: str,
+                       technical: bool, financial: bool) -> Tuple[str, List[tuple], List[str]]:
+    """
+    한 종목을 계산합니다. (워커 프로세스에서 실행)
+    반환: (종목, [(종류, 파라미터, 결과)], [경고 메시지])
+    """
+    # 앱과 같은 단계 함수를 재사용합니다. (fetch_* + calculate_*)
+    from pipeline import _financial_stage, _technical_stage
+
+    results, warnings = [], []
+    if financial:
+        payload = _financial_stage(symbol, year)
+        if payload['msg'] == "Success" and payload['ratios'] and "error" not in payload['ratios']:
+            results.append((precompute_store.KIND_FINANCIAL, precompute_store.financial_params(year, "11011"), payload))
+        else:
+            warnings.append(f"재무: {payload['msg']}")
+    if technical:
+        for start_date, end_date in windows:
+            payload = _technical_stage(symbol, start_date, end_date)
+            if payload['indicators_df'] is None:
+                warnings.append(f"주가 없음 ({start_date}~{end_date})")
+                break
+            results.append((precompute_store.KIND_TECHNICAL, precompute_store.technical_params(start_date, end_date), payload))
+    return symbol, results, warnings
+
+
+def run(symbols: Optional[Sequence[str]] = None, run_id: Optional[str] = None, workers: int = config.PRECOMPUTE_WORKERS,
+        period_days: Sequence[int] = config.PRECOMPUTE_PERIOD_DAYS, year: Optional[str] = None,
+        technical: bool = True, financial: bool = True, retry_failed: bool = False,
+        limit: Optional[int] = None) -> Dict[str, int]:
+    """
+    사전 계산을 실행하고 {'done', 'failed', 'skipped'} 건수를 반환합니다.
+    같은 run_id로 다시 실행하면 이미 끝난 종목은 건너뜁니다. (retry_failed가 아니면 실패한 종목도 건너뜀)
+    """
+    from pipeline import default_report_year
+
+    now = datetime.now()
+    run_id = run_id or now.strftime('%Y%m%d')
+    year = year or default_report_year(now)
+    windows = analysis_windows(now, period_days)
+
+    if symbols is None:
+        from data_fetcher import get_krx_stock_list
+        listing = get_krx_stock_list()
+        symbols = listing['Symbol'].astype(str).tolist()
+    symbols = list(dict.fromkeys(symbols))[:limit] if limit else list(dict.fromkeys(symbols))
+
+    finished = precompute_store.completed_symbols(run_id, include_failed=not retry_failed)
+    pending = [symbol for symbol in symbols if symbol not in finished]
+    counts = {'done': 0, 'failed': 0, 'skipped': len(symbols) - len(pending)}
+
+    precompute_store.start_run(run_id, {'year': year, 'windows': windows, 'technical': technical,
+                                        'financial': financial, 'symbols': len(symbols)})
+    logger.info(f"사전 계산 시작: run_id={run_id}, 대상 {len(pending)}개 (건너뜀 {counts['skipped']}개), "
+                f"워커 {workers}개, 연도 {year}, 기간 {list(period_days)}")
+    started = time.perf_counter()
+    status = 'interrupted'
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(workers,)) as executor:
+            futures = {executor.submit(_precompute_symbol, symbol, windows, year, technical, financial): symbol
+                       for symbol in pending}
+            for i, future in enumerate(as_completed(futures), 1):
+                symbol = futures[future]
+                try:
+                    _, results, warnings = future.result()
+                    # 저장은 부모 프로세스에서만 해 SQLite 쓰기 경합을 피합니다.
+                    for kind, params, payload in results:
+                        precompute_store.save_result(symbol, kind, params, payload, run_id)
+                    precompute_store.mark_progress(run_id, symbol, 'done', "; ".join(warnings) or None)
+                    counts['done'] += 1
+                except Exception as e:
+                    logger.error(f"사전 계산 실패: {symbol}: {e}")
+                    precompute_store.mark_progress(run_id, symbol, 'failed', str(e))
+                    counts['failed'] += 1
+                if i % 100 == 0 or i == len(pending):
+                    elapsed = time.perf_counter() - started
+                    logger.info(f"진행 {i}/{len(pending)} ({elapsed:.0f}s, 종목당 {elapsed / i:.2f}s)")
+        status = 'completed'
+    finally:
+        precompute_store.finish_run(run_id, status)
+        logger.info(f"사전 계산 {status}: {counts}")
+    return counts
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="KRX 전 종목 주가 지표/재무비율 야간 사전 계산")
+    parser.add_argument("--symbols", nargs="+", help="대상 종목코드 (기본: KRX 전 종목)")
+    parser.add_argument("--limit", type=int, help="앞에서부터 N개 종목만 처리")
+    parser.add_argument("--run-id", help="실행 ID (기본: 오늘 날짜). 같은 ID로 다시 실행하면 이어서 처리")
+    parser.add_argument("--workers", type=int, default=config.PRECOMPUTE_WORKERS, help="프로세스 수")
+    parser.add_argument("--periods", type=int, nargs="+", default=list(config.PRECOMPUTE_PERIOD_DAYS),
+                        help="분석 기간(일) 목록")
+    parser.add_argument("--year", help="사업보고서 연도 (기본: 앱과 같은 규칙)")
+    parser.add_argument("--skip-technical", action="store_true", help="주가/기술적 지표 계산 생략")
+    parser.add_argument("--skip-financial", action="store_true", help="DART 재무 계산 생략")
+    parser.add_argument("--retry-failed", action="store_true", help="같은 실행에서 실패한 종목도 다시 처리")
+    args = parser.parse_args(argv)
+
+    counts = run(symbols=args.symbols, run_id=args.run_id, workers=args.workers, period_days=args.periods,
+                 year=args.year, technical=not args.skip_technical, financial=not args.skip_financial,
+                 retry_failed=args.retry_failed, limit=args.limit)
+    return 1 if counts['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
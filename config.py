@@ -1,15 +1,95 @@
 import streamlit as st
 import os
 
+
+def _read_secret(name: str):
+    """secrets.toml 값을 읽습니다. secrets 파일이 없거나 Streamlit 밖(배치 CLI 등)에서 실행되면 None."""
+    try:
+        return st.secrets.get(name)
+    except Exception:
+        return None
+
+
 # DART API 키: secrets.toml → 환경변수 → 기본값 순
 DART_API_KEY = (
-    st.secrets.get("DART_API_KEY") or
+    _read_secret("DART_API_KEY") or
     os.environ.get("DART_API_KEY") or
     "YOUR_DART_API_KEY_HERE"
 )
 
 # 캐시 타임아웃 설정 (초 단위)
 CACHE_TIMEOUT_SECONDS = 60 * 10  # 10분
+# 만료 후에도 이 시간 동안은 기존 값을 즉시 반환하고 백그라운드에서 갱신 (stale-while-revalidate)
+CACHE_STALE_SECONDS = 60 * 60  # 1시간
 
 # SQLite DB 파일 경로
 DB_NAME = "stock_mvp.db"
+
+# DART 기업 고유번호 로컬 인덱스 (corpCode.xml 캐시)
+CORP_CODE_DB_NAME = "corp_codes.db"
+CORP_CODE_REFRESH_SECONDS = 60 * 60 * 24  # 하루 한 번 갱신
+CORP_CODE_RETRY_SECONDS = 60 * 5  # 갱신 실패 시 재시도 간격
+
+# 종목별 일봉 로컬 저장소 (증분 수집)
+PRICE_DB_NAME = "price_store.db"
+
+# 분석 파이프라인 동시 실행 스레드 수 (프로세스 전체 공유)
+PIPELINE_WORKERS = 8
+
+# 공용 HTTP 클라이언트 (keep-alive 세션 풀, 재시도)
+HTTP_POOL_SIZE = 8
+HTTP_MAX_RETRIES = 3
+HTTP_BACKOFF_BASE_SECONDS = 0.5
+# DART OpenAPI 주소 (테스트에서는 환경변수로 로컬 스텁 서버를 가리킬 수 있습니다)
+DART_BASE_URL = os.environ.get("DART_BASE_URL", "https://opendart.fss.or.kr/api/")
+# DART OpenAPI 호출 한도 (개인 키 기준 일 20,000회)
+DART_CALLS_PER_SECOND = 10
+DART_DAILY_CALL_LIMIT = 20000
+
+# DART 일괄 수집 동시 요청 수 (호출 한도는 http_client가 별도로 관리)
+DART_BULK_WORKERS = 4
+
+# 정규화된 DART 재무제표 로컬 저장소 (공시된 보고서는 다시 받지 않음)
+FINANCIAL_DB_NAME = "financial_store.db"
+FINANCIAL_MISSING_RETRY_SECONDS = 60 * 60 * 6  # 미공시 보고서 재확인 간격
+
+# 사용자 DB(SQLite) 연결 풀 크기와 페이지 캐시 크기
+DB_POOL_SIZE = 4
+DB_CACHE_SIZE_KB = 16 * 1024
+# 조회 기록/설정 쓰기 지연 큐: 이 간격(ms)마다 또는 이 건수가 쌓이면 한 트랜잭션으로 기록
+DB_WRITE_FLUSH_MS = 200
+DB_WRITE_BATCH_SIZE = 100
+# 사용자 설정 캐시 (쓰기는 캐시에 바로 반영되므로 TTL은 다른 프로세스의 변경을 반영하는 주기)
+SETTINGS_CACHE_SECONDS = 60 * 60
+SETTINGS_CACHE_MAX_USERS = 1024
+
+# 차트(Plotly Figure) 캐시: 입력 데이터 지문이 같으면 다시 만들지 않음
+FIGURE_CACHE_SECONDS = 60 * 10
+FIGURE_CACHE_MAX_ENTRIES = 64
+
+# KRX 종목 마스터: 목록을 받지 못했을 때 다시 시도하기까지의 간격
+SYMBOL_MASTER_RETRY_SECONDS = 60 * 5
+
+# 야간 일괄 사전 계산 결과 저장소 (앱은 이 결과를 먼저 조회)
+PRECOMPUTE_DB_NAME = "precomputed.db"
+PRECOMPUTE_WORKERS = 4
+# 기술적 지표 사전 계산 결과는 계산 후 이 시간까지만 사용 (이후에는 새로 계산)
+PRECOMPUTE_MAX_AGE_SECONDS = 60 * 60 * 18
+# KRX 정규장 시작 시각(시). 이 시각 이후에는 당일 봉이 있어야 하므로, 전일까지만 담긴 사전 계산 결과는 다시 계산합니다.
+KRX_MARKET_OPEN_HOUR = 9
+# 사전 계산할 분석 기간(일) - app.py의 기간 선택지와 같게 유지
+PRECOMPUTE_PERIOD_DAYS = (90, 180, 365, 730)
+
+# 관심 종목 대시보드: 종목별 분석을 돌리는 프로세스 풀 크기와 세션당 동시 실행 상한
+WATCHLIST_PROCESS_WORKERS = 4
+WATCHLIST_MAX_IN_FLIGHT_PER_SESSION = 2
+WATCHLIST_MAX_SYMBOLS = 50
+
+# 신호 백테스트: 매수/매도 1회당 거래비용(수수료+세금 근사, bp), 진입 후 보유 수익률을 볼 기간(거래일), 파라미터 탐색 프로세스 수
+BACKTEST_COST_BPS = 15
+BACKTEST_HORIZONS = (5, 10, 20)
+BACKTEST_WORKERS = 4
+
+# 기술적 지표 메모이즈: (종목, 데이터 버전, 지표 노드)별 계산 결과를 보관하는 시간과 항목 수
+INDICATOR_CACHE_SECONDS = 60 * 10
+INDICATOR_CACHE_MAX_ENTRIES = 4096
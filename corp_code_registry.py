@@ -0,0 +1,221 @@
+import io
+import sqlite3
+import threading
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Dict, Optional, Tuple
+
+import requests
+
+import config
+from http_client import dart_get
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# stock_code -> (corp_code, corp_name) 메모리 인덱스. 프로세스 전체에서 공유합니다.
+_index: Optional[Dict[str, Tuple[str, str]]] = None
+_meta: Dict[str, str] = {}
+_last_attempt = 0.0
+_load_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+
+
+def _get_connection():
+    conn = sqlite3.connect(config.CORP_CODE_DB_NAME, timeout=30)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS corp_codes (
+        stock_code TEXT PRIMARY KEY,
+        corp_code TEXT NOT NULL,
+        corp_name TEXT
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS corp_code_meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )
+    """)
+    return conn
+
+
+def _load_from_disk() -> Tuple[Dict[str, Tuple[str, str]], Dict[str, str]]:
+    """로컬 SQLite에 저장된 기업 고유번호 인덱스를 읽어옵니다."""
+    conn = _get_connection()
+    try:
+        index = {
+            stock_code: (corp_code, corp_name)
+            for stock_code, corp_code, corp_name in conn.execute(
+                "SELECT stock_code, corp_code, corp_name FROM corp_codes"
+            )
+        }
+        meta = dict(conn.execute("SELECT key, value FROM corp_code_meta"))
+        return index, meta
+    finally:
+        conn.close()
+
+
+def _save_to_disk(index: Dict[str, Tuple[str, str]], meta: Dict[str, str]):
+    """인덱스 전체를 하나의 트랜잭션으로 교체 저장합니다."""
+    conn = _get_connection()
+    try:
+        with conn:
+            conn.execute("DELETE FROM corp_codes")
+            conn.executemany(
+                "INSERT INTO corp_codes (stock_code, corp_code, corp_name) VALUES (?, ?, ?)",
+                ((stock_code, corp_code, corp_name) for stock_code, (corp_code, corp_name) in index.items())
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO corp_code_meta (key, value) VALUES (?, ?)", meta.items()
+            )
+    finally:
+        conn.close()
+
+
+def _touch_meta(meta: Dict[str, str]):
+    conn = _get_connection()
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO corp_code_meta (key, value) VALUES (?, ?)", meta.items()
+            )
+    finally:
+        conn.close()
+
+
+def _parse_corp_code_xml(xml_file) -> Dict[str, Tuple[str, str]]:
+    """CORPCODE.XML을 iterparse로 스트리밍 파싱하여 상장사(stock_code 보유)만 인덱싱합니다."""
+    index = {}
+    for _, elem in ET.iterparse(xml_file, events=("end",)):
+        if elem.tag != "list":
+            continue
+        stock_code = (elem.findtext("stock_code") or "").strip()
+        if stock_code:
+            corp_code = (elem.findtext("corp_code") or "").strip()
+            corp_name = (elem.findtext("corp_name") or "").strip()
+            index[stock_code] = (corp_code, corp_name)
+        elem.clear()
+    return index
+
+
+def _extract_xml(content: bytes) -> Dict[str, Tuple[str, str]]:
+    with zipfile.ZipFile(io.BytesIO(content)) as zf:
+        # 압축파일 내의 첫 번째 .xml 파일을 동적으로 찾습니다.
+        xml_filename = next((name for name in zf.namelist() if name.lower().endswith('.xml')), None)
+        if not xml_filename:
+            raise ValueError("DART 응답 ZIP 파일에서 XML 파일을 찾을 수 없습니다.")
+        with zf.open(xml_filename) as xml_file:
+            return _parse_corp_code_xml(xml_file)
+
+
+def refresh_corp_code_registry(force: bool = False) -> bool:
+    """
+    DART 기업 고유번호 목록을 다시 내려받아 로컬 인덱스를 갱신합니다.
+    이전 응답의 ETag/Last-Modified로 조건부 요청을 보내며, 변경이 없으면(304) 갱신 시각만 기록합니다.
+    """
+    global _index, _meta, _last_attempt
+    _last_attempt = time.time()
+    api_key = config.DART_API_KEY
+    if not api_key or api_key == "YOUR_DART_API_KEY_HERE":
+        logger.error("DART API 키가 config.py에 설정되지 않았습니다.")
+        return False
+
+    if not _refresh_lock.acquire(blocking=False):
+        # 다른 스레드가 이미 갱신 중이면 그 결과를 기다립니다.
+        with _refresh_lock:
+            return _index is not None
+
+    try:
+        headers = {}
+        if not force and _index:
+            if _meta.get("etag"):
+                headers["If-None-Match"] = _meta["etag"]
+            if _meta.get("last_modified"):
+                headers["If-Modified-Since"] = _meta["last_modified"]
+
+        logger.info("DART: 전체 기업 고유번호 목록 다운로드 요청...")
+        response = dart_get("corpCode.xml", headers=headers, timeout=30)
+        now = str(time.time())
+
+        if response.status_code == 304:
+            logger.info("DART: 기업 고유번호 목록이 변경되지 않았습니다. (304 Not Modified)")
+            _meta = {**_meta, "updated_at": now}
+            _touch_meta({"updated_at": now})
+            return True
+
+        response.raise_for_status()
+        index = _extract_xml(response.content)
+        if not index:
+            logger.error("DART 기업 고유번호 목록이 비어 있어 기존 인덱스를 유지합니다.")
+            return False
+
+        meta = {
+            "updated_at": now,
+            "etag": response.headers.get("ETag", ""),
+            "last_modified": response.headers.get("Last-Modified", ""),
+        }
+        _save_to_disk(index, meta)
+        _index, _meta = index, meta
+        logger.info(f"DART: 기업 고유번호 인덱스 갱신 완료 ({len(index)}개 상장사).")
+        return True
+    except requests.exceptions.RequestException as e:
+        logger.error(f"DART 회사 코드 목록 요청 실패: {e}")
+        return False
+    except Exception as e:
+        logger.error(f"DART 회사 코드 처리 중 예기치 않은 오류: {e}", exc_info=True)
+        return False
+    finally:
+        _refresh_lock.release()
+
+
+def _refresh_in_background():
+    threading.Thread(target=refresh_corp_code_registry, name="corp-code-refresh", daemon=True).start()
+
+
+def _ensure_loaded():
+    """메모리 인덱스가 없으면 디스크에서 읽고, 디스크도 비어 있을 때만 네트워크로 받아옵니다."""
+    global _index, _meta
+    if _index is not None:
+        return
+    with _load_lock:
+        if _index is not None:
+            return
+        try:
+            index, meta = _load_from_disk()
+        except sqlite3.Error as e:
+            logger.error(f"기업 고유번호 로컬 인덱스 로드 실패: {e}")
+            index, meta = {}, {}
+        if index:
+            _index, _meta = index, meta
+            logger.info(f"기업 고유번호 인덱스를 로컬에서 로드했습니다 ({len(index)}개).")
+            return
+        if not refresh_corp_code_registry(force=True) and _index is None:
+            # 다운로드에 실패해도 빈 인덱스로 시작하고, 이후 재시도는 주기적으로만 수행합니다.
+            _index = {}
+
+
+def _is_stale() -> bool:
+    try:
+        updated_at = float(_meta.get("updated_at", 0))
+    except ValueError:
+        updated_at = 0
+    return time.time() - updated_at > config.CORP_CODE_REFRESH_SECONDS
+
+
+def lookup_corp_code(stock_code: str) -> Tuple[Optional[str], Optional[str]]:
+    """종목코드로 (기업 고유번호, 회사명)을 O(1)로 조회합니다. 찾지 못하면 (None, None)을 반환합니다."""
+    _ensure_loaded()
+    if _index is None:
+        return None, None
+
+    retry_due = time.time() - _last_attempt > config.CORP_CODE_RETRY_SECONDS
+    if _is_stale() and retry_due and not _refresh_lock.locked():
+        # 오래된 인덱스는 즉시 응답에 사용하고, 갱신은 백그라운드에서 진행합니다.
+        _refresh_in_background()
+
+    entry = _index.get(stock_code.strip())
+    if entry is None:
+        logger.warning(f"DART: Stock Code {stock_code}에 해당하는 회사 코드를 전체 목록에서 찾지 못했습니다.")
+        return None, None
+    return entry
@@ -1,15 +1,21 @@
 import pandas as pd
 import requests
-import zipfile
-import io
-import xml.etree.ElementTree as ET
-from typing import Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional, Tuple
 
 import config
 from utils import timed_cache, get_logger
+from corp_code_registry import lookup_corp_code
+from http_client import dart_get
+import price_store
+import financial_store
+import symbol_master
 
 logger = get_logger(__name__)
 
+# fnlttMultiAcnt 한 번에 요청할 수 있는 최대 회사 수
+MULTI_ACCOUNT_BATCH_SIZE = 100
+
 # FinanceDataReader 임포트 시도
 try:
     import FinanceDataReader as fdr
@@ -19,58 +25,38 @@ except ImportError:
     logger.critical("FinanceDataReader 라이브러리를 찾을 수 없습니다. pip install finance-datareader로 설치해주세요.")
 
 
-@timed_cache(seconds=config.CACHE_TIMEOUT_SECONDS * 24)
 def get_corp_code_and_name(stock_code: str) -> Tuple[Optional[str], Optional[str]]:
-    """DART API로부터 기업 고유번호와 회사명을 가져옵니다. ZIP 파일 내부의 XML 파일명을 동적으로 찾도록 수정되었습니다."""
-    api_key = config.DART_API_KEY
-    if not api_key or api_key == "YOUR_DART_API_KEY_HERE":
-        logger.error("DART API 키가 config.py에 설정되지 않았습니다.")
-        return None, None
+    """
+    DART 기업 고유번호와 회사명을 로컬 인덱스(corp_code_registry)에서 조회합니다.
+    전체 목록은 하루 한 번만 내려받으며, 동시 갱신은 registry 내부 잠금으로 하나로 합쳐집니다.
+    """
+    return lookup_corp_code(stock_code)
+
+
+def _to_numeric_amounts(df: pd.DataFrame) -> pd.DataFrame:
+    """DART 금액 컬럼('1,234' 형식 문자열)을 숫자로 변환합니다. (재무 저장소에 저장하는 금액 컬럼 전체)"""
+    for col in financial_store.STATEMENT_AMOUNT_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col].astype(str).str.replace(',', ''), errors='coerce')
+    return df
 
-    url = f"https://opendart.fss.or.kr/api/corpCode.xml?crtfc_key={api_key}"
-    logger.info(f"DART: 전체 기업 고유번호 목록 다운로드 요청...")
 
+def _store_statement(corp_code: str, year: str, report_code: str, fs_div: str, df: pd.DataFrame):
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
+        financial_store.save_statement(corp_code, year, report_code, fs_div, df)
+    except Exception as e:
+        logger.warning(f"재무 저장소 저장 실패 ({corp_code}, {year}, {report_code}): {e}")
 
-        with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
-            # --- START: 수정된 핵심 로직 ---
-            # 특정 파일명('CORPCODE.XML')을 하드코딩하는 대신, 압축파일 내의 첫 번째 .xml 파일을 동적으로 찾습니다.
-            xml_filename = None
-            for name in zf.namelist():
-                if name.lower().endswith('.xml'):
-                    xml_filename = name
-                    logger.info(f"DART 응답 ZIP 파일에서 '{xml_filename}'을 발견했습니다.")
-                    break
-            
-            if not xml_filename:
-                logger.error("DART 응답 ZIP 파일에서 XML 파일을 찾을 수 없습니다.")
-                return None, None
-            # --- END: 수정된 핵심 로직 ---
-
-            with zf.open(xml_filename) as xml_file:
-                tree = ET.parse(xml_file)
-                root = tree.getroot()
-                for corp_element in root.findall("list"):
-                    corp_code_xml = corp_element.findtext("corp_code")
-                    corp_name_xml = corp_element.findtext("corp_name")
-                    stock_code_xml = corp_element.findtext("stock_code")
-                    if stock_code_xml and stock_code_xml.strip() == stock_code.strip():
-                        logger.info(f"DART: Stock Code {stock_code}에 해당하는 기업코드({corp_code_xml})를 찾았습니다.")
-                        return corp_code_xml.strip(), corp_name_xml.strip()
-
-        logger.warning(f"DART: Stock Code {stock_code}에 해당하는 회사 코드를 전체 목록에서 찾지 못했습니다.")
-        return None, None
-    except requests.exceptions.RequestException as e:
-        logger.error(f"DART 회사 코드 목록 요청 실패: {e}")
-        return None, None
+
+def _store_missing(corp_code: str, year: str, report_code: str, fs_div: str, msg: str):
+    try:
+        financial_store.record_missing(corp_code, year, report_code, fs_div, msg)
     except Exception as e:
-        logger.error(f"DART 회사 코드 처리 중 예기치 않은 오류: {e}", exc_info=True)
-        return None, None
+        logger.warning(f"재무 저장소 기록 실패 ({corp_code}, {year}, {report_code}): {e}")
 
 
-@timed_cache(seconds=config.CACHE_TIMEOUT_SECONDS)
+@timed_cache(seconds=config.CACHE_TIMEOUT_SECONDS, stale_seconds=config.CACHE_STALE_SECONDS,
+             cache_if=lambda result: result[1] == "Success")
 def fetch_dart_financial_data(stock_code: str, year: str, report_code: str = "11014", fs_div: str = "CFS") -> Tuple[pd.DataFrame, str]:
     """DART 재무 데이터를 가져옵니다. 성공 시 (데이터프레임, "Success"), 실패 시 (빈 데이터프레임, "실패 메시지")를 반환합니다."""
     api_key = config.DART_API_KEY
@@ -85,13 +71,22 @@ def fetch_dart_financial_data(stock_code: str, year: str, report_code: str = "11
         logger.error(f"DART: {stock_code}에 대한 회사 코드를 찾지 못해 재무제표를 요청할 수 없습니다.")
         return pd.DataFrame(), msg
         
-    url = (
-        f"https://opendart.fss.or.kr/api/fnlttSinglAcntAll.json"
-        f"?crtfc_key={api_key}&corp_code={corp_code}&bsns_year={year}&reprt_code={report_code}&fs_div={fs_div}"
-    )
-    logger.info(f"DART: 재무제표 요청 - URL: {url.replace(api_key, '******')}")
+    # 공시된 보고서는 바뀌지 않으므로 로컬 저장소에 있으면 그대로 사용합니다.
     try:
-        response = requests.get(url, timeout=15)
+        stored = financial_store.get_statement(corp_code, year, report_code, fs_div)
+        if stored is not None:
+            logger.info(f"DART: 재무제표 로컬 저장소 사용 ({corp_code}, {year}, {report_code}, {fs_div})")
+            return stored, "Success"
+        missing_msg = financial_store.is_recently_missing(corp_code, year, report_code, fs_div)
+        if missing_msg:
+            return pd.DataFrame(), missing_msg
+    except Exception as e:
+        logger.warning(f"재무 저장소 조회 실패, DART에서 직접 조회합니다: {e}")
+
+    params = {'corp_code': corp_code, 'bsns_year': year, 'reprt_code': report_code, 'fs_div': fs_div}
+    logger.info(f"DART: 재무제표 요청 - fnlttSinglAcntAll {params}")
+    try:
+        response = dart_get("fnlttSinglAcntAll.json", params=params, timeout=15)
         response.raise_for_status()
         result = response.json()
         status = result.get('status')
@@ -99,16 +94,17 @@ def fetch_dart_financial_data(stock_code: str, year: str, report_code: str = "11
 
         if status == '000':
             if 'list' in result and result['list']:
-                df = pd.DataFrame(result['list'])
-                amount_cols = ['thstrm_amount', 'frmtrm_amount', 'bfefrmtrm_amount']
-                for col in amount_cols:
-                    if col in df.columns:
-                        df[col] = pd.to_numeric(df[col].str.replace(',', ''), errors='coerce')
+                df = _to_numeric_amounts(pd.DataFrame(result['list']))
+                _store_statement(corp_code, year, report_code, fs_div, df)
                 return df, "Success"
             else:
                 return pd.DataFrame(), f"DART에 해당 조건의 데이터가 없습니다 (Status: {status})."
         elif status == '013':
-             return pd.DataFrame(), f"DART에 해당 기간({year}년)의 사업보고서 데이터가 없습니다. (Status: {status})"
+             msg = f"DART에 해당 기간({year}년)의 사업보고서 데이터가 없습니다. (Status: {status})"
+             _store_missing(corp_code, year, report_code, fs_div, msg)
+             return pd.DataFrame(), msg
+        elif status == '020':
+             return pd.DataFrame(), f"DART API 요청 한도를 초과했습니다. 잠시 후 다시 시도해주세요. (Status: {status})"
         else:
             return pd.DataFrame(), f"DART API 오류가 발생했습니다. (Status: {status}, Message: {message})"
             
@@ -125,17 +121,132 @@ def fetch_dart_financial_data(stock_code: str, year: str, report_code: str = "11
         logger.error(msg)
         return pd.DataFrame(), msg
 
-# 나머지 함수들은 수정되지 않았습니다.
-@timed_cache(seconds=config.CACHE_TIMEOUT_SECONDS // 4)
+@timed_cache(seconds=config.CACHE_TIMEOUT_SECONDS, stale_seconds=config.CACHE_STALE_SECONDS,
+             cache_if=lambda result: result[1] == "Success")
+def _fetch_multi_account_batch(corp_codes: Tuple[str, ...], year: str, report_code: str) -> Tuple[pd.DataFrame, str]:
+    """fnlttMultiAcnt로 여러 회사의 주요 계정을 한 번에 요청합니다. (corp_code 최대 100개)"""
+    params = {'corp_code': ','.join(corp_codes), 'bsns_year': year, 'reprt_code': report_code}
+    logger.info(f"DART: 다중회사 주요계정 요청 - {len(corp_codes)}개사, {year}년, 보고서 {report_code}")
+    try:
+        response = dart_get("fnlttMultiAcnt.json", params=params, timeout=30)
+        response.raise_for_status()
+        result = response.json()
+        status = result.get('status')
+        if status == '000' and result.get('list'):
+            return _to_numeric_amounts(pd.DataFrame(result['list'])), "Success"
+        if status == '013':
+            return pd.DataFrame(), f"DART에 해당 조건의 데이터가 없습니다. (Status: {status})"
+        return pd.DataFrame(), f"DART API 오류가 발생했습니다. (Status: {status}, Message: {result.get('message')})"
+    except requests.exceptions.RequestException as e:
+        logger.error(f"DART 다중회사 주요계정 요청 실패: {e}")
+        return pd.DataFrame(), f"DART API 요청 실패: {e}"
+    except ValueError as e:
+        logger.error(f"DART 다중회사 주요계정 응답 파싱 실패: {e}")
+        return pd.DataFrame(), f"DART API 응답을 처리할 수 없습니다. (JSON 파싱 오류: {e})"
+
+
+def fetch_dart_multi_financials(stock_codes: Iterable[str], years: Iterable[str],
+                                report_codes: Iterable[str] = ("11011",),
+                                max_workers: int = config.DART_BULK_WORKERS) -> Tuple[pd.DataFrame, str]:
+    """
+    여러 종목 × 여러 연도 × 여러 보고서(11013 1분기, 11012 반기, 11014 3분기, 11011 사업보고서)의 주요 계정을
+    fnlttMultiAcnt로 묶어 병렬 요청하고, 하나의 long-format 패널 DataFrame으로 반환합니다.
+    호출 속도/일일 한도는 공용 DART 클라이언트가 관리합니다.
+    성공 시 (패널, "Success"), 일부 실패 시 (패널, 실패 요약 메시지)를 반환합니다.
+    """
+    api_key = config.DART_API_KEY
+    if not api_key or api_key == "YOUR_DART_API_KEY_HERE":
+        msg = "DART API 키가 설정되지 않았습니다."
+        logger.warning(msg)
+        return pd.DataFrame(), msg
+
+    corp_info = {}
+    for stock_code in dict.fromkeys(stock_codes):
+        corp_code, corp_name = get_corp_code_and_name(stock_code)
+        if corp_code:
+            corp_info[corp_code] = (stock_code, corp_name)
+    if not corp_info:
+        return pd.DataFrame(), "DART 고유 기업 코드를 찾을 수 있는 종목이 없습니다."
+
+    # 배치마다 다시 순회하므로 제너레이터로 받아도 한 번만 소비되도록 목록으로 바꿔 둡니다.
+    years = [str(year) for year in years]
+    report_codes = list(report_codes)
+    corp_codes = sorted(corp_info)
+    batches = [tuple(corp_codes[i:i + MULTI_ACCOUNT_BATCH_SIZE])
+               for i in range(0, len(corp_codes), MULTI_ACCOUNT_BATCH_SIZE)]
+    tasks = [(batch, year, report_code) for batch in batches for year in years for report_code in report_codes]
+
+    frames, failures = [], []
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dart-bulk") as executor:
+        for (batch, year, report_code), (df, msg) in zip(tasks, executor.map(lambda t: _fetch_multi_account_batch(*t), tasks)):
+            if msg == "Success":
+                frames.append(df)
+            else:
+                failures.append(f"{year}/{report_code}({len(batch)}개사): {msg}")
+
+    if not frames:
+        return pd.DataFrame(), "; ".join(failures) or "DART에 해당 조건의 데이터가 없습니다."
+
+    panel = pd.concat(frames, ignore_index=True)
+    # 응답에 corp_code가 없더라도 종목코드 기준으로 채워 둡니다.
+    stock_to_corp = {stock_code: corp_code for corp_code, (stock_code, _) in corp_info.items()}
+    if 'corp_code' not in panel.columns:
+        panel['corp_code'] = panel['stock_code'].map(stock_to_corp)
+    panel['corp_name'] = panel['corp_code'].map({corp_code: name for corp_code, (_, name) in corp_info.items()})
+    logger.info(f"DART: 다중회사 재무 패널 {len(panel)}행 수집 (요청 {len(tasks)}건, 실패 {len(failures)}건)")
+    return panel, "Success" if not failures else "일부 요청 실패: " + "; ".join(failures)
+
+
+def _download_price_range(stock_code: str, start: Optional[pd.Timestamp], end: pd.Timestamp) -> Optional[pd.DataFrame]:
+    """FinanceDataReader에서 [start, end] 구간을 받아옵니다. 실패 시 None."""
+    try:
+        return fdr.DataReader(stock_code, start=start, end=end)
+    except Exception as e:
+        logger.error(f"FinanceDataReader로 주가 데이터 조회 중 오류: {e}")
+        return None
+
+
+@timed_cache(seconds=config.CACHE_TIMEOUT_SECONDS // 4, stale_seconds=config.CACHE_STALE_SECONDS,
+             cache_if=lambda df: not df.empty)
 def fetch_stock_price_data(stock_code: str, start_date: str = None, end_date: str = None) -> pd.DataFrame:
+    """
+    로컬 가격 저장소(price_store)를 거쳐 주가 데이터를 반환합니다.
+    저장된 구간 밖의 봉만 FinanceDataReader에서 받아 덧붙이고, 요청 구간은 로컬에서 잘라 반환합니다.
+    """
     if not FDR_AVAILABLE:
         return pd.DataFrame()
+
+    today = pd.Timestamp.today().normalize()
+    end = min(pd.Timestamp(end_date).normalize(), today) if end_date else today
+    start = pd.Timestamp(start_date).normalize() if start_date else None
+    # 당일 봉은 장중에 바뀌므로 수집 완료 구간은 전일까지만 기록합니다.
+    settled_end = min(end, today - pd.Timedelta(days=1))
+
     try:
-        df = fdr.DataReader(stock_code, start=start_date, end=end_date)
-        return df.reset_index()
+        coverage = price_store.get_coverage(stock_code)
+        if coverage is None or start is None:
+            downloaded = _download_price_range(stock_code, start, end)
+            if downloaded is not None:
+                covered_start = start if start is not None else (
+                    pd.Timestamp(downloaded.index.min()) if not downloaded.empty else settled_end)
+                price_store.save_prices(stock_code, downloaded, covered_start, max(covered_start, settled_end))
+        else:
+            first_date, last_date = coverage
+            if start < first_date:
+                backfill = _download_price_range(stock_code, start, first_date - pd.Timedelta(days=1))
+                if backfill is not None:
+                    price_store.save_prices(stock_code, backfill, start, first_date)
+            if end > last_date:
+                # 마지막 저장일부터 다시 받아 장중에 저장된 봉을 확정값으로 덮어씁니다.
+                increment = _download_price_range(stock_code, last_date, end)
+                if increment is not None:
+                    price_store.save_prices(stock_code, increment, last_date, max(last_date, settled_end))
+                    logger.info(f"가격 저장소: {stock_code} 신규 봉 {len(increment)}개 추가")
+        return price_store.load_prices(stock_code, start, end)
     except Exception as e:
-        logger.error(f"FinanceDataReader로 주가 데이터 조회 중 오류: {e}")
-        return pd.DataFrame()
+        logger.error(f"가격 저장소 처리 중 오류 ({stock_code}), 원격 조회로 대체합니다: {e}", exc_info=True)
+        downloaded = _download_price_range(stock_code, start, end)
+        return downloaded.reset_index() if downloaded is not None else pd.DataFrame()
 
 
 @timed_cache(seconds=config.CACHE_TIMEOUT_SECONDS * 24)
@@ -146,11 +257,7 @@ def fetch_company_info(stock_code: str) -> dict:
 
     if not final_corp_name and FDR_AVAILABLE:
         try:
-            krx_list = get_krx_stock_list()
-            if not krx_list.empty:
-                company_row = krx_list[krx_list['Symbol'] == stock_code]
-                if not company_row.empty:
-                    final_corp_name = company_row['Name'].iloc[0]
+            final_corp_name = symbol_master.get_symbol_master().name(stock_code)
         except Exception as e_fdr:
             logger.warning(f"FinanceDataReader로 회사명 조회 중 오류: {e_fdr}")
 
@@ -160,7 +267,7 @@ def fetch_company_info(stock_code: str) -> dict:
     return {'stock_code': stock_code, 'corp_code': corp_code, 'corp_name': final_corp_name}
 
 
-@timed_cache(seconds=3600 * 24)
+@timed_cache(seconds=3600 * 24, stale_seconds=3600 * 24, cache_if=lambda df: not df.empty)
 def get_krx_stock_list() -> pd.DataFrame:
     if not FDR_AVAILABLE:
         logger.error("FinanceDataReader가 설치되지 않아 KRX 종목 리스트를 가져올 수 없습니다.")
@@ -1,155 +1,427 @@
 
 
+import atexit
+import json
+import queue
 import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+
 import config
-from utils import get_logger
+from utils import get_cache_namespace, get_logger
 import datetime
 
 logger = get_logger(__name__)
 DB_PATH = config.DB_NAME
 
+# 연결마다 한 번 적용하는 PRAGMA (WAL: 읽기와 쓰기가 서로 막지 않음)
+_CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA cache_size=-{config.DB_CACHE_SIZE_KB}",
+    "PRAGMA temp_store=MEMORY",
+)
+
+# 세션(스크립트 실행 스레드)들이 공유하는 연결 풀. Streamlit은 rerun마다 스레드가 바뀌므로 스레드 로컬 대신 풀을 씁니다.
+_pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=config.DB_POOL_SIZE)
+
+
 def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
     conn.row_factory = sqlite3.Row # 컬럼명으로 접근 가능하게
+    for pragma in _CONNECTION_PRAGMAS:
+        conn.execute(pragma)
     return conn
 
-def init_db():
-    """데이터베이스 초기화 (테이블 생성)"""
+
+@contextmanager
+def db_connection():
+    """풀에서 연결을 빌려주고, 끝나면 (열린 트랜잭션은 롤백한 뒤) 풀에 돌려놓습니다."""
     try:
+        conn = _pool.get_nowait()
+    except queue.Empty:
         conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # 사용자 조회 기록 테이블
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS user_search_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id TEXT NOT NULL,
-            stock_code TEXT NOT NULL,
-            company_name TEXT,
-            search_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            _pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+def _migration_base_tables(conn):
+    # 사용자 조회 기록 테이블
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS user_search_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        stock_code TEXT NOT NULL,
+        company_name TEXT,
+        search_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    # 사용자 설정 테이블 (구 스키마, 3번 마이그레이션에서 user_settings_kv로 옮김)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS user_settings (
+        user_id TEXT PRIMARY KEY,
+        theme TEXT DEFAULT 'light',
+        favorite_stocks TEXT,
+        analysis_period_days INTEGER DEFAULT 90
+    )
+    """)
+
+
+def _migration_recent_stocks(conn):
+    # (사용자, 종목)별 최근 조회를 인덱스만으로 찾을 수 있는 커버링 인덱스
+    conn.execute("""
+    CREATE INDEX IF NOT EXISTS idx_user_search_history_user_stock_ts
+    ON user_search_history (user_id, stock_code, search_timestamp, company_name)
+    """)
+    # 사용자별 종목당 최근 조회 1건 (save_user_search가 upsert로 유지)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS user_recent_stocks (
+        user_id TEXT NOT NULL,
+        stock_code TEXT NOT NULL,
+        company_name TEXT,
+        search_timestamp DATETIME,
+        PRIMARY KEY (user_id, stock_code)
+    ) WITHOUT ROWID
+    """)
+    conn.execute("""
+    CREATE INDEX IF NOT EXISTS idx_user_recent_stocks_user_ts
+    ON user_recent_stocks (user_id, search_timestamp DESC)
+    """)
+    # 기존 조회 기록이 있는 DB라면 최초 1회 채워 넣습니다.
+    if conn.execute("SELECT 1 FROM user_recent_stocks LIMIT 1").fetchone() is None:
+        conn.execute("""
+        INSERT INTO user_recent_stocks (user_id, stock_code, company_name, search_timestamp)
+        SELECT user_id, stock_code, company_name, search_timestamp FROM (
+            SELECT user_id, stock_code, company_name, search_timestamp,
+                   ROW_NUMBER() OVER (PARTITION BY user_id, stock_code
+                                      ORDER BY search_timestamp DESC, id DESC) AS rn
+            FROM user_search_history
+        ) WHERE rn = 1
         """)
-        
-        # 사용자 설정 테이블
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS user_settings (
-            user_id TEXT PRIMARY KEY,
-            theme TEXT DEFAULT 'light',
-            favorite_stocks TEXT,
-            analysis_period_days INTEGER DEFAULT 90
+
+
+def _migration_settings_kv(conn):
+    # 설정을 (사용자, 키) -> JSON 값으로 저장합니다. 새 설정 키가 생겨도 스키마를 바꿀 필요가 없습니다.
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS user_settings_kv (
+        user_id TEXT NOT NULL,
+        setting_key TEXT NOT NULL,
+        setting_value TEXT,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (user_id, setting_key)
+    ) WITHOUT ROWID
+    """)
+    # 구 스키마(설정마다 컬럼, 필요 시 ALTER TABLE로 추가됨)의 값을 모두 옮깁니다.
+    columns = [row['name'] for row in conn.execute("PRAGMA table_info(user_settings)") if row['name'] != 'user_id']
+    for column in columns:
+        rows = conn.execute(f'SELECT user_id, "{column}" FROM user_settings WHERE "{column}" IS NOT NULL').fetchall()
+        conn.executemany(
+            "INSERT OR IGNORE INTO user_settings_kv (user_id, setting_key, setting_value) VALUES (?, ?, ?)",
+            [(row[0], column, json.dumps(row[1], ensure_ascii=False)) for row in rows]
         )
-        """)
-        
+
+
+# (버전, 설명, 적용 함수). 새 스키마 변경은 항상 끝에 다음 버전으로 추가합니다.
+MIGRATIONS = [
+    (1, "base tables", _migration_base_tables),
+    (2, "search history covering index and latest-per-stock table", _migration_recent_stocks),
+    (3, "key/value user settings", _migration_settings_kv),
+]
+
+
+def get_schema_version() -> int:
+    with db_connection() as conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS schema_migrations "
+                     "(version INTEGER PRIMARY KEY, description TEXT, applied_at DATETIME DEFAULT CURRENT_TIMESTAMP)")
         conn.commit()
+        return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations").fetchone()[0]
+
+
+def init_db():
+    """데이터베이스 초기화: 아직 적용되지 않은 마이그레이션을 버전 순서대로 하나씩(각각 한 트랜잭션) 적용합니다."""
+    try:
+        current = get_schema_version()
+        for version, description, migrate in MIGRATIONS:
+            if version <= current:
+                continue
+            with db_connection() as conn, conn:
+                migrate(conn)
+                conn.execute("INSERT INTO schema_migrations (version, description) VALUES (?, ?)",
+                             (version, description))
+            logger.info(f"Applied database migration {version}: {description}")
         logger.info("Database initialized successfully.")
     except sqlite3.Error as e:
         logger.error(f"Database initialization error: {e}")
-    finally:
-        if conn:
-            conn.close()
+
+def _utc_timestamp() -> str:
+    """CURRENT_TIMESTAMP와 같은 형식(UTC, 초 단위)의 시각 문자열"""
+    return datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _write_searches(conn, searches):
+    conn.executemany("""
+    INSERT INTO user_search_history (user_id, stock_code, company_name, search_timestamp)
+    VALUES (?, ?, ?, ?)
+    """, searches)
+    conn.executemany("""
+    INSERT INTO user_recent_stocks (user_id, stock_code, company_name, search_timestamp)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (user_id, stock_code) DO UPDATE SET
+        company_name = excluded.company_name,
+        search_timestamp = excluded.search_timestamp
+    WHERE excluded.search_timestamp >= user_recent_stocks.search_timestamp
+    """, searches)
+
+
+def _write_settings(conn, settings):
+    """settings: [(user_id, setting_key, setting_value), ...]"""
+    conn.executemany("""
+    INSERT INTO user_settings_kv (user_id, setting_key, setting_value, updated_at)
+    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT (user_id, setting_key) DO UPDATE SET
+        setting_value = excluded.setting_value,
+        updated_at = excluded.updated_at
+    """, [(user_id, key, json.dumps(value, ensure_ascii=False)) for user_id, key, value in settings])
+
+
+class _WriteBehindQueue:
+    """
+    조회 기록/설정 쓰기를 즉시 반환하고, 백그라운드 스레드가 flush_ms마다 또는 batch_size건이 쌓이면
+    한 트랜잭션으로 기록합니다. 같은 (사용자, 설정 키)의 연속 변경은 마지막 값 하나로 합칩니다.
+    아직 기록되지 않은 값은 pending_* 메서드로 조회할 수 있어 같은 세션에서 바로 읽을 수 있습니다.
+    """
+
+    def __init__(self, flush_ms: int, batch_size: int):
+        self.flush_seconds = flush_ms / 1000.0
+        self.batch_size = batch_size
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._searches = []
+        self._settings: "OrderedDict[tuple, object]" = OrderedDict()
+        # 큐에서 꺼냈지만 아직 커밋되지 않은 배치 (읽기 일관성을 위해 커밋 전까지 보이게 둡니다)
+        self._inflight_searches = []
+        self._inflight_settings = {}
+        self._thread = None
+        self._closed = False
+
+    def _pending_count(self) -> int:
+        return len(self._searches) + len(self._settings)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="db-write-behind", daemon=True)
+            self._thread.start()
+
+    def put_search(self, user_id: str, stock_code: str, company_name: str = None):
+        with self._cond:
+            self._searches.append((user_id, stock_code, company_name, _utc_timestamp()))
+            closed = self._after_put()
+        if closed:
+            self.flush()
+
+    def put_setting(self, user_id: str, setting_key: str, setting_value):
+        with self._cond:
+            self._settings.pop((user_id, setting_key), None)
+            self._settings[(user_id, setting_key)] = setting_value
+            closed = self._after_put()
+        if closed:
+            self.flush()
+
+    def _after_put(self) -> bool:
+        """잠금을 잡은 상태에서 호출합니다. 종료 처리 이후라면 True (호출자가 바로 기록)"""
+        if self._closed:
+            return True
+        self._ensure_thread()
+        if self._pending_count() >= self.batch_size:
+            self._cond.notify()
+        return False
+
+    def pending_settings(self, user_id: str) -> dict:
+        """아직 DB에 기록되지 않은 해당 사용자의 설정 값 {키: 값}"""
+        with self._cond:
+            pending = {key: value for (uid, key), value in self._inflight_settings.items() if uid == user_id}
+            pending.update({key: value for (uid, key), value in self._settings.items() if uid == user_id})
+        return pending
+
+    def pending_searches(self, user_id: str):
+        """아직 DB에 기록되지 않은 해당 사용자의 조회 기록 (오래된 것부터)"""
+        with self._cond:
+            return [s for s in self._inflight_searches + self._searches if s[0] == user_id]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and self._pending_count() < self.batch_size:
+                    self._cond.wait(self.flush_seconds)
+                if self._closed:
+                    return
+            self.flush()
+
+    def flush(self):
+        """대기 중인 쓰기를 한 트랜잭션으로 기록합니다. 실패하면 건별로 다시 시도합니다."""
+        with self._flush_lock:
+            with self._cond:
+                if not self._pending_count():
+                    return
+                searches, self._searches = self._searches, []
+                settings, self._settings = dict(self._settings), OrderedDict()
+                self._inflight_searches, self._inflight_settings = searches, settings
+            try:
+                try:
+                    with db_connection() as conn, conn:
+                        if searches:
+                            _write_searches(conn, searches)
+                        if settings:
+                            _write_settings(conn, [key + (value,) for key, value in settings.items()])
+                    logger.debug(f"Flushed {len(searches)} searches and {len(settings)} settings.")
+                except (sqlite3.Error, TypeError, ValueError) as e:
+                    # TypeError/ValueError: JSON으로 바꿀 수 없는 설정 값. 건별 기록으로 그 값만 버립니다.
+                    logger.error(f"Error flushing batched writes, retrying one by one: {e}")
+                    self._write_individually(searches, settings)
+            finally:
+                with self._cond:
+                    self._inflight_searches, self._inflight_settings = [], {}
+
+    def _write_individually(self, searches, settings):
+        for search in searches:
+            try:
+                with db_connection() as conn, conn:
+                    _write_searches(conn, [search])
+            except sqlite3.Error as e:
+                logger.error(f"Error saving user search {search[:2]}: {e}")
+        for (user_id, setting_key), setting_value in settings.items():
+            try:
+                with db_connection() as conn, conn:
+                    _write_settings(conn, [(user_id, setting_key, setting_value)])
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                logger.error(f"Error saving user setting for {user_id}, key {setting_key}: {e}")
+
+    def close(self):
+        """백그라운드 스레드를 멈추고 남은 쓰기를 모두 기록합니다. (프로세스 종료 시 호출)"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self.flush()
+
+
+_write_queue = _WriteBehindQueue(config.DB_WRITE_FLUSH_MS, config.DB_WRITE_BATCH_SIZE)
+atexit.register(_write_queue.close)
+
+
+def flush_pending_writes():
+    """쓰기 지연 큐에 남은 기록을 즉시 DB에 반영합니다."""
+    _write_queue.flush()
+
 
 def save_user_search(user_id: str, stock_code: str, company_name: str = None):
-    """사용자의 종목 검색 기록을 저장합니다."""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-        INSERT INTO user_search_history (user_id, stock_code, company_name)
-        VALUES (?, ?, ?)
-        """, (user_id, stock_code, company_name))
-        conn.commit()
-        logger.info(f"Saved search for user {user_id}, stock {stock_code} ({company_name})")
-    except sqlite3.Error as e:
-        logger.error(f"Error saving user search: {e}")
-    finally:
-        if conn:
-            conn.close()
+    """사용자의 종목 검색 기록을 쓰기 지연 큐에 넣습니다. (기록은 백그라운드에서 일괄 처리)"""
+    _write_queue.put_search(user_id, stock_code, company_name)
+    logger.info(f"Queued search for user {user_id}, stock {stock_code} ({company_name})")
 
 def get_user_history(user_id: str, limit: int = 10):
     """특정 사용자의 최근 검색 기록을 가져옵니다. (종목 코드 중복 제거, 가장 최근 검색 기준)"""
+    pending = _write_queue.pending_searches(user_id)
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        # 서브쿼리를 사용하여 각 stock_code별 가장 최근 search_timestamp를 찾고,
-        # 이를 기준으로 원래 테이블에서 해당 레코드를 가져옴
-        # 또한, company_name이 NULL이거나 비어있지 않은 경우를 우선적으로 가져오도록 COALESCE와 CASE 사용
-        query = """
-        SELECT t1.stock_code, 
-               COALESCE(NULLIF(t1.company_name, ''), '이름없음') as company_name, 
-               t1.search_timestamp
-        FROM user_search_history t1
-        INNER JOIN (
-            SELECT 
-                stock_code, 
-                MAX(search_timestamp) as max_ts
-            FROM user_search_history
+        with db_connection() as conn:
+            # 종목별 최근 1건만 유지하는 user_recent_stocks를 (user_id, search_timestamp) 인덱스 순서대로 읽습니다.
+            history = conn.execute("""
+            SELECT stock_code,
+                   COALESCE(NULLIF(company_name, ''), '이름없음') as company_name,
+                   search_timestamp
+            FROM user_recent_stocks
             WHERE user_id = ?
-            GROUP BY stock_code
-        ) t2 ON t1.stock_code = t2.stock_code AND t1.search_timestamp = t2.max_ts
-        WHERE t1.user_id = ? 
-        ORDER BY t1.search_timestamp DESC
-        LIMIT ?
-        """
-        cursor.execute(query, (user_id, user_id, limit)) # user_id가 두 번 필요
-        
-        history = cursor.fetchall()
-        logger.debug(f"Fetched user history for {user_id} (limit {limit}): {len(history)} items.")
-        return [dict(row) for row in history]
+            ORDER BY search_timestamp DESC
+            LIMIT ?
+            """, (user_id, limit + len(pending))).fetchall()
     except sqlite3.Error as e:
         logger.error(f"Error fetching user history for {user_id}: {e}")
-        return []
-    finally:
-        if conn:
-            conn.close()
+        history = []
 
-def save_user_setting(user_id: str, setting_key: str, setting_value):
-    conn = get_db_connection()
+    # 아직 기록되지 않은 조회를 덮어써서 같은 세션에서 방금 조회한 종목이 바로 보이게 합니다.
+    latest = {row['stock_code']: dict(row) for row in history}
+    for _, stock_code, company_name, timestamp in pending:
+        latest[stock_code] = {'stock_code': stock_code, 'company_name': company_name or '이름없음',
+                              'search_timestamp': timestamp}
+    merged = sorted(latest.values(), key=lambda row: row['search_timestamp'], reverse=True)[:limit]
+    logger.debug(f"Fetched user history for {user_id} (limit {limit}): {len(merged)} items.")
+    return merged
+
+# 사용자별 전체 설정 캐시 (한 번의 쿼리로 읽어 두고 쓰기 시 함께 갱신)
+_settings_cache = get_cache_namespace("db_handler.user_settings", ttl=config.SETTINGS_CACHE_SECONDS,
+                                      max_entries=config.SETTINGS_CACHE_MAX_USERS)
+# 캐시 적재(DB 읽기)와 쓰기(큐 적재 + 캐시 갱신)가 서로 끼어들지 않도록 묶는 잠금
+_settings_lock = threading.RLock()
+
+
+def _load_user_settings(user_id: str) -> dict:
     try:
-        conn.execute("INSERT OR IGNORE INTO user_settings (user_id) VALUES (?)", (user_id,))
-        conn.execute(f"UPDATE user_settings SET {setting_key} = ? WHERE user_id = ?", 
-                     (setting_value, user_id))
-        conn.commit()
-        logger.info(f"Setting '{setting_key}' saved for user {user_id} with value '{setting_value}'")
-    except sqlite3.Error as e:
-        if "no such column" in str(e):
-            logger.warning(f"Column {setting_key} not found for user {user_id}. Attempting to add it.")
-            try:
-                conn.execute(f"ALTER TABLE user_settings ADD COLUMN {setting_key} INTEGER") # 타입은 적절히 지정
-                conn.commit()
-                conn.execute(f"UPDATE user_settings SET {setting_key} = ? WHERE user_id = ?", 
-                             (setting_value, user_id))
-                conn.commit()
-                logger.info(f"Column {setting_key} added and setting saved for user {user_id}")
-            except sqlite3.Error as e_alter:
-                logger.error(f"Error adding column or saving user setting for {user_id} after alter: {e_alter}")
-        else:
-            logger.error(f"Error saving user setting for {user_id}, key {setting_key}: {e}")
-    finally:
-        if conn:
-            conn.close()
+        with db_connection() as conn:
+            rows = conn.execute("SELECT setting_key, setting_value FROM user_settings_kv WHERE user_id = ?",
+                                (user_id,)).fetchall()
+        settings = {row['setting_key']: json.loads(row['setting_value']) for row in rows
+                    if row['setting_value'] is not None}
+    except (sqlite3.Error, ValueError) as e:
+        logger.error(f"Error loading user settings for {user_id}: {e}")
+        settings = {}
+    # 아직 기록되지 않은 변경을 덮어써서 같은 세션의 읽기가 방금 쓴 값을 보게 합니다.
+    settings.update(_write_queue.pending_settings(user_id))
+    logger.debug(f"Loaded {len(settings)} settings for user {user_id}")
+    return settings
+
+
+def get_user_settings(user_id: str) -> dict:
+    """사용자의 전체 설정을 {키: 값}으로 반환합니다. 캐시에 있으면 DB를 읽지 않습니다."""
+    with _settings_lock:
+        settings = _settings_cache.get(user_id, None)
+        if settings is None:
+            settings = _load_user_settings(user_id)
+            _settings_cache.set(user_id, settings)
+        return dict(settings)
+
+
+def save_user_settings(user_id: str, settings: dict):
+    """
+    여러 설정을 한 번에 저장합니다. (쓰기 지연 큐에 넣고 캐시를 바로 갱신)
+    JSON으로 저장할 수 없는 값(date, set 등)은 큐에 넣기 전에 TypeError를 올립니다.
+    """
+    for setting_key, setting_value in settings.items():
+        try:
+            json.dumps(setting_value, ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            raise TypeError(f"설정 '{setting_key}' 값을 JSON으로 저장할 수 없습니다: {e}") from e
+    with _settings_lock:
+        for setting_key, setting_value in settings.items():
+            _write_queue.put_setting(user_id, setting_key, setting_value)
+        cached = _settings_cache.get(user_id, None)
+        if cached is not None:
+            _settings_cache.set(user_id, {**cached, **settings})
+    logger.info(f"Settings {list(settings)} queued for user {user_id}")
+
+def save_user_setting(user_id: str, setting_key: str, setting_value):
+    """설정 하나를 저장합니다. 같은 키의 연속 변경은 마지막 값만 기록됩니다."""
+    save_user_settings(user_id, {setting_key: setting_value})
 
 def get_user_setting(user_id: str, setting_key: str, default_value=None):
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor()
-        cursor.execute(f"SELECT {setting_key} FROM user_settings WHERE user_id = ?", (user_id,))
-        row = cursor.fetchone()
-        
-        if row and setting_key in row.keys() and row[setting_key] is not None:
-            logger.debug(f"Retrieved setting '{setting_key}' for user {user_id}: {row[setting_key]}")
-            return row[setting_key]
-        logger.debug(f"No setting '{setting_key}' found for user {user_id}, returning default: {default_value}")
-        return default_value
-            
-    except sqlite3.Error as e:
-        if "no such column" in str(e):
-            logger.warning(f"Column {setting_key} not found for user {user_id}. Returning default value.")
-            return default_value
-        logger.error(f"Error getting user setting for {user_id}, key {setting_key}: {e}")
-        return default_value
-    finally:
-        if conn:
-            conn.close()
+    value = get_user_settings(user_id).get(setting_key)
+    return value if value is not None else default_value
+
+def invalidate_user_settings(user_id: Optional[str] = None):
+    """설정 캐시를 비웁니다. (다른 프로세스가 DB를 직접 바꾼 경우 등)"""
+    if user_id is None:
+        _settings_cache.clear()
+    else:
+        _settings_cache.invalidate(user_id)
 
 # 애플리케이션 시작 시 DB 초기화 호출
-init_db()
\ No newline at end of file
+init_db()
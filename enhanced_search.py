@@ -1,7 +1,7 @@
 import streamlit as st
-import pandas as pd
 from typing import Optional, List, Tuple
-from data_fetcher import get_krx_stock_list
+from symbol_master import get_symbol_master
+from search_index import StockSearchIndex
 
 try:
     from streamlit_searchbox import st_searchbox
@@ -11,34 +11,16 @@ except ImportError:
     st.info("⬆️ 위 명령어를 터미널에 입력하여 설치 후 앱을 다시 실행해주세요.")
     st.stop()
 
-@st.cache_data(ttl=3600)
-def _load_search_data() -> pd.DataFrame:
-    """검색을 위한 주식 데이터를 로드하고 캐시합니다."""
-    krx_df = get_krx_stock_list()
-    if krx_df.empty:
-        return pd.DataFrame()
-    krx_df['display_name'] = krx_df['Name'] + ' (' + krx_df['Symbol'] + ')'
-    return krx_df
+@st.cache_resource(ttl=3600)
+def _load_search_index() -> StockSearchIndex:
+    """공용 종목 마스터로 검색 인덱스를 한 번 만들고 모든 세션이 공유합니다."""
+    return StockSearchIndex(get_symbol_master().items())
 
 def _search_stocks(searchterm: str) -> List[Tuple[str, str]]:
     """입력된 검색어에 따라 주식을 필터링하는 내부 함수"""
     if not searchterm or len(searchterm) < 1:
         return []
-    
-    stock_df = _load_search_data()
-    if stock_df.empty:
-        return []
-    
-    filtered_df = stock_df[
-        stock_df['Name'].str.contains(searchterm, case=False, na=False) |
-        stock_df['Symbol'].str.contains(searchterm, case=False, na=False)
-    ]
-    
-    results = []
-    for _, row in filtered_df.head(15).iterrows():
-        results.append((row['display_name'], row['Symbol']))
-    
-    return results
+    return _load_search_index().search(searchterm, limit=15)
 
 def unified_stock_search() -> Optional[str]:
     """
@@ -46,9 +28,9 @@ def unified_stock_search() -> Optional[str]:
     데이터 로드 실패 시, 종목 코드를 직접 입력하는 대체(Fallback) 모드를 제공합니다.
     streamlit-searchbox의 다양한 반환값 유형(튜플, 문자열)을 모두 처리합니다.
     """
-    stock_df = _load_search_data()
+    search_index = _load_search_index()
 
-    if stock_df.empty:
+    if len(search_index) == 0:
         # 데이터 로딩 실패 시 대체 입력창 제공
         st.warning("전체 종목 목록 로딩에 실패하여 종목명 검색을 사용할 수 없습니다.")
         fallback_code = st.text_input(
@@ -65,7 +47,7 @@ def unified_stock_search() -> Optional[str]:
     # 데이터 로딩 성공 시 자동완성 검색창 표시
     selected_value = st_searchbox(
         search_function=_search_stocks,
-        placeholder="회사명 또는 종목코드 입력 (예: 삼성)",
+        placeholder="회사명, 종목코드 또는 초성 입력 (예: 삼성, ㅅㅅㅈㅈ)",
         label="종목 검색",
         help="💡 검색어를 입력하면 관련 종목이 아래에 표시됩니다.",
         key="unified_stock_searchbox",
@@ -1,59 +1,260 @@
+import re
+from typing import Dict, Optional
 
+import numpy as np
 import pandas as pd
 from utils import get_logger
 
 logger = get_logger(__name__)
 
+# 지표별 계정 정의: IFRS account_id를 우선 사용하고, 없으면 정규화된 계정명과 '정확히' 일치하는 행을 사용합니다.
+# sj_div는 허용하는 재무제표 구분이며 앞쪽이 우선입니다. (BS 재무상태표, IS 손익계산서, CIS 포괄손익계산서)
+ACCOUNT_DEFINITIONS = {
+    'assets': {
+        'ids': ['ifrs-full_Assets', 'ifrs_Assets'],
+        'names': ['자산총계'],
+        'sj_div': ['BS'],
+    },
+    'current_assets': {
+        'ids': ['ifrs-full_CurrentAssets', 'ifrs_CurrentAssets'],
+        'names': ['유동자산'],
+        'sj_div': ['BS'],
+    },
+    'liabilities': {
+        'ids': ['ifrs-full_Liabilities', 'ifrs_Liabilities'],
+        'names': ['부채총계'],
+        'sj_div': ['BS'],
+    },
+    'current_liabilities': {
+        'ids': ['ifrs-full_CurrentLiabilities', 'ifrs_CurrentLiabilities'],
+        'names': ['유동부채'],
+        'sj_div': ['BS'],
+    },
+    'equity': {
+        'ids': ['ifrs-full_Equity', 'ifrs_Equity'],
+        'names': ['자본총계'],
+        'sj_div': ['BS'],
+    },
+    'revenue': {
+        'ids': ['ifrs-full_Revenue', 'ifrs_Revenue'],
+        'names': ['매출액', '수익', '매출', '영업수익'],
+        'sj_div': ['IS', 'CIS'],
+    },
+    'operating_income': {
+        'ids': ['dart_OperatingIncomeLoss'],
+        'names': ['영업이익'],
+        'sj_div': ['IS', 'CIS'],
+    },
+    'net_income': {
+        'ids': ['ifrs-full_ProfitLoss', 'ifrs_ProfitLoss'],
+        'names': ['당기순이익', '연결당기순이익'],
+        'sj_div': ['IS', 'CIS'],
+    },
+    'interest_expense': {
+        'ids': ['ifrs-full_InterestExpense', 'dart_InterestExpense', 'ifrs-full_FinanceCosts'],
+        'names': ['이자비용', '금융비용', '금융원가'],
+        'sj_div': ['IS', 'CIS'],
+    },
+}
+
+# 계정명 정규화: 괄호 안 주석('(손실)', '(매출액)'), 공백, 앞쪽 번호('Ⅰ.', '1.')를 제거합니다.
+_ACCOUNT_NAME_NOISE = re.compile(r'\(.*?\)|\s+|^[0-9ⅠⅡⅢⅣⅤⅥⅦⅧⅨⅩ]+\.')
+
+_ID_LOOKUP = {
+    account_id: (metric, rank)
+    for metric, spec in ACCOUNT_DEFINITIONS.items()
+    for rank, account_id in enumerate(spec['ids'])
+}
+# 계정명 매칭은 항상 account_id 매칭보다 후순위입니다.
+_NAME_LOOKUP = {
+    name: (metric, 100 + rank)
+    for metric, spec in ACCOUNT_DEFINITIONS.items()
+    for rank, name in enumerate(spec['names'])
+}
+_SJ_RANK = {(metric, sj): rank for metric, spec in ACCOUNT_DEFINITIONS.items() for rank, sj in enumerate(spec['sj_div'])}
+
+
+def normalize_account_names(names: pd.Series) -> pd.Series:
+    return names.fillna('').astype(str).str.replace(_ACCOUNT_NAME_NOISE, '', regex=True)
+
+
+def tag_accounts(financial_df: pd.DataFrame, amount_col: str = 'thstrm_amount') -> pd.DataFrame:
+    """
+    재무제표 각 행에 지표 키(metric)와 우선순위(priority, 낮을수록 우선)를 붙여,
+    지표에 해당하는 행만 남긴 DataFrame을 반환합니다. 전체를 한 번만 훑는 벡터 연산입니다.
+    """
+    if financial_df.empty or amount_col not in financial_df.columns:
+        return financial_df.iloc[0:0].assign(metric=pd.Series(dtype=object), priority=pd.Series(dtype=float))
+
+    n = len(financial_df)
+    if 'account_id' in financial_df.columns:
+        by_id = financial_df['account_id'].map(_ID_LOOKUP)
+    else:
+        by_id = pd.Series([np.nan] * n, index=financial_df.index, dtype=object)
+    by_name = normalize_account_names(financial_df['account_nm']).map(_NAME_LOOKUP) \
+        if 'account_nm' in financial_df.columns else pd.Series([np.nan] * n, index=financial_df.index, dtype=object)
+    match = by_id.where(by_id.notna(), by_name)
+
+    matched = match.notna() & pd.to_numeric(financial_df[amount_col], errors='coerce').notna()
+    tagged = financial_df[matched].copy()
+    tagged['metric'] = [m[0] for m in match[matched]]
+    tagged['priority'] = [m[1] for m in match[matched]]
+
+    if 'sj_div' in tagged.columns:
+        sj_rank = pd.Series(list(zip(tagged['metric'], tagged['sj_div'])), index=tagged.index).map(_SJ_RANK)
+        tagged = tagged[sj_rank.notna()]
+        tagged['priority'] = tagged['priority'] * 10 + sj_rank[sj_rank.notna()]
+    return tagged
+
+
+def _to_float(value) -> float:
+    value = pd.to_numeric(value, errors='coerce')
+    return np.nan if value is None or pd.isna(value) else float(value)
+
+
+def build_account_index(financial_df: pd.DataFrame) -> Dict[str, Dict[str, float]]:
+    """
+    재무제표 하나에 대해 지표 키 -> {'current': 당기 금액, 'prior': 전기 금액} 인덱스를 만듭니다.
+    같은 지표에 여러 행이 있으면 우선순위가 가장 높은(같으면 먼저 나온) 행을 사용합니다.
+    """
+    tagged = tag_accounts(financial_df)
+    if tagged.empty:
+        return {}
+    best = tagged.sort_values('priority', kind='stable').drop_duplicates('metric')
+    prior = best['frmtrm_amount'] if 'frmtrm_amount' in best.columns else pd.Series(np.nan, index=best.index)
+    return {
+        metric: {'current': _to_float(current), 'prior': _to_float(previous)}
+        for metric, current, previous in zip(best['metric'], best['thstrm_amount'], prior)
+    }
+
+
+def _safe_divide(numerator, denominator):
+    numerator = pd.to_numeric(numerator, errors='coerce')
+    denominator = pd.to_numeric(denominator, errors='coerce')
+    return numerator / denominator.where(denominator != 0)
+
+
+def compute_ratio_columns(amounts: pd.DataFrame) -> pd.DataFrame:
+    """
+    지표 금액 컬럼(예: 'equity', 'equity_prior')을 가진 DataFrame에서 재무비율 컬럼들을 벡터 연산으로 계산합니다.
+    행이 회사 × 연도이면 여러 회사/연도의 비율을 한 번에 계산합니다. 계산할 수 없는 값은 NaN입니다.
+    """
+    def col(name):
+        return amounts[name] if name in amounts.columns else pd.Series(np.nan, index=amounts.index)
+
+    def growth(name):
+        prior = col(f"{name}_prior")
+        return _safe_divide(col(name) - prior, prior.abs()) * 100
+
+    return pd.DataFrame({
+        "ROE (%)": _safe_divide(col('net_income'), col('equity')) * 100,
+        "부채비율 (%)": _safe_divide(col('liabilities'), col('equity')) * 100,
+        "매출액": pd.to_numeric(col('revenue'), errors='coerce'),
+        "영업이익률 (%)": _safe_divide(col('operating_income'), col('revenue')) * 100,
+        "순이익률 (%)": _safe_divide(col('net_income'), col('revenue')) * 100,
+        "ROA (%)": _safe_divide(col('net_income'), col('assets')) * 100,
+        "유동비율 (%)": _safe_divide(col('current_assets'), col('current_liabilities')) * 100,
+        "이자보상배율 (배)": _safe_divide(col('operating_income'), col('interest_expense').abs()),
+        "매출액 증가율 (%)": growth('revenue'),
+        "영업이익 증가율 (%)": growth('operating_income'),
+        "순이익 증가율 (%)": growth('net_income'),
+    }, index=amounts.index)
+
+
+def _to_scalar(value) -> Optional[float]:
+    return None if pd.isna(value) else float(value)
+
+
 def calculate_financial_ratios(financial_df: pd.DataFrame) -> dict:
     """
     DART에서 수신한 재무제표 df를 기반으로 주요 재무 지표 계산
-    - ROE: 순이익 / 자기자본
-    - 부채비율: 부채총계 / 자본총계
-    - 매출액: 직접 반환
+    - ROE: 순이익 / 자기자본, 부채비율: 부채총계 / 자본총계, 매출액: 직접 반환
+    - 영업이익률, 순이익률, ROA, 유동비율, 이자보상배율, 전년 대비 증가율(매출액/영업이익/순이익)
+    계정은 account_id 우선, 정규화된 계정명 정확 일치로 한 번에 찾습니다.
     """
     try:
         logger.info("Calculating financial ratios...")
 
-        # 주요 지표 추출을 위한 키워드
-        equity_keywords = ["자본총계", "총자본", "자본"]
-        debt_keywords = ["부채총계", "총부채", "부채"]
-        net_income_keywords = ["당기순이익", "순이익"]
-        sales_keywords = ["매출", "수익", "영업수익", "매출액", "매출수익"]
-
-        def find_amount_by_keywords(keywords):
-            for keyword in keywords:
-                row = financial_df[financial_df['account_nm'].str.contains(keyword, case=False, na=False)]
-                if not row.empty:
-                    # 가장 최근 항목 하나만
-                    amount = row.iloc[0].get('thstrm_amount', None)
-                    if pd.notna(amount):
-                        return amount
-            return None
-
-        equity = find_amount_by_keywords(equity_keywords)
-        debt = find_amount_by_keywords(debt_keywords)
-        net_income = find_amount_by_keywords(net_income_keywords)
-        sales = find_amount_by_keywords(sales_keywords)
-
-        # 금액들이 문자열로 들어오면 숫자형으로
-        equity = pd.to_numeric(equity, errors="coerce")
-        debt = pd.to_numeric(debt, errors="coerce")
-        net_income = pd.to_numeric(net_income, errors="coerce")
-        sales = pd.to_numeric(sales, errors="coerce")
-
-        logger.info(f"Calculated - Sales: {sales}, Net Income: {net_income}, Total Equity: {equity}, Total Debt: {debt}")
-
-        roe = (net_income / equity) * 100 if equity and net_income is not None and equity != 0 else 0.0
-        debt_ratio = (debt / equity) * 100 if equity and debt is not None and equity != 0 else 0.0
-
-        logger.info(f"Calculated ratios - ROE: {roe}, Debt Ratio: {debt_ratio}")
-
-        return {
-            "ROE (%)": roe,
-            "부채비율 (%)": debt_ratio,
-            "매출액": sales
-        }
+        index = build_account_index(financial_df)
+        amounts = {metric: values['current'] for metric, values in index.items()}
+        amounts.update({f"{metric}_prior": values['prior'] for metric, values in index.items()})
+        ratios = compute_ratio_columns(pd.DataFrame([amounts])).iloc[0]
+
+        logger.info(f"Resolved accounts: { {k: v['current'] for k, v in index.items()} }")
+
+        result = {key: _to_scalar(value) for key, value in ratios.items()}
+        # 기존 화면(게이지 차트)과의 호환을 위해 ROE/부채비율은 계산할 수 없으면 0.0으로 둡니다.
+        result["ROE (%)"] = result["ROE (%)"] if result["ROE (%)"] is not None else 0.0
+        result["부채비율 (%)"] = result["부채비율 (%)"] if result["부채비율 (%)"] is not None else 0.0
+
+        logger.info(f"Calculated ratios - ROE: {result['ROE (%)']}, Debt Ratio: {result['부채비율 (%)']}")
+        return result
 
     except Exception as e:
         logger.error(f"Error in calculating financial ratios: {e}", exc_info=True)
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
+
+
+# 패널 계산의 (회사, 연도, 보고서) 키. 입력에 없는 키 컬럼은 무시합니다.
+PANEL_KEYS = ['corp_code', 'bsns_year', 'reprt_code']
+
+
+def calculate_ratio_panel(statement_df: pd.DataFrame, fs_div: str = "CFS") -> pd.DataFrame:
+    """
+    N개 회사 × M개 연도의 long-format 재무제표(fnlttSinglAcntAll 누적분, fnlttMultiAcnt 패널,
+    financial_store.load_statement_panel 결과 등)에서 (회사, 연도, 보고서)별 재무비율 표를 한 번에 계산합니다.
+
+    - 같은 보고서에 연결(CFS)/별도(OFS)가 함께 있으면 fs_div를 우선 사용하고, 없을 때만 다른 쪽을 사용합니다.
+    - 계정 매칭 규칙은 calculate_financial_ratios와 같습니다. (account_id 우선, 정규화된 계정명 정확 일치)
+    - 반환: PANEL_KEYS(+ corp_name) 컬럼과 compute_ratio_columns의 비율 컬럼. 계산할 수 없는 값은 NaN입니다.
+    """
+    keys = [key for key in PANEL_KEYS if key in statement_df.columns]
+    if statement_df.empty or 'corp_code' not in keys:
+        return pd.DataFrame()
+
+    df = statement_df
+    if 'fs_div' in df.columns:
+        # 보고서별로 선호하는 재무제표 구분(0)이 있으면 그것만, 없으면 나머지(1)를 남깁니다.
+        fs_rank = (df['fs_div'] != fs_div).astype(int)
+        df = df[fs_rank == fs_rank.groupby([df[key] for key in keys]).transform('min')]
+
+    tagged = tag_accounts(df)
+    if tagged.empty:
+        return pd.DataFrame(columns=keys)
+    best = tagged.sort_values('priority', kind='stable').drop_duplicates(keys + ['metric'])
+    if 'frmtrm_amount' not in best.columns:
+        best = best.assign(frmtrm_amount=np.nan)
+    best = best.assign(
+        thstrm_amount=pd.to_numeric(best['thstrm_amount'], errors='coerce'),
+        frmtrm_amount=pd.to_numeric(best['frmtrm_amount'], errors='coerce'),
+    )
+
+    wide = best.pivot_table(index=keys, columns='metric', values=['thstrm_amount', 'frmtrm_amount'], aggfunc='first')
+    amounts = wide['thstrm_amount'].join(wide['frmtrm_amount'].add_suffix('_prior'))
+    panel = compute_ratio_columns(amounts).reset_index()
+
+    if 'corp_name' in df.columns:
+        names = df.drop_duplicates('corp_code').set_index('corp_code')['corp_name']
+        panel.insert(1, 'corp_name', panel['corp_code'].map(names))
+    logger.info(f"Calculated ratio panel: {panel['corp_code'].nunique()} companies, {len(panel)} rows")
+    return panel.sort_values(keys, kind='stable').reset_index(drop=True)
+
+
+def rank_ratio_panel(panel: pd.DataFrame, ratio: str = "ROE (%)", ascending: bool = False,
+                     top: Optional[int] = None) -> pd.DataFrame:
+    """
+    calculate_ratio_panel 결과를 (연도, 보고서)별로 ratio 기준 순위를 매깁니다.
+    'rank'(1이 최상위)와 'percentile'(0~100, 높을수록 상위) 컬럼을 추가하고, top을 주면 그룹별 상위 N개만 남깁니다.
+    값이 없는 회사는 순위에서 제외합니다.
+    """
+    if panel.empty or ratio not in panel.columns:
+        return panel
+    groups = [key for key in ('bsns_year', 'reprt_code') if key in panel.columns]
+    ranked = panel[panel[ratio].notna()].copy()
+    grouped = ranked.groupby(groups)[ratio] if groups else ranked[ratio]
+    ranked['rank'] = grouped.rank(ascending=ascending, method='min').astype(int)
+    ranked['percentile'] = grouped.rank(ascending=not ascending, pct=True) * 100
+    ranked = ranked.sort_values(groups + ['rank'], kind='stable')
+    if top is not None:
+        ranked = ranked[ranked['rank'] <= top]
+    return ranked.reset_index(drop=True)
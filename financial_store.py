@@ -0,0 +1,169 @@
+import sqlite3
+import time
+from typing import Iterable, Optional
+
+import pandas as pd
+
+import config
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# fnlttSinglAcntAll 응답 중 저장하는 컬럼 (키 컬럼 제외)
+STATEMENT_TEXT_COLUMNS = ['rcept_no', 'sj_div', 'sj_nm', 'account_id', 'account_nm', 'account_detail',
+                          'thstrm_nm', 'frmtrm_nm', 'frmtrm_q_nm', 'bfefrmtrm_nm', 'currency']
+STATEMENT_AMOUNT_COLUMNS = ['thstrm_amount', 'thstrm_add_amount', 'frmtrm_amount', 'frmtrm_q_amount',
+                            'frmtrm_add_amount', 'bfefrmtrm_amount']
+_KEY_COLUMNS = ['corp_code', 'bsns_year', 'reprt_code', 'fs_div']
+
+
+def get_connection():
+    conn = sqlite3.connect(config.FINANCIAL_DB_NAME, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    text_defs = ',\n        '.join(f"{col} TEXT" for col in STATEMENT_TEXT_COLUMNS)
+    amount_defs = ',\n        '.join(f"{col} REAL" for col in STATEMENT_AMOUNT_COLUMNS)
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS financial_statements (
+        corp_code TEXT NOT NULL,
+        bsns_year TEXT NOT NULL,
+        reprt_code TEXT NOT NULL,
+        fs_div TEXT NOT NULL,
+        row_no INTEGER NOT NULL,
+        ord INTEGER,
+        {text_defs},
+        {amount_defs},
+        PRIMARY KEY (corp_code, bsns_year, reprt_code, fs_div, row_no)
+    ) WITHOUT ROWID
+    """)
+    conn.execute("""
+    CREATE INDEX IF NOT EXISTS idx_financial_statements_account
+    ON financial_statements (account_id, bsns_year)
+    """)
+    # 보고서 단위 수집 이력. 'filed'는 불변으로 취급하고, 'missing'은 일정 시간 뒤 다시 확인합니다.
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS financial_fetch_log (
+        corp_code TEXT NOT NULL,
+        bsns_year TEXT NOT NULL,
+        reprt_code TEXT NOT NULL,
+        fs_div TEXT NOT NULL,
+        status TEXT NOT NULL,
+        message TEXT,
+        fetched_at REAL,
+        PRIMARY KEY (corp_code, bsns_year, reprt_code, fs_div)
+    )
+    """)
+    return conn
+
+
+def _coerce_amounts(df: pd.DataFrame) -> pd.DataFrame:
+    for col in STATEMENT_AMOUNT_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+def _key(corp_code: str, year, report_code: str, fs_div: str):
+    return (corp_code, str(year), report_code, fs_div)
+
+
+def get_fetch_status(corp_code: str, year, report_code: str, fs_div: str):
+    """(status, message, fetched_at) 또는 None"""
+    conn = get_connection()
+    try:
+        return conn.execute(
+            "SELECT status, message, fetched_at FROM financial_fetch_log "
+            "WHERE corp_code = ? AND bsns_year = ? AND reprt_code = ? AND fs_div = ?",
+            _key(corp_code, year, report_code, fs_div)
+        ).fetchone()
+    finally:
+        conn.close()
+
+
+def get_statement(corp_code: str, year, report_code: str, fs_div: str) -> Optional[pd.DataFrame]:
+    """저장된(공시 완료된) 재무제표를 반환합니다. 저장된 적이 없으면 None."""
+    status = get_fetch_status(corp_code, year, report_code, fs_div)
+    if not status or status[0] != 'filed':
+        return None
+    columns = _KEY_COLUMNS + ['ord'] + STATEMENT_TEXT_COLUMNS + STATEMENT_AMOUNT_COLUMNS
+    conn = get_connection()
+    try:
+        df = pd.read_sql_query(
+            f"SELECT {', '.join(columns)} FROM financial_statements "
+            "WHERE corp_code = ? AND bsns_year = ? AND reprt_code = ? AND fs_div = ? ORDER BY row_no",
+            conn, params=_key(corp_code, year, report_code, fs_div)
+        )
+    finally:
+        conn.close()
+    return _coerce_amounts(df)
+
+
+def is_recently_missing(corp_code: str, year, report_code: str, fs_div: str) -> Optional[str]:
+    """최근에 '데이터 없음'으로 확인된 보고서면 그때의 메시지를, 아니면 None을 반환합니다."""
+    status = get_fetch_status(corp_code, year, report_code, fs_div)
+    if status and status[0] == 'missing' and time.time() - (status[2] or 0) < config.FINANCIAL_MISSING_RETRY_SECONDS:
+        return status[1]
+    return None
+
+
+def save_statement(corp_code: str, year, report_code: str, fs_div: str, df: pd.DataFrame):
+    """공시된 재무제표를 저장합니다. 이후 같은 보고서는 다시 내려받지 않습니다."""
+    key = _key(corp_code, year, report_code, fs_div)
+    frame = df.reindex(columns=['ord'] + STATEMENT_TEXT_COLUMNS + STATEMENT_AMOUNT_COLUMNS)
+    frame['ord'] = pd.to_numeric(frame['ord'], errors='coerce')
+    frame = frame.astype(object).where(frame.notna(), None)
+    rows = [key + (row_no,) + tuple(values) for row_no, values in enumerate(frame.itertuples(index=False, name=None))]
+    placeholders = ', '.join(['?'] * (len(_KEY_COLUMNS) + 2 + len(STATEMENT_TEXT_COLUMNS) + len(STATEMENT_AMOUNT_COLUMNS)))
+
+    conn = get_connection()
+    try:
+        with conn:
+            conn.execute(
+                "DELETE FROM financial_statements WHERE corp_code = ? AND bsns_year = ? AND reprt_code = ? AND fs_div = ?",
+                key
+            )
+            conn.executemany(
+                f"INSERT INTO financial_statements ({', '.join(_KEY_COLUMNS)}, row_no, ord, "
+                f"{', '.join(STATEMENT_TEXT_COLUMNS)}, {', '.join(STATEMENT_AMOUNT_COLUMNS)}) VALUES ({placeholders})",
+                rows
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO financial_fetch_log VALUES (?, ?, ?, ?, 'filed', NULL, ?)",
+                key + (time.time(),)
+            )
+        logger.info(f"재무 저장소: {key} {len(rows)}개 계정 저장")
+    finally:
+        conn.close()
+
+
+def record_missing(corp_code: str, year, report_code: str, fs_div: str, message: str):
+    """DART에 아직 없는 보고서를 기록해 재확인 간격 동안 다시 요청하지 않도록 합니다."""
+    conn = get_connection()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO financial_fetch_log VALUES (?, ?, ?, ?, 'missing', ?, ?)",
+                _key(corp_code, year, report_code, fs_div) + (message, time.time())
+            )
+    finally:
+        conn.close()
+
+
+def load_statement_panel(corp_codes: Optional[Iterable[str]] = None, years: Optional[Iterable] = None,
+                         report_codes: Optional[Iterable[str]] = None, fs_div: str = "CFS") -> pd.DataFrame:
+    """저장된 재무제표를 회사/연도/보고서 조건으로 한 번에 읽어 long-format 패널로 반환합니다."""
+    columns = _KEY_COLUMNS + ['ord'] + STATEMENT_TEXT_COLUMNS + STATEMENT_AMOUNT_COLUMNS
+    query = f"SELECT {', '.join(columns)} FROM financial_statements WHERE fs_div = ?"
+    params = [fs_div]
+    for column, values in (('corp_code', corp_codes), ('bsns_year', years), ('reprt_code', report_codes)):
+        if values is not None:
+            values = [str(v) for v in values]
+            query += f" AND {column} IN ({', '.join(['?'] * len(values))})"
+            params.extend(values)
+    query += " ORDER BY corp_code, bsns_year, reprt_code, row_no"
+
+    conn = get_connection()
+    try:
+        df = pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+    return _coerce_amounts(df)
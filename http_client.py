@@ -0,0 +1,197 @@
+import datetime
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class DartQuotaExceeded(requests.exceptions.RequestException):
+    """DART 일일 호출 한도를 모두 사용했을 때 발생합니다. (기존 RequestException 처리 경로를 그대로 탑니다)"""
+
+
+class TokenBucket:
+    """초당 호출 수를 제한하는 토큰 버킷. 토큰이 없으면 다음 토큰이 찰 때까지 기다립니다."""
+
+    def __init__(self, rate_per_second: float, capacity: Optional[float] = None):
+        self.rate = rate_per_second
+        self.capacity = capacity if capacity is not None else rate_per_second
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """토큰 하나를 가져오고, 기다린 시간(초)을 반환합니다."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class DailyBudget:
+    """하루 호출 한도. 날짜가 바뀌면 초기화됩니다."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._day = datetime.date.today()
+        self._used = 0
+        self._lock = threading.Lock()
+
+    def _roll(self):
+        today = datetime.date.today()
+        if today != self._day:
+            self._day = today
+            self._used = 0
+
+    def consume(self) -> bool:
+        with self._lock:
+            self._roll()
+            if self._used >= self.limit:
+                return False
+            self._used += 1
+            return True
+
+    @property
+    def remaining(self) -> int:
+        with self._lock:
+            self._roll()
+            return self.limit - self._used
+
+
+class HttpClient:
+    """
+    keep-alive 세션 풀을 공유하는 HTTP 클라이언트. base_url을 주면 get()의 url은 그 뒤에 붙는 경로입니다.
+    5xx/429/타임아웃/연결 오류는 지터가 섞인 지수 백오프로 재시도하고, 선택적으로 초당/일일 호출 한도를 적용합니다.
+    """
+
+    def __init__(self, name: str, pool_size: int = 8, max_retries: int = 3, backoff_base: float = 0.5,
+                 backoff_max: float = 8.0, rate_per_second: Optional[float] = None, daily_limit: Optional[int] = None,
+                 base_url: str = ""):
+        self.name = name
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limiter = TokenBucket(rate_per_second) if rate_per_second else None
+        self.daily_budget = DailyBudget(daily_limit) if daily_limit else None
+        self._sessions: "queue.LifoQueue[requests.Session]" = queue.LifoQueue(maxsize=pool_size)
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            'requests': 0, 'errors': 0, 'retries': 0, 'throttle_wait_seconds': 0.0,
+            'latency_total_seconds': 0.0, 'latency_max_seconds': 0.0, 'quota_rejections': 0,
+        }
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({"Accept-Encoding": "gzip, deflate"})
+        return session
+
+    @contextmanager
+    def _session(self):
+        try:
+            session = self._sessions.get_nowait()
+        except queue.Empty:
+            session = self._new_session()
+        try:
+            yield session
+        finally:
+            try:
+                self._sessions.put_nowait(session)
+            except queue.Full:
+                session.close()
+
+    def _record(self, **changes):
+        with self._metrics_lock:
+            for key, value in changes.items():
+                if key == 'latency_max_seconds':
+                    self._metrics[key] = max(self._metrics[key], value)
+                else:
+                    self._metrics[key] += value
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None,
+            timeout: float = 15) -> requests.Response:
+        """
+        GET 요청을 보냅니다. 재시도 후에도 실패하면 requests 예외를 그대로 올립니다.
+        응답 상태코드 검사(raise_for_status)는 호출자가 합니다. (304 등 조건부 응답 처리를 위해)
+        """
+        for attempt in range(self.max_retries + 1):
+            # 재시도도 서버 호출이므로 한도에서 차감합니다.
+            if self.daily_budget is not None and not self.daily_budget.consume():
+                self._record(quota_rejections=1)
+                raise DartQuotaExceeded(f"{self.name}: 일일 호출 한도({self.daily_budget.limit}회)를 모두 사용했습니다.")
+            if self.rate_limiter is not None:
+                self._record(throttle_wait_seconds=self.rate_limiter.acquire())
+            started = time.perf_counter()
+            try:
+                with self._session() as session:
+                    response = session.get(self.base_url + url, params=params, headers=headers, timeout=timeout)
+                elapsed = time.perf_counter() - started
+                self._record(requests=1, latency_total_seconds=elapsed, latency_max_seconds=elapsed)
+                if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    return response
+                reason = f"HTTP {response.status_code}"
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self._record(requests=1, errors=1, latency_total_seconds=time.perf_counter() - started)
+                if attempt == self.max_retries:
+                    raise
+                reason = str(e)
+
+            delay = self._backoff(attempt)
+            self._record(retries=1)
+            logger.warning(f"{self.name}: 요청 실패({reason}), {delay:.2f}초 후 재시도 ({attempt + 1}/{self.max_retries})")
+            time.sleep(delay)
+
+    def metrics(self) -> Dict[str, Any]:
+        """호출 수, 오류/재시도 수, 지연 시간, 남은 일일 한도를 반환합니다."""
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        metrics['latency_avg_seconds'] = (
+            metrics['latency_total_seconds'] / metrics['requests'] if metrics['requests'] else 0.0
+        )
+        metrics['quota_remaining_today'] = self.daily_budget.remaining if self.daily_budget else None
+        return metrics
+
+
+# DART OpenAPI 전용 클라이언트 (프로세스 내 모든 세션이 한도를 공유합니다)
+dart_client = HttpClient(
+    "DART",
+    pool_size=config.HTTP_POOL_SIZE,
+    max_retries=config.HTTP_MAX_RETRIES,
+    backoff_base=config.HTTP_BACKOFF_BASE_SECONDS,
+    rate_per_second=config.DART_CALLS_PER_SECOND,
+    daily_limit=config.DART_DAILY_CALL_LIMIT,
+    base_url=config.DART_BASE_URL,
+)
+
+
+def dart_get(path: str, params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None,
+             timeout: float = 15) -> requests.Response:
+    """DART API 경로(예: 'fnlttSinglAcntAll.json')에 API 키를 붙여 요청합니다."""
+    query = {'crtfc_key': config.DART_API_KEY, **(params or {})}
+    return dart_client.get(path, params=query, headers=headers, timeout=timeout)
@@ -1,9 +1,20 @@
+import numpy as np
 import pandas as pd
 from utils import get_logger
-from typing import List, Dict
+from typing import Dict, List, Optional, Tuple
 
 logger = get_logger(__name__)
 
+# 기술적 신호 판정 기준 (screener 등 다른 모듈도 같은 기준을 사용합니다)
+RSI_OVERBOUGHT = 70
+RSI_OVERSOLD = 30
+
+# 신호 판정에 쓰는 지표 컬럼 (지표 계산 시 이 컬럼만 요청하면 됩니다)
+SIGNAL_INDICATOR_COLUMNS = ('VWAP', 'Upper', 'Lower', 'RSI', 'MACD', 'MACD_signal')
+
+# 주가 차트가 그리는 지표 컬럼 (plotly를 쓰지 않는 워커도 가져갈 수 있도록 여기에 둡니다)
+CHART_INDICATOR_COLUMNS = ('SMA_5', 'SMA_20', 'RSI')
+
 def interpret_financials(ratios: dict, company_name: str = ""):
     # (이전과 동일)
     if not ratios or not isinstance(ratios, dict) or "error" in ratios:
@@ -32,72 +43,203 @@ def interpret_financials(ratios: dict, company_name: str = ""):
     interpretation += "\n*주의: 위 해석은 제공된 수치를 기반으로 한 일반적인 의견이며, 투자 결정은 다양한 정보를 종합적으로 고려하여 신중하게 이루어져야 합니다.*"
     return interpretation
 
-def interpret_fibonacci(close_value: float, levels: Dict[str, float]) -> str:
-    """피보나치 레벨과 현재가를 비교하여 지지/저항 신호를 해석합니다."""
+def sorted_fibonacci_levels(levels: Dict[str, float]) -> Tuple[np.ndarray, np.ndarray]:
+    """피보나치 레벨을 값 오름차순으로 정렬한 (레벨 이름 배열, 값 배열). 이름은 'level_23.6' -> '23.6'."""
     if not levels:
-        return ""
+        return np.array([], dtype=object), np.array([], dtype=float)
+    items = sorted(levels.items(), key=lambda item: item[1])
+    names = np.array([name.split('_')[1] for name, _ in items], dtype=object)
+    values = np.array([value for _, value in items], dtype=float)
+    return names, values
 
-    sorted_levels = sorted(levels.items(), key=lambda item: item[1])
-    
-    for i in range(len(sorted_levels) - 1):
-        lower_level_name = sorted_levels[i][0].split('_')[1]
-        lower_level_val = sorted_levels[i][1]
-        upper_level_name = sorted_levels[i+1][0].split('_')[1]
-        upper_level_val = sorted_levels[i+1][1]
 
-        # 현재가가 두 레벨 사이에 위치하는 경우
-        if lower_level_val <= close_value <= upper_level_val:
-            return f"🔵 **피보나치:** 현재가({close_value:,.0f})가 **{lower_level_name}%**와 **{upper_level_name}%** 구간 사이에 위치. *해당 구간이 주요 지지/저항선으로 작용할 수 있습니다.*"
+def _fibonacci_positions(close: np.ndarray, values: np.ndarray):
+    """
+    searchsorted로 각 종가의 피보나치 구간을 찾습니다.
+    반환: (상태 배열 'inside'/'above'/'below'/None, 구간 하단 인덱스 배열)
+    구간 i는 values[i] <= 종가 <= values[i+1]이며, 경계값은 아래쪽 구간에 속합니다. (interpret_fibonacci와 동일)
+    """
+    state = np.full(len(close), None, dtype=object)
+    interval = np.full(len(close), -1, dtype=np.int64)
+    if len(values) == 0:
+        return state, interval
+    valid = ~np.isnan(close)
+    below_count = np.searchsorted(values, close, side='left')
+    above = valid & (close > values[-1])
+    below = valid & (close < values[0])
+    inside = valid & ~above & ~below & (len(values) >= 2)
+    state[above], state[below], state[inside] = 'above', 'below', 'inside'
+    interval[inside] = np.clip(below_count[inside] - 1, 0, len(values) - 2)
+    return state, interval
+
 
-    if close_value > sorted_levels[-1][1]:
+def _fibonacci_text(state, lower_name, upper_name, close_value: float) -> str:
+    if state == 'inside':
+        return f"🔵 **피보나치:** 현재가({close_value:,.0f})가 **{lower_name}%**와 **{upper_name}%** 구간 사이에 위치. *해당 구간이 주요 지지/저항선으로 작용할 수 있습니다.*"
+    if state == 'above':
          return f"🚀 **피보나치:** 현재가가 주요 저항선인 **0.0%** 레벨을 상향 돌파. *추가 상승 기대 가능*"
-    if close_value < sorted_levels[0][1]:
+    if state == 'below':
          return f"⚓️ **피보나치:** 현재가가 주요 지지선인 **100.0%** 레벨을 하향 이탈. *추가 하락 주의 필요*"
-    
     return ""
 
 
-def interpret_technical_signals(row: pd.Series, df_context: pd.DataFrame, fib_levels: Dict[str, float]) -> List[str]:
-    """VWAP, 볼린저 밴드, RSI, MACD, 피보나치 기준 자동 해석"""
+def interpret_fibonacci(close_value: float, levels: Dict[str, float]) -> str:
+    """피보나치 레벨과 현재가를 비교하여 지지/저항 신호를 해석합니다."""
+    if not levels:
+        return ""
+    names, values = sorted_fibonacci_levels(levels)
+    state, interval = _fibonacci_positions(np.array([close_value], dtype=float), values)
+    i = interval[0]
+    return _fibonacci_text(state[0], names[i] if i >= 0 else None, names[i + 1] if i >= 0 else None, close_value)
+
+
+def _column(df: pd.DataFrame, name: str) -> np.ndarray:
+    return df[name].to_numpy(dtype=float) if name in df.columns else np.full(len(df), np.nan)
+
+
+def build_signal_states(df: pd.DataFrame, fib_levels: Optional[Dict[str, float]] = None,
+                        rsi_overbought: float = RSI_OVERBOUGHT, rsi_oversold: float = RSI_OVERSOLD) -> pd.DataFrame:
+    """
+    지표 DataFrame 전체 행에 대해 신호 상태를 한 번의 벡터 연산으로 판정합니다.
+    반환 컬럼: Close, RSI, vwap_state, bb_state, rsi_state, macd_state, fib_state, fib_lower, fib_upper
+    (지표가 없거나 아직 계산되지 않은 행의 상태는 None. RSI 기준값은 백테스트에서 바꿔 볼 수 있습니다)
+    """
+    close, vwap = _column(df, 'Close'), _column(df, 'VWAP')
+    upper, lower = _column(df, 'Upper'), _column(df, 'Lower')
+    rsi, macd, macd_signal = _column(df, 'RSI'), _column(df, 'MACD'), _column(df, 'MACD_signal')
+
+    def select(conditions, choices, valid):
+        # choices의 마지막 값은 어떤 조건에도 해당하지 않을 때의 기본값입니다.
+        return np.where(valid, np.select(conditions, choices[:-1], default=choices[-1]), None)
+
+    # 비교 대상이 NaN이면 비교 결과는 False이므로, 아래 판정은 기존 행 단위 if/else와 같은 결과를 냅니다.
+    states = pd.DataFrame({
+        'Close': close,
+        'RSI': rsi,
+        'vwap_state': select([close > vwap], ['above', 'below'], ~np.isnan(vwap)),
+        'bb_state': select([close > upper, close < lower], ['above', 'below', 'inside'], ~np.isnan(upper)),
+        'rsi_state': select([rsi > rsi_overbought, rsi < rsi_oversold], ['overbought', 'oversold', 'neutral'],
+                            ~np.isnan(rsi)),
+        'macd_state': select([macd > macd_signal], ['bull', 'bear'], ~np.isnan(macd)),
+    }, index=df.index)
+
+    names, values = sorted_fibonacci_levels(fib_levels or {})
+    fib_state, interval = _fibonacci_positions(close, values)
+    has_interval = interval >= 0
+    states['fib_state'] = fib_state
+    states['fib_lower'] = np.where(has_interval, names[np.clip(interval, 0, None)] if len(names) else None, None)
+    states['fib_upper'] = np.where(has_interval, names[np.clip(interval + 1, 0, len(names) - 1)] if len(names) else None, None)
+
+    for column in ('vwap_state', 'bb_state', 'rsi_state', 'macd_state', 'fib_state'):
+        states[column] = states[column].astype('category')
+    return states
+
+
+# (상태 컬럼, 이전 상태, 현재 상태, 이벤트 코드, 표시 이름, 방향) - 방향은 신호를 만든 가격/지표 움직임의 방향
+SIGNAL_EVENT_RULES = [
+    ('macd_state', 'bear', 'bull', 'macd_cross_up', "MACD 골든크로스", 'up'),
+    ('macd_state', 'bull', 'bear', 'macd_cross_down', "MACD 데드크로스", 'down'),
+    ('bb_state', None, 'above', 'bb_break_up', "볼린저 상단 돌파", 'up'),
+    ('bb_state', None, 'below', 'bb_break_down', "볼린저 하단 이탈", 'down'),
+    ('bb_state', 'above', 'inside', 'bb_reentry_from_above', "볼린저 밴드 복귀(상단)", 'down'),
+    ('bb_state', 'below', 'inside', 'bb_reentry_from_below', "볼린저 밴드 복귀(하단)", 'up'),
+    ('rsi_state', None, 'overbought', 'rsi_overbought', "RSI 과매수 진입", 'up'),
+    ('rsi_state', None, 'oversold', 'rsi_oversold', "RSI 과매도 진입", 'down'),
+    ('vwap_state', 'below', 'above', 'vwap_cross_up', "VWAP 상향 돌파", 'up'),
+    ('vwap_state', 'above', 'below', 'vwap_cross_down', "VWAP 하향 돌파", 'down'),
+]
+
+
+def _transition_mask(state: pd.Series, before, after) -> pd.Series:
+    current = state.astype(object)
+    previous = current.shift(1)
+    hit = (current == after) & previous.notna()
+    hit &= (previous == before) if before is not None else (previous != after)
+    return hit
+
+
+def signal_event_mask(states: pd.DataFrame, event: str) -> np.ndarray:
+    """SIGNAL_EVENT_RULES의 이벤트 코드 하나가 발생한 행을 True로 표시한 bool 배열 (백테스트 진입/청산 조건)"""
+    for column, before, after, code, _, _ in SIGNAL_EVENT_RULES:
+        if code == event:
+            return _transition_mask(states[column], before, after).to_numpy(dtype=bool)
+    raise ValueError(f"알 수 없는 신호 이벤트: {event}")
+
+
+def build_signal_events(states: pd.DataFrame, dates: Optional[pd.Series] = None) -> pd.DataFrame:
+    """
+    build_signal_states 결과에서 상태가 바뀐 시점(크로스오버, 밴드 돌파/복귀, RSI 진입 등)만 뽑은 이벤트 타임라인.
+    이전 상태가 None(지표 계산 전)인 행은 이벤트로 보지 않습니다. 이전 상태가 None으로 표시된 규칙은
+    '현재 상태가 아니었다가 현재 상태가 된' 모든 전환에 해당합니다.
+    반환 컬럼: Date, event, label, direction, Close
+    """
+    frames = []
+    for column, before, after, code, label, direction in SIGNAL_EVENT_RULES:
+        hit = _transition_mask(states[column], before, after)
+        if hit.any():
+            frames.append(pd.DataFrame({
+                'position': np.flatnonzero(hit.to_numpy()),
+                'event': code, 'label': label, 'direction': direction,
+            }))
+    if not frames:
+        return pd.DataFrame(columns=['Date', 'event', 'label', 'direction', 'Close'])
+
+    events = pd.concat(frames, ignore_index=True).sort_values('position', kind='stable')
+    positions = events.pop('position').to_numpy()
+    events.insert(0, 'Date', dates.to_numpy()[positions] if dates is not None else states.index[positions])
+    events['Close'] = states['Close'].to_numpy()[positions]
+    return events.reset_index(drop=True)
+
+
+def build_signal_timeline(df: pd.DataFrame, fib_levels: Optional[Dict[str, float]] = None):
+    """지표 DataFrame 전체의 (상태 표, 이벤트 타임라인)을 반환합니다. 차트 오버레이와 최신 신호 해석에 함께 씁니다."""
+    states = build_signal_states(df, fib_levels)
+    events = build_signal_events(states, df['Date'] if 'Date' in df.columns else None)
+    return states, events
+
+
+def describe_signal_state(state: pd.Series) -> List[str]:
+    """상태 표의 한 행(보통 마지막 행)을 화면용 신호 문장 목록으로 바꿉니다."""
     signals = []
 
     # 📊 VWAP 해석
-    if 'VWAP' in row and pd.notna(row['VWAP']):
-        if row['Close'] > row['VWAP']:
-            signals.append("📈 **VWAP:** 현재가가 VWAP 위에 있어 **단기 매수세가 우위**에 있습니다.")
-        else:
-            signals.append("📉 **VWAP:** 현재가가 VWAP 아래에 있어 **단기 매도세가 우위**에 있습니다.")
+    if state['vwap_state'] == 'above':
+        signals.append("📈 **VWAP:** 현재가가 VWAP 위에 있어 **단기 매수세가 우위**에 있습니다.")
+    elif state['vwap_state'] == 'below':
+        signals.append("📉 **VWAP:** 현재가가 VWAP 아래에 있어 **단기 매도세가 우위**에 있습니다.")
 
     # 📊 Bollinger Band 해석
-    if all(c in row for c in ['Upper', 'Lower']) and pd.notna(row['Upper']):
-        if row['Close'] > row['Upper']:
-            signals.append("🚨 **볼린저밴드:** 상단선 돌파. **단기 과열 또는 강한 상승 추세**를 의미할 수 있습니다.")
-        elif row['Close'] < row['Lower']:
-            signals.append("💡 **볼린저밴드:** 하단선 이탈. **단기 낙폭 과대** 상태일 수 있습니다.")
-        else:
-            signals.append("↔️ **볼린저밴드:** 밴드 내에서 움직이며 **방향성을 탐색** 중입니다.")
-            
+    if state['bb_state'] == 'above':
+        signals.append("🚨 **볼린저밴드:** 상단선 돌파. **단기 과열 또는 강한 상승 추세**를 의미할 수 있습니다.")
+    elif state['bb_state'] == 'below':
+        signals.append("💡 **볼린저밴드:** 하단선 이탈. **단기 낙폭 과대** 상태일 수 있습니다.")
+    elif state['bb_state'] == 'inside':
+        signals.append("↔️ **볼린저밴드:** 밴드 내에서 움직이며 **방향성을 탐색** 중입니다.")
+
     # 📊 RSI 해석
-    if 'RSI' in row and pd.notna(row['RSI']):
-        rsi = row['RSI']
-        if rsi > 70:
-            signals.append(f"🔥 **RSI ({rsi:.1f}):** 과매수 영역. 단기적인 가격 조정 가능성에 유의해야 합니다.")
-        elif rsi < 30:
-            signals.append(f"🧊 **RSI ({rsi:.1f}):** 과매도 영역. 기술적 반등 가능성을 기대해볼 수 있습니다.")
-        else:
-            signals.append(f"🟡 **RSI ({rsi:.1f}):** 중립 영역에서 움직이고 있습니다.")
-            
+    rsi = state['RSI']
+    if state['rsi_state'] == 'overbought':
+        signals.append(f"🔥 **RSI ({rsi:.1f}):** 과매수 영역. 단기적인 가격 조정 가능성에 유의해야 합니다.")
+    elif state['rsi_state'] == 'oversold':
+        signals.append(f"🧊 **RSI ({rsi:.1f}):** 과매도 영역. 기술적 반등 가능성을 기대해볼 수 있습니다.")
+    elif state['rsi_state'] == 'neutral':
+        signals.append(f"🟡 **RSI ({rsi:.1f}):** 중립 영역에서 움직이고 있습니다.")
+
     # 📊 MACD 해석
-    if all(c in row for c in ['MACD', 'MACD_signal']) and pd.notna(row['MACD']):
-        if row['MACD'] > row['MACD_signal']:
-            signals.append("🟢 **MACD:** MACD선이 시그널선 위에 위치하여 **상승 모멘텀**이 우세합니다.")
-        else:
-            signals.append("🔴 **MACD:** MACD선이 시그널선 아래에 위치하여 **하락 모멘텀**이 우세합니다.")
+    if state['macd_state'] == 'bull':
+        signals.append("🟢 **MACD:** MACD선이 시그널선 위에 위치하여 **상승 모멘텀**이 우세합니다.")
+    elif state['macd_state'] == 'bear':
+        signals.append("🔴 **MACD:** MACD선이 시그널선 아래에 위치하여 **하락 모멘텀**이 우세합니다.")
 
     # 📊 피보나치 되돌림 해석
-    if fib_levels and pd.notna(row['Close']):
-        fib_msg = interpret_fibonacci(row['Close'], fib_levels)
-        if fib_msg:
-            signals.append(fib_msg)
-            
-    return signals
\ No newline at end of file
+    fib_msg = _fibonacci_text(state['fib_state'], state['fib_lower'], state['fib_upper'], state['Close'])
+    if fib_msg:
+        signals.append(fib_msg)
+
+    return signals
+
+
+def interpret_technical_signals(row: pd.Series, df_context: pd.DataFrame, fib_levels: Dict[str, float]) -> List[str]:
+    """VWAP, 볼린저 밴드, RSI, MACD, 피보나치 기준 자동 해석 (build_signal_states와 같은 규칙을 해당 행에 적용)"""
+    state = build_signal_states(row.to_frame().T, fib_levels).iloc[-1]
+    return describe_signal_state(state)
@@ -0,0 +1,220 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, NamedTuple, Optional
+
+import pandas as pd
+
+import config
+import precompute_store
+import price_store
+from data_fetcher import fetch_company_info, fetch_dart_financial_data, fetch_stock_price_data
+from financial_analysis import calculate_financial_ratios
+from interpret import CHART_INDICATOR_COLUMNS, SIGNAL_INDICATOR_COLUMNS, interpret_technical_signals
+from technical_analysis import calculate_technical_indicators
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# 모든 세션이 공유하는 분석용 스레드 풀 (app.py는 rerun마다 다시 실행되므로 모듈 수준에 둡니다)
+_executor = ThreadPoolExecutor(max_workers=config.PIPELINE_WORKERS, thread_name_prefix="analysis")
+
+
+class StageResult(NamedTuple):
+    name: str
+    value: Any
+    seconds: float
+
+
+def _run_stage(name: str, func: Callable, *args, **kwargs) -> StageResult:
+    started = time.perf_counter()
+    try:
+        return StageResult(name, func(*args, **kwargs), time.perf_counter() - started)
+    finally:
+        logger.info(f"분석 단계 '{name}' 소요 시간: {time.perf_counter() - started:.3f}s")
+
+
+def default_report_year(now: Optional[datetime] = None) -> str:
+    """분석에 사용할 사업보고서 연도 (사업보고서는 보통 3월 말까지 공시되므로 5월부터 전년도 보고서를 사용)"""
+    now = now or datetime.now()
+    return str(now.year - 1 if now.month >= 5 else now.year - 2)
+
+
+def latest_expected_bar(now: Optional[datetime] = None) -> pd.Timestamp:
+    """지금 시점에 있어야 할 마지막 일봉 날짜: 장 시작 전이면 전일, 주말이면 직전 평일. (공휴일은 구분하지 않음)"""
+    now = pd.Timestamp(now or datetime.now())
+    day = now.normalize()
+    if now.hour < config.KRX_MARKET_OPEN_HOUR:
+        day -= pd.Timedelta(days=1)
+    return pd.offsets.BDay().rollback(day)
+
+
+def _has_latest_bar(stock_code: str, payload: Dict[str, Any]) -> bool:
+    """
+    사전 계산된 기술적 지표가 최신 봉까지 담고 있는지 확인합니다.
+    야간 배치 결과는 전일 봉까지만 있으므로, 장이 열린 뒤나 가격 저장소에 더 새로운 봉이 들어온 뒤에는 False입니다.
+    """
+    indicators_df = payload.get('indicators_df')
+    if indicators_df is None or indicators_df.empty or 'Date' not in indicators_df.columns:
+        return False
+    last_bar = pd.Timestamp(indicators_df['Date'].max()).normalize()
+    if last_bar < latest_expected_bar():
+        return False
+    try:
+        coverage = price_store.get_coverage(stock_code)
+    except Exception as e:
+        logger.warning(f"가격 저장소 조회 실패 ({stock_code}): {e}")
+        coverage = None
+    return coverage is None or coverage[1] <= last_bar
+
+
+def _precomputed_or(kind: str, stock_code: str, params: str, max_age_seconds: Optional[float],
+                    compute: Callable, *args) -> Dict[str, Any]:
+    """
+    야간 배치(batch_precompute)가 저장한 결과가 있으면 그것을, 없으면 직접 계산한 결과를 반환합니다.
+    기술적 지표 결과는 저장 시각과 별개로 최신 봉이 빠져 있으면 사용하지 않습니다.
+    """
+    try:
+        payload = precompute_store.load_result(stock_code, kind, params, max_age_seconds)
+    except Exception as e:
+        logger.warning(f"사전 계산 결과 조회 실패 ({stock_code}, {kind}): {e}")
+        payload = None
+    if payload is not None and kind == precompute_store.KIND_TECHNICAL and not _has_latest_bar(stock_code, payload):
+        payload = None
+    if payload is not None:
+        logger.info(f"사전 계산 결과 사용: {stock_code} {kind} {params}")
+        return payload
+    return compute(*args)
+
+
+def _financial_stage(stock_code: str, year: str) -> Dict[str, Any]:
+    """DART 재무제표 수집 + 재무비율 계산"""
+    df, msg = fetch_dart_financial_data(stock_code, year=year, report_code="11011")
+    ratios = calculate_financial_ratios(df) if not df.empty else None
+    return {'df': df, 'msg': msg, 'ratios': ratios}
+
+
+TECHNICAL_STAGE_COLUMNS = tuple(dict.fromkeys(CHART_INDICATOR_COLUMNS + SIGNAL_INDICATOR_COLUMNS))
+
+
+def _technical_stage(stock_code: str, start_date: str, end_date: str) -> Dict[str, Any]:
+    """주가 수집 + 기술적 지표 계산"""
+    price_df = fetch_stock_price_data(stock_code, start_date, end_date)
+    if price_df is None or price_df.empty:
+        return {'price_df': price_df, 'indicators_df': None, 'fib_levels': {}}
+    # 차트와 신호 해석에 쓰는 지표만 계산하고, 중간 결과는 (종목, 데이터 버전)별로 재사용합니다.
+    indicators_df, fib_levels = calculate_technical_indicators(price_df, columns=TECHNICAL_STAGE_COLUMNS,
+                                                               symbol=stock_code)
+    return {'price_df': price_df, 'indicators_df': indicators_df, 'fib_levels': fib_levels}
+
+
+def start_analysis(stock_code: str, year: str, start_date: str, end_date: str) -> Dict[str, "Future[StageResult]"]:
+    """
+    서로 독립적인 기업 정보, DART 재무, 주가/지표 단계를 동시에 시작하고 단계명 -> Future를 반환합니다.
+    각 Future는 StageResult(name, value, seconds)를 돌려줍니다. (Streamlit 호출은 메인 스레드에서만 하세요.)
+    재무/주가 단계는 야간 배치가 같은 조건으로 미리 계산해 둔 결과가 있으면 그것을 사용합니다.
+    """
+    financial_params = precompute_store.financial_params(year, "11011")
+    technical_params = precompute_store.technical_params(start_date, end_date)
+    return {
+        'company': _executor.submit(_run_stage, 'company', fetch_company_info, stock_code),
+        'financial': _executor.submit(
+            _run_stage, 'financial', _precomputed_or, precompute_store.KIND_FINANCIAL, stock_code, financial_params,
+            None, _financial_stage, stock_code, year),
+        'technical': _executor.submit(
+            _run_stage, 'technical', _precomputed_or, precompute_store.KIND_TECHNICAL, stock_code, technical_params,
+            config.PRECOMPUTE_MAX_AGE_SECONDS, _technical_stage, stock_code, start_date, end_date),
+    }
+
+
+# 관심 종목 대시보드용 프로세스 풀 (지표 계산이 Streamlit 프로세스의 GIL을 잡지 않도록 별도 프로세스에서 실행)
+# Streamlit 서버는 여러 스레드가 락(캐시, 로깅 등)을 쥐고 도는 프로세스이므로 fork 대신 spawn으로 워커를 띄웁니다.
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=config.WATCHLIST_PROCESS_WORKERS,
+                                                mp_context=multiprocessing.get_context("spawn"))
+        return _process_pool
+
+
+def _replace_broken_pool(broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+    """워커가 죽어 망가진 풀을 버리고 새 풀을 반환합니다. (다른 세션이 이미 바꿨으면 그 풀을 사용)"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is broken:
+            _process_pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+    return _get_process_pool()
+
+
+def _empty_watchlist_row(stock_code: str) -> Dict[str, Any]:
+    return {'종목코드': stock_code, '종가': None, '등락률(%)': None, 'RSI': None, 'MACD': None, '신호': "", '오류': None}
+
+
+def _watchlist_row(stock_code: str, start_date: str, end_date: str) -> Dict[str, Any]:
+    """관심 종목 한 개의 요약 행: 주가 수집 -> 기술적 지표 -> 신호 해석 (워커 프로세스에서 실행)"""
+    started = time.perf_counter()
+    row = _empty_watchlist_row(stock_code)
+    try:
+        result = _precomputed_or(precompute_store.KIND_TECHNICAL, stock_code,
+                                 precompute_store.technical_params(start_date, end_date),
+                                 config.PRECOMPUTE_MAX_AGE_SECONDS, _technical_stage, stock_code, start_date, end_date)
+        indicators_df = result['indicators_df']
+        if indicators_df is None or indicators_df.empty:
+            row['오류'] = "주가 데이터 없음"
+        else:
+            latest = indicators_df.iloc[-1]
+            signals = interpret_technical_signals(latest, indicators_df, result['fib_levels'])
+            change, rsi = latest.get('Change'), latest.get('RSI')
+            row.update({
+                '종가': float(latest['Close']),
+                '등락률(%)': float(change) * 100 if pd.notna(change) else None,
+                'RSI': float(rsi) if pd.notna(rsi) else None,
+                'MACD': "상승" if latest.get('MACD', 0) > latest.get('MACD_signal', 0) else "하락",
+                # 표에는 신호별 아이콘과 이름만 짧게 보여줍니다. (예: "🔥 RSI (75.0)")
+                '신호': " / ".join(signal.split(":**")[0].replace("**", "") for signal in signals),
+            })
+    except Exception as e:
+        logger.error(f"관심 종목 분석 실패 ({stock_code}): {e}", exc_info=True)
+        row['오류'] = str(e)
+    row['소요(s)'] = round(time.perf_counter() - started, 3)
+    return row
+
+
+def run_watchlist(stock_codes: Iterable[str], start_date: str, end_date: str,
+                  max_in_flight: int = config.WATCHLIST_MAX_IN_FLIGHT_PER_SESSION) -> Iterator[Dict[str, Any]]:
+    """
+    관심 종목들을 프로세스 풀에서 분석하고, 끝나는 순서대로 요약 행을 내보냅니다.
+    한 호출(세션)이 풀에 올려 두는 작업은 max_in_flight개로 제한해, 긴 관심 목록이 다른 세션의 작업을 밀어내지 않게 합니다.
+    워커 프로세스가 죽으면 그때 돌던 종목은 오류 행으로 내보내고, 새 풀에서 나머지 종목을 계속 처리합니다.
+    """
+    pending = list(dict.fromkeys(stock_codes))[:config.WATCHLIST_MAX_SYMBOLS]
+    pending.reverse()
+    pool = _get_process_pool()
+    in_flight: Dict[Future, str] = {}
+    while pending or in_flight:
+        while pending and len(in_flight) < max_in_flight:
+            stock_code = pending.pop()
+            try:
+                in_flight[pool.submit(_watchlist_row, stock_code, start_date, end_date)] = stock_code
+            except BrokenProcessPool:
+                pending.append(stock_code)
+                pool = _replace_broken_pool(pool)
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            stock_code = in_flight.pop(future)
+            try:
+                row = future.result()
+            except BrokenProcessPool as e:
+                logger.error(f"관심 종목 워커 프로세스 비정상 종료 ({stock_code}): {e}")
+                pool = _replace_broken_pool(pool)
+                row = {**_empty_watchlist_row(stock_code), '오류': "분석 프로세스가 비정상 종료되었습니다."}
+            yield row
@@ -0,0 +1,155 @@
+import json
+import pickle
+import sqlite3
+import time
+from typing import Any, Optional, Set
+
+import config
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# 결과 종류: 'technical' (params = "시작일~종료일"), 'financial' (params = "연도:보고서코드")
+KIND_TECHNICAL = 'technical'
+KIND_FINANCIAL = 'financial'
+
+
+def get_connection():
+    conn = sqlite3.connect(config.PRECOMPUTE_DB_NAME, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    # 종목 × 종류 × 파라미터별 최신 결과 (payload는 pickle된 파이프라인 단계 결과)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS precomputed_results (
+        symbol TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        params TEXT NOT NULL,
+        run_id TEXT,
+        computed_at REAL NOT NULL,
+        payload BLOB NOT NULL,
+        PRIMARY KEY (symbol, kind, params)
+    ) WITHOUT ROWID
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS precompute_runs (
+        run_id TEXT PRIMARY KEY,
+        started_at REAL,
+        finished_at REAL,
+        status TEXT,
+        params TEXT
+    )
+    """)
+    # 실행(run)별 종목 처리 상태. 중단 후 같은 run_id로 다시 실행하면 'done'인 종목은 건너뜁니다.
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS precompute_progress (
+        run_id TEXT NOT NULL,
+        symbol TEXT NOT NULL,
+        status TEXT NOT NULL,
+        message TEXT,
+        updated_at REAL,
+        PRIMARY KEY (run_id, symbol)
+    ) WITHOUT ROWID
+    """)
+    return conn
+
+
+def technical_params(start_date: str, end_date: str) -> str:
+    return f"{start_date}~{end_date}"
+
+
+def financial_params(year, report_code: str) -> str:
+    return f"{year}:{report_code}"
+
+
+def save_result(symbol: str, kind: str, params: str, payload: Any, run_id: Optional[str] = None):
+    conn = get_connection()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO precomputed_results VALUES (?, ?, ?, ?, ?, ?)",
+                (symbol, kind, params, run_id, time.time(), pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL))
+            )
+    finally:
+        conn.close()
+
+
+def load_result(symbol: str, kind: str, params: str, max_age_seconds: Optional[float] = None) -> Optional[Any]:
+    """저장된 결과를 반환합니다. 없거나 max_age_seconds보다 오래됐거나 읽을 수 없으면 None."""
+    conn = get_connection()
+    try:
+        row = conn.execute(
+            "SELECT computed_at, payload FROM precomputed_results WHERE symbol = ? AND kind = ? AND params = ?",
+            (symbol, kind, params)
+        ).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    if max_age_seconds is not None and time.time() - row[0] > max_age_seconds:
+        return None
+    try:
+        return pickle.loads(row[1])
+    except Exception as e:
+        logger.warning(f"사전 계산 결과를 읽을 수 없습니다 ({symbol}, {kind}, {params}): {e}")
+        return None
+
+
+def start_run(run_id: str, params: dict):
+    """실행을 기록합니다. 같은 run_id가 이미 있으면(재개) 상태만 'running'으로 되돌립니다."""
+    conn = get_connection()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT INTO precompute_runs (run_id, started_at, status, params) VALUES (?, ?, 'running', ?) "
+                "ON CONFLICT (run_id) DO UPDATE SET status = 'running', finished_at = NULL",
+                (run_id, time.time(), json.dumps(params, ensure_ascii=False))
+            )
+    finally:
+        conn.close()
+
+
+def finish_run(run_id: str, status: str):
+    conn = get_connection()
+    try:
+        with conn:
+            conn.execute("UPDATE precompute_runs SET finished_at = ?, status = ? WHERE run_id = ?",
+                         (time.time(), status, run_id))
+    finally:
+        conn.close()
+
+
+def get_run(run_id: str) -> Optional[dict]:
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT run_id, started_at, finished_at, status, params FROM precompute_runs WHERE run_id = ?",
+                           (run_id,)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    return {'run_id': row[0], 'started_at': row[1], 'finished_at': row[2], 'status': row[3],
+            'params': json.loads(row[4]) if row[4] else {}}
+
+
+def mark_progress(run_id: str, symbol: str, status: str, message: Optional[str] = None):
+    conn = get_connection()
+    try:
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO precompute_progress VALUES (?, ?, ?, ?, ?)",
+                         (run_id, symbol, status, message, time.time()))
+    finally:
+        conn.close()
+
+
+def completed_symbols(run_id: str, include_failed: bool = False) -> Set[str]:
+    """해당 실행에서 이미 처리한 종목 (include_failed면 실패한 종목도 포함)"""
+    statuses = ('done', 'failed') if include_failed else ('done',)
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            f"SELECT symbol FROM precompute_progress WHERE run_id = ? AND status IN ({', '.join('?' * len(statuses))})",
+            (run_id, *statuses)
+        ).fetchall()
+    finally:
+        conn.close()
+    return {row[0] for row in rows}
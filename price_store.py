@@ -0,0 +1,145 @@
+import sqlite3
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+import config
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# FinanceDataReader DataReader 결과와 같은 컬럼 구성
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Change']
+_DB_COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'change']
+DATE_FMT = "%Y-%m-%d"
+
+
+def get_connection():
+    conn = sqlite3.connect(config.PRICE_DB_NAME, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS prices (
+        symbol TEXT NOT NULL,
+        date TEXT NOT NULL,
+        open REAL,
+        high REAL,
+        low REAL,
+        close REAL,
+        volume REAL,
+        change REAL,
+        PRIMARY KEY (symbol, date)
+    ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_prices_date ON prices (date)")
+    # 종목별로 어느 기간까지 원격 데이터를 받아 두었는지 기록합니다. (휴장일 때문에 실제 봉 날짜와 다를 수 있음)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS price_coverage (
+        symbol TEXT PRIMARY KEY,
+        first_date TEXT NOT NULL,
+        last_date TEXT NOT NULL,
+        updated_at REAL
+    )
+    """)
+    return conn
+
+
+def get_coverage(symbol: str) -> Optional[Tuple[pd.Timestamp, pd.Timestamp]]:
+    """저장소에 받아 둔 기간 (시작일, 종료일)을 반환합니다. 없으면 None."""
+    conn = get_connection()
+    try:
+        row = conn.execute(
+            "SELECT first_date, last_date FROM price_coverage WHERE symbol = ?", (symbol,)
+        ).fetchone()
+        return (pd.Timestamp(row[0]), pd.Timestamp(row[1])) if row else None
+    finally:
+        conn.close()
+
+
+def save_prices(symbol: str, price_df: pd.DataFrame, covered_start: pd.Timestamp, covered_end: pd.Timestamp):
+    """
+    봉 데이터를 upsert하고, [covered_start, covered_end] 기간을 수집 완료로 기록합니다.
+    price_df는 'Date' 컬럼 또는 DatetimeIndex를 가져야 합니다.
+    """
+    df = price_df.reset_index() if 'Date' not in price_df.columns else price_df
+    rows = []
+    if not df.empty:
+        values = df.reindex(columns=PRICE_COLUMNS).astype(float)
+        values = values.where(values.notna(), None)
+        dates = pd.to_datetime(df['Date']).dt.strftime(DATE_FMT)
+        rows = [(symbol, d, *vals) for d, vals in zip(dates, values.itertuples(index=False, name=None))]
+
+    conn = get_connection()
+    try:
+        with conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO prices (symbol, date, {', '.join(_DB_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.execute("""
+            INSERT INTO price_coverage (symbol, first_date, last_date, updated_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(symbol) DO UPDATE SET
+                first_date = min(first_date, excluded.first_date),
+                last_date = max(last_date, excluded.last_date),
+                updated_at = excluded.updated_at
+            """, (symbol, covered_start.strftime(DATE_FMT), covered_end.strftime(DATE_FMT), time.time()))
+        logger.debug(f"가격 저장소: {symbol} {len(rows)}개 봉 저장 ({covered_start:%Y-%m-%d} ~ {covered_end:%Y-%m-%d})")
+    finally:
+        conn.close()
+
+
+def load_prices(symbol: str, start: Optional[pd.Timestamp] = None, end: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    """저장된 봉 데이터를 기간으로 잘라 FinanceDataReader와 같은 형태(Date 컬럼 + OHLCV)로 반환합니다."""
+    query = f"SELECT date, {', '.join(_DB_COLUMNS)} FROM prices WHERE symbol = ?"
+    params = [symbol]
+    if start is not None:
+        query += " AND date >= ?"
+        params.append(start.strftime(DATE_FMT))
+    if end is not None:
+        query += " AND date <= ?"
+        params.append(end.strftime(DATE_FMT))
+    query += " ORDER BY date"
+
+    conn = get_connection()
+    try:
+        df = pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+
+    df.columns = ['Date'] + PRICE_COLUMNS
+    df['Date'] = pd.to_datetime(df['Date'])
+    if df['Volume'].notna().all():
+        df['Volume'] = df['Volume'].astype('int64')
+    return df
+
+
+def load_price_matrix(start: pd.Timestamp, end: Optional[pd.Timestamp] = None, symbols: Optional[Iterable[str]] = None,
+                      fields: Iterable[str] = ('Close', 'High', 'Low', 'Volume')) -> Dict[str, pd.DataFrame]:
+    """
+    저장된 전 종목 봉 데이터를 한 번의 쿼리로 읽어 필드별 (날짜 × 종목) 행렬로 반환합니다.
+    symbols를 주면 해당 종목만 남깁니다.
+    """
+    fields = list(fields)
+    db_fields = [_DB_COLUMNS[PRICE_COLUMNS.index(field)] for field in fields]
+    query = f"SELECT symbol, date, {', '.join(db_fields)} FROM prices WHERE date >= ?"
+    params = [start.strftime(DATE_FMT)]
+    if end is not None:
+        query += " AND date <= ?"
+        params.append(end.strftime(DATE_FMT))
+
+    conn = get_connection()
+    try:
+        long_df = pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+
+    if symbols is not None:
+        long_df = long_df[long_df['symbol'].isin(set(symbols))]
+    if long_df.empty:
+        return {field: pd.DataFrame() for field in fields}
+
+    long_df = long_df.assign(date=pd.to_datetime(long_df['date']))
+    long_df.columns = ['symbol', 'date'] + fields
+    wide = long_df.pivot(index='date', columns='symbol', values=fields)
+    return {field: wide[field] for field in fields}
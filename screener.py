@@ -0,0 +1,141 @@
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+import price_store
+from interpret import RSI_OVERBOUGHT, RSI_OVERSOLD
+from symbol_master import get_symbol_master
+from technical_analysis import calculate_batch_indicators
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_LOOKBACK_DAYS = 180
+# 지표가 안정적으로 계산되려면 최소한 이만큼의 봉이 필요합니다. (MACD 26일 + 시그널 9일)
+MIN_BARS = 35
+# 스크리너 표와 신호 판정에 쓰는 지표 (SMA 등 나머지는 계산하지 않습니다)
+SCREENER_INDICATOR_COLUMNS = ('RSI', 'MACD', 'MACD_signal', 'MACD_hist', 'Upper', 'Lower', 'VWAP')
+
+# calculate_fibonacci_retracement와 같은 비율 (고가 기준 되돌림 %)
+_FIB_RATIOS = np.array([0.0, 23.6, 38.2, 50.0, 61.8, 78.6, 100.0])
+
+
+def _last_valid_positions(valid: np.ndarray) -> np.ndarray:
+    """각 열(종목)에서 마지막으로 값이 있는 행 위치를 구합니다. 값이 전혀 없으면 -1."""
+    n_rows = valid.shape[0]
+    last = n_rows - 1 - np.argmax(valid[::-1], axis=0)
+    return np.where(valid.any(axis=0), last, -1)
+
+
+def _take(matrix: pd.DataFrame, rows: np.ndarray) -> np.ndarray:
+    """종목별로 지정한 행의 값을 한 번에 뽑습니다. (행 위치가 음수면 NaN)"""
+    values = matrix.to_numpy(dtype=float)
+    cols = np.arange(values.shape[1])
+    picked = values[np.clip(rows, 0, None), cols]
+    return np.where(rows >= 0, picked, np.nan)
+
+
+def _fibonacci_zone(close: np.ndarray, high: np.ndarray, low: np.ndarray) -> np.ndarray:
+    """
+    interpret_fibonacci와 같은 구간 판정을 전 종목에 대해 벡터로 수행합니다.
+    레벨을 오름차순(100% -> 0%)으로 두고, 현재가가 몇 개의 레벨 이상인지로 구간을 찾습니다.
+    """
+    price_range = high - low
+    # (종목 × 레벨) 오름차순 레벨 행렬: 100%(저가) ... 0%(고가)
+    ratios_ascending = _FIB_RATIOS[::-1]
+    levels = high[:, None] - price_range[:, None] * (ratios_ascending / 100.0)
+    position = (close[:, None] >= levels).sum(axis=1)
+
+    labels = np.empty(len(close), dtype=object)
+    labels[:] = None
+    below = position == 0
+    above = (position == len(ratios_ascending)) & (close > high)
+    labels[below] = "100.0% 하향 이탈"
+    labels[above] = "0.0% 상향 돌파"
+    inside = ~below & ~above
+    lower_idx = np.clip(position - 1, 0, len(ratios_ascending) - 2)
+    for i, (upper_ratio, lower_ratio) in enumerate(zip(ratios_ascending[1:], ratios_ascending[:-1])):
+        labels[inside & (lower_idx == i)] = f"{lower_ratio:.1f}%~{upper_ratio:.1f}%"
+    labels[(price_range == 0) | np.isnan(price_range) | np.isnan(close)] = None
+    return labels
+
+
+def run_screener(symbols: Optional[Iterable[str]] = None, lookback_days: int = DEFAULT_LOOKBACK_DAYS,
+                 query: Optional[str] = None, sort_by: str = 'score', ascending: bool = False,
+                 end_date: Optional[str] = None) -> pd.DataFrame:
+    """
+    로컬 가격 저장소에 있는 종목 전체에 interpret_technical_signals와 같은 규칙(RSI, 볼린저 밴드, MACD, VWAP, 피보나치)을
+    벡터 연산으로 적용하고, 종목별 최신 신호 표를 점수 순으로 반환합니다.
+
+    query는 DataFrame.query 문법의 필터입니다. 예: "RSI < 30 and macd_cross_up"
+    사용 가능한 컬럼: Symbol, Name, Date, Close, RSI, MACD, MACD_signal, MACD_hist, Upper, Lower, VWAP,
+    rsi_oversold, rsi_overbought, macd_above_signal, macd_cross_up, macd_cross_down,
+    bb_breakout_up, bb_breakout_down, above_vwap, fib_zone, score
+    """
+    end = pd.Timestamp(end_date).normalize() if end_date else pd.Timestamp.today().normalize()
+    start = end - pd.Timedelta(days=lookback_days)
+
+    matrices = price_store.load_price_matrix(start, end, symbols=symbols)
+    close = matrices['Close']
+    if close.empty:
+        logger.warning("스크리너: 로컬 가격 저장소에 해당 기간의 데이터가 없습니다.")
+        return pd.DataFrame()
+
+    # 데이터가 충분한 종목만 평가합니다.
+    enough = close.notna().sum() >= MIN_BARS
+    close = close.loc[:, enough]
+    volume = matrices['Volume'].reindex(columns=close.columns)
+    high = matrices['High'].reindex(columns=close.columns)
+    low = matrices['Low'].reindex(columns=close.columns)
+
+    indicators = calculate_batch_indicators(close, volume, columns=SCREENER_INDICATOR_COLUMNS)
+
+    # 종목마다 마지막 봉 날짜가 다를 수 있으므로 종목별 마지막 유효 행과 그 직전 행을 사용합니다.
+    last_pos = _last_valid_positions(close.notna().to_numpy())
+    prev_pos = last_pos - 1
+
+    last = {name: _take(frame, last_pos) for name, frame in indicators.items()}
+    last_close = _take(close, last_pos)
+    prev_macd = _take(indicators['MACD'], prev_pos)
+    prev_signal = _take(indicators['MACD_signal'], prev_pos)
+
+    result = pd.DataFrame({
+        'Symbol': close.columns,
+        'Date': close.index.to_numpy()[np.clip(last_pos, 0, None)],
+        'Close': last_close,
+        'RSI': last['RSI'],
+        'MACD': last['MACD'],
+        'MACD_signal': last['MACD_signal'],
+        'MACD_hist': last['MACD_hist'],
+        'Upper': last['Upper'],
+        'Lower': last['Lower'],
+        'VWAP': last['VWAP'],
+    })
+
+    result['rsi_overbought'] = result['RSI'] > RSI_OVERBOUGHT
+    result['rsi_oversold'] = result['RSI'] < RSI_OVERSOLD
+    result['macd_above_signal'] = result['MACD'] > result['MACD_signal']
+    result['macd_cross_up'] = result['macd_above_signal'] & (prev_macd <= prev_signal)
+    result['macd_cross_down'] = (result['MACD'] <= result['MACD_signal']) & (prev_macd > prev_signal)
+    result['bb_breakout_up'] = result['Close'] > result['Upper']
+    result['bb_breakout_down'] = result['Close'] < result['Lower']
+    result['above_vwap'] = result['Close'] > result['VWAP']
+    result['fib_zone'] = _fibonacci_zone(last_close, high.max().to_numpy(dtype=float), low.min().to_numpy(dtype=float))
+
+    # 단순 점수: 상승 신호 +1, 하락 신호 -1 (과매도/하단 이탈은 반등 기대 신호로 간주)
+    result['score'] = (
+        result['rsi_oversold'].astype(int) - result['rsi_overbought'].astype(int)
+        + result['macd_above_signal'].astype(int) * 2 - 1
+        + result['macd_cross_up'].astype(int) - result['macd_cross_down'].astype(int)
+        + result['bb_breakout_down'].astype(int) - result['bb_breakout_up'].astype(int)
+        + result['above_vwap'].astype(int) * 2 - 1
+    )
+
+    result.insert(1, 'Name', result['Symbol'].map(get_symbol_master().names))
+
+    if query:
+        result = result.query(query)
+    result = result.sort_values(sort_by, ascending=ascending, kind='stable').reset_index(drop=True)
+    logger.info(f"스크리너: {close.shape[1]}개 종목 평가, {len(result)}개 종목 반환")
+    return result
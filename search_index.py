@@ -0,0 +1,139 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+# 한글 음절의 초성 (유니코드 '가'~'힣' 순서)
+CHOSUNG = ['ㄱ', 'ㄲ', 'ㄴ', 'ㄷ', 'ㄸ', 'ㄹ', 'ㅁ', 'ㅂ', 'ㅃ', 'ㅅ', 'ㅆ', 'ㅇ', 'ㅈ', 'ㅉ', 'ㅊ', 'ㅋ', 'ㅌ', 'ㅍ', 'ㅎ']
+_CHOSUNG_SET = set(CHOSUNG)
+_HANGUL_BASE = 0xAC00
+_HANGUL_LAST = 0xD7A3
+_JUNGSUNG_JONGSUNG_COUNT = 21 * 28
+
+DEFAULT_LIMIT = 15
+MAX_PREFIX_LENGTH = 12
+
+
+def normalize_text(text: str) -> str:
+    """검색용 정규화: 소문자화하고 공백을 제거합니다."""
+    return ''.join(text.lower().split())
+
+
+def to_chosung(text: str) -> str:
+    """한글 음절을 초성으로 바꾼 키를 만듭니다. (예: '삼성전자' -> 'ㅅㅅㅈㅈ') 한글이 아닌 문자는 그대로 둡니다."""
+    chars = []
+    for ch in normalize_text(text):
+        code = ord(ch)
+        if _HANGUL_BASE <= code <= _HANGUL_LAST:
+            chars.append(CHOSUNG[(code - _HANGUL_BASE) // _JUNGSUNG_JONGSUNG_COUNT])
+        else:
+            chars.append(ch)
+    return ''.join(chars)
+
+
+def is_chosung_query(text: str) -> bool:
+    return bool(text) and all(ch in _CHOSUNG_SET for ch in text)
+
+
+class StockSearchIndex:
+    """
+    종목명/종목코드 자동완성을 위한 메모리 인덱스.
+    한 번 만들어 두면 검색 시 DataFrame을 거치지 않고 사전 조회와 짧은 후보 목록 검증만 수행합니다.
+    """
+
+    def __init__(self, stocks: Iterable[Tuple[str, str]]):
+        # 같은 순위 안에서는 짧은 이름이 먼저 오도록, 정렬된 순서대로 내부 id를 부여합니다.
+        entries = sorted(
+            {(str(symbol), str(name)) for symbol, name in stocks if symbol and name},
+            key=lambda item: (len(item[1]), item[1], item[0])
+        )
+        self._symbols: List[str] = [symbol for symbol, _ in entries]
+        self._display: List[str] = [f"{name} ({symbol})" for symbol, name in entries]
+        self._name_keys: List[str] = [normalize_text(name) for _, name in entries]
+        self._chosung_keys: List[str] = [to_chosung(name) for _, name in entries]
+
+        self._code_exact: Dict[str, int] = {}
+        self._name_exact: Dict[str, List[int]] = defaultdict(list)
+        self._code_prefix: Dict[str, List[int]] = defaultdict(list)
+        self._name_prefix: Dict[str, List[int]] = defaultdict(list)
+        self._chosung_prefix: Dict[str, List[int]] = defaultdict(list)
+        # 1/2-gram 역색인: 부분 문자열 검색 시 후보를 좁히는 데 사용합니다.
+        self._grams: Dict[str, List[int]] = defaultdict(list)
+
+        for idx, (symbol, name_key, chosung_key) in enumerate(zip(self._symbols, self._name_keys, self._chosung_keys)):
+            self._code_exact[symbol.lower()] = idx
+            self._name_exact[name_key].append(idx)
+            for length in range(1, min(len(symbol), MAX_PREFIX_LENGTH) + 1):
+                self._code_prefix[symbol.lower()[:length]].append(idx)
+            for length in range(1, min(len(name_key), MAX_PREFIX_LENGTH) + 1):
+                self._name_prefix[name_key[:length]].append(idx)
+            for length in range(1, min(len(chosung_key), MAX_PREFIX_LENGTH) + 1):
+                self._chosung_prefix[chosung_key[:length]].append(idx)
+            grams = set()
+            for text in (name_key, symbol.lower(), chosung_key):
+                grams.update(text)
+                grams.update(text[i:i + 2] for i in range(len(text) - 1))
+            for gram in grams:
+                self._grams[gram].append(idx)
+
+        # defaultdict가 조회 시 빈 항목을 만들지 않도록 일반 dict로 고정합니다.
+        self._name_exact = dict(self._name_exact)
+        self._code_prefix = dict(self._code_prefix)
+        self._name_prefix = dict(self._name_prefix)
+        self._chosung_prefix = dict(self._chosung_prefix)
+        self._grams = dict(self._grams)
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    def _substring_candidates(self, term: str) -> List[int]:
+        """검색어의 n-gram 중 가장 짧은 포스팅 목록을 후보로 사용합니다."""
+        grams = [term] if len(term) == 1 else [term[i:i + 2] for i in range(len(term) - 1)]
+        postings = [self._grams.get(gram) for gram in grams]
+        if any(p is None for p in postings):
+            return []
+        return min(postings, key=len)
+
+    def search(self, searchterm: str, limit: int = DEFAULT_LIMIT) -> List[Tuple[str, str]]:
+        """
+        검색어에 맞는 종목을 (표시명, 종목코드) 목록으로 반환합니다.
+        순위: 코드 일치 > 이름 일치 > 코드 접두어 > 이름 접두어 > 부분 문자열
+        초성만으로 된 검색어(예: 'ㅅㅅㅈㅈ')는 초성 접두어 > 초성 부분 문자열 순으로 찾습니다.
+        """
+        term = normalize_text(searchterm or '')
+        if not term:
+            return []
+
+        results: List[int] = []
+        seen = set()
+
+        def take(ids, predicate=None) -> bool:
+            for idx in ids:
+                if idx in seen or (predicate is not None and not predicate(idx)):
+                    continue
+                seen.add(idx)
+                results.append(idx)
+                if len(results) >= limit:
+                    return True
+            return False
+
+        if is_chosung_query(term):
+            tiers = [
+                (self._chosung_prefix.get(term[:MAX_PREFIX_LENGTH], []),
+                 (lambda idx: self._chosung_keys[idx].startswith(term)) if len(term) > MAX_PREFIX_LENGTH else None),
+                (self._substring_candidates(term), lambda idx: term in self._chosung_keys[idx]),
+            ]
+        else:
+            exact_code = self._code_exact.get(term)
+            tiers = [
+                ([exact_code] if exact_code is not None else [], None),
+                (self._name_exact.get(term, []), None),
+                (self._code_prefix.get(term, []), None),
+                (self._name_prefix.get(term[:MAX_PREFIX_LENGTH], []),
+                 (lambda idx: self._name_keys[idx].startswith(term)) if len(term) > MAX_PREFIX_LENGTH else None),
+                (self._substring_candidates(term),
+                 lambda idx: term in self._name_keys[idx] or term in self._symbols[idx].lower()),
+            ]
+
+        for ids, predicate in tiers:
+            if take(ids, predicate):
+                break
+        return [(self._display[idx], self._symbols[idx]) for idx in results]
@@ -0,0 +1,234 @@
+import math
+from collections import deque
+from typing import Any, Dict, Mapping, Optional
+
+import pandas as pd
+
+from technical_analysis import fibonacci_levels_from_range
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+NAN = float('nan')
+
+# 누적 합의 부동소수점 오차가 쌓이지 않도록 일정 횟수마다 창 안의 값으로 합계를 다시 계산합니다.
+_RESYNC_INTERVAL = 256
+
+INDICATOR_COLUMNS = ['SMA_5', 'SMA_20', 'Upper', 'Lower', 'RSI', 'EMA_12', 'EMA_26',
+                     'MACD', 'MACD_signal', 'MACD_hist', 'VWAP']
+
+
+def _to_json_float(value: Optional[float]):
+    return None if value is None or math.isnan(value) else value
+
+
+def _from_json_float(value) -> float:
+    return NAN if value is None else float(value)
+
+
+class _RollingWindow:
+    """고정 길이 창의 합계/제곱합을 유지하여 평균과 표본 표준편차를 O(1)로 제공합니다."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.values = deque(maxlen=size)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self._pushes = 0
+
+    def push(self, value: float):
+        if len(self.values) == self.size:
+            oldest = self.values[0]
+            self.total -= oldest
+            self.total_sq -= oldest * oldest
+        self.values.append(value)
+        self.total += value
+        self.total_sq += value * value
+        self._pushes += 1
+        if self._pushes % _RESYNC_INTERVAL == 0:
+            self.total = math.fsum(self.values)
+            self.total_sq = math.fsum(v * v for v in self.values)
+
+    @property
+    def full(self) -> bool:
+        return len(self.values) == self.size
+
+    def mean(self) -> float:
+        return self.total / self.size if self.full else NAN
+
+    def std(self) -> float:
+        """표본 표준편차 (pandas rolling().std()와 같은 ddof=1)"""
+        if not self.full or self.size < 2:
+            return NAN
+        variance = (self.total_sq - self.total * self.total / self.size) / (self.size - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'size': self.size, 'values': list(self.values)}
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "_RollingWindow":
+        window = cls(int(data['size']))
+        for value in data['values']:
+            window.push(float(value))
+        return window
+
+
+def _ema_step(prev: Optional[float], value: float, span: int) -> float:
+    """pandas ewm(span, adjust=False)와 같은 점화식: 첫 값은 그대로, 이후 alpha 가중 평균"""
+    if prev is None:
+        return value
+    alpha = 2.0 / (span + 1)
+    return prev + alpha * (value - prev)
+
+
+class IndicatorState:
+    """
+    종목 하나의 기술적 지표 상태. 새 봉이 들어올 때 update(bar)로 전체 이력 재계산 없이 O(1)에 갱신합니다.
+    같은 날짜의 봉이 다시 들어오면(장중 갱신) 직전 봉을 대체합니다.
+    to_dict()/from_dict()로 직렬화하여 재시작 후에도 이어서 계산할 수 있습니다.
+    """
+
+    def __init__(self, symbol: Optional[str] = None):
+        self.symbol = symbol
+        self.count = 0
+        self.last_date: Optional[str] = None
+        self.last_close: Optional[float] = None
+        self.sma_5 = _RollingWindow(5)
+        self.sma_20 = _RollingWindow(20)
+        self.gain = _RollingWindow(14)
+        self.loss = _RollingWindow(14)
+        self.ema_12: Optional[float] = None
+        self.ema_26: Optional[float] = None
+        self.macd_signal: Optional[float] = None
+        self.pv_sum = 0.0
+        self.volume_sum = 0.0
+        self.highest_high: Optional[float] = None
+        self.lowest_low: Optional[float] = None
+        self.latest: Dict[str, float] = {col: NAN for col in INDICATOR_COLUMNS}
+        # 같은 날짜 봉을 대체할 수 있도록 직전 봉 적용 전 상태를 보관합니다.
+        self._before_last: Optional[Dict[str, Any]] = None
+
+    def update(self, bar: Mapping[str, Any]) -> Dict[str, float]:
+        """봉 하나(Close 필수, Volume/High/Low/Date 선택)를 반영하고 최신 지표값을 반환합니다."""
+        date = bar.get('Date')
+        date_key = pd.Timestamp(date).strftime('%Y-%m-%d') if date is not None else None
+        if date_key is not None and date_key == self.last_date and self._before_last is not None:
+            self._restore(self._before_last)
+        self._before_last = self.to_dict()
+
+        close = float(bar['Close'])
+        delta = close - self.last_close if self.last_close is not None else 0.0
+        self.gain.push(delta if delta > 0 else 0.0)
+        self.loss.push(-delta if delta < 0 else 0.0)
+        self.sma_5.push(close)
+        self.sma_20.push(close)
+
+        self.ema_12 = _ema_step(self.ema_12, close, 12)
+        self.ema_26 = _ema_step(self.ema_26, close, 26)
+        macd = self.ema_12 - self.ema_26
+        self.macd_signal = _ema_step(self.macd_signal, macd, 9)
+
+        volume = bar.get('Volume')
+        if volume is not None and not pd.isna(volume):
+            self.pv_sum += close * float(volume)
+            self.volume_sum += float(volume)
+
+        high = float(bar.get('High', close))
+        low = float(bar.get('Low', close))
+        self.highest_high = high if self.highest_high is None else max(self.highest_high, high)
+        self.lowest_low = low if self.lowest_low is None else min(self.lowest_low, low)
+
+        self.last_close = close
+        self.last_date = date_key
+        self.count += 1
+
+        sma_20 = self.sma_20.mean()
+        std_20 = self.sma_20.std()
+        self.latest = {
+            'SMA_5': self.sma_5.mean(),
+            'SMA_20': sma_20,
+            'Upper': sma_20 + std_20 * 2,
+            'Lower': sma_20 - std_20 * 2,
+            'RSI': self._rsi(),
+            'EMA_12': self.ema_12,
+            'EMA_26': self.ema_26,
+            'MACD': macd,
+            'MACD_signal': self.macd_signal,
+            'MACD_hist': macd - self.macd_signal,
+            'VWAP': self.pv_sum / self.volume_sum if self.volume_sum else NAN,
+        }
+        return self.latest
+
+    def _rsi(self) -> float:
+        avg_gain = self.gain.mean()
+        avg_loss = self.loss.mean()
+        if math.isnan(avg_gain):
+            return NAN
+        if avg_loss == 0:
+            return 100.0 if avg_gain > 0 else NAN
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+
+    def fibonacci_levels(self) -> Dict[str, float]:
+        """지금까지 반영한 전체 구간의 피보나치 되돌림 레벨"""
+        if self.highest_high is None:
+            return {}
+        return fibonacci_levels_from_range(self.highest_high, self.lowest_low)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON으로 저장 가능한 상태 딕셔너리"""
+        return {
+            'symbol': self.symbol,
+            'count': self.count,
+            'last_date': self.last_date,
+            'last_close': self.last_close,
+            'sma_5': self.sma_5.to_dict(),
+            'sma_20': self.sma_20.to_dict(),
+            'gain': self.gain.to_dict(),
+            'loss': self.loss.to_dict(),
+            'ema_12': self.ema_12,
+            'ema_26': self.ema_26,
+            'macd_signal': self.macd_signal,
+            'pv_sum': self.pv_sum,
+            'volume_sum': self.volume_sum,
+            'highest_high': self.highest_high,
+            'lowest_low': self.lowest_low,
+            'latest': {k: _to_json_float(v) for k, v in self.latest.items()},
+        }
+
+    def _restore(self, data: Mapping[str, Any]):
+        self.symbol = data['symbol']
+        self.count = int(data['count'])
+        self.last_date = data['last_date']
+        self.last_close = data['last_close']
+        self.sma_5 = _RollingWindow.from_dict(data['sma_5'])
+        self.sma_20 = _RollingWindow.from_dict(data['sma_20'])
+        self.gain = _RollingWindow.from_dict(data['gain'])
+        self.loss = _RollingWindow.from_dict(data['loss'])
+        self.ema_12 = data['ema_12']
+        self.ema_26 = data['ema_26']
+        self.macd_signal = data['macd_signal']
+        self.pv_sum = float(data['pv_sum'])
+        self.volume_sum = float(data['volume_sum'])
+        self.highest_high = data['highest_high']
+        self.lowest_low = data['lowest_low']
+        self.latest = {k: _from_json_float(v) for k, v in data['latest'].items()}
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "IndicatorState":
+        state = cls()
+        state._restore(data)
+        return state
+
+    @classmethod
+    def from_history(cls, price_df: pd.DataFrame, symbol: Optional[str] = None) -> "IndicatorState":
+        """과거 봉 전체를 한 번 재생하여 상태를 만듭니다."""
+        state = cls(symbol)
+        for bar in price_df.to_dict('records'):
+            state.update(bar)
+        return state
+
+    def replay(self, price_df: pd.DataFrame) -> pd.DataFrame:
+        """여러 봉을 차례로 반영하고 봉별 지표값을 calculate_technical_indicators와 같은 컬럼으로 반환합니다."""
+        rows = [dict(self.update(bar)) for bar in price_df.to_dict('records')]
+        return pd.DataFrame(rows, index=price_df.index, columns=INDICATOR_COLUMNS)
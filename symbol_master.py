@@ -0,0 +1,77 @@
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+import pandas as pd
+
+import config
+import data_fetcher
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+
+class SymbolMaster:
+    """
+    KRX 종목 목록(Symbol, Name)의 읽기 전용 공용 사본.
+    Symbol/Name은 categorical로 저장하고, 종목코드 -> 행 위치 해시 인덱스로 종목명을 O(1)에 찾습니다.
+    모든 세션이 같은 객체를 참조하므로 frame을 수정하지 마세요.
+    """
+
+    def __init__(self, listing: pd.DataFrame):
+        frame = listing[['Symbol', 'Name']].drop_duplicates('Symbol').reset_index(drop=True)
+        self.frame = pd.DataFrame({
+            'Symbol': pd.Categorical(frame['Symbol'].astype(str)),
+            'Name': pd.Categorical(frame['Name'].astype(str)),
+        })
+        symbols = self.frame['Symbol'].cat.categories[self.frame['Symbol'].cat.codes]
+        names = self.frame['Name'].cat.categories[self.frame['Name'].cat.codes]
+        # categories에 있는 문자열 객체를 그대로 참조하므로 사본이 생기지 않습니다.
+        self._names: Dict[str, str] = dict(zip(symbols, names))
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._names
+
+    def name(self, symbol: str, default: Optional[str] = None) -> Optional[str]:
+        return self._names.get(symbol, default)
+
+    @property
+    def names(self) -> Dict[str, str]:
+        """종목코드 -> 종목명 매핑 (Series.map 등에 바로 사용; 수정 금지)"""
+        return self._names
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        """(종목코드, 종목명) 쌍"""
+        return iter(self._names.items())
+
+
+_master: Optional[SymbolMaster] = None
+_master_source = None
+_master_loaded_at = 0.0
+_master_lock = threading.Lock()
+
+
+def get_symbol_master() -> SymbolMaster:
+    """
+    프로세스 전체가 공유하는 종목 마스터를 반환합니다.
+    get_krx_stock_list()의 캐시된 결과가 바뀌었을 때만 다시 만들고, 목록을 받지 못했으면
+    SYMBOL_MASTER_RETRY_SECONDS 동안은 빈 마스터를 그대로 돌려줍니다.
+    """
+    global _master, _master_source, _master_loaded_at
+    with _master_lock:
+        if _master is not None and len(_master) == 0 and \
+                time.monotonic() - _master_loaded_at < config.SYMBOL_MASTER_RETRY_SECONDS:
+            return _master
+        listing = data_fetcher.get_krx_stock_list()
+        if _master is None or listing is not _master_source:
+            _master = SymbolMaster(listing)
+            _master_source = listing
+            _master_loaded_at = time.monotonic()
+            if len(_master) == 0:
+                logger.warning("KRX stock list is empty after loading!")
+            else:
+                logger.info(f"Loaded KRX symbol master. Total: {len(_master)}")
+        return _master
@@ -1,7 +1,8 @@
 import pandas as pd
 import numpy as np
-from utils import get_logger
-from typing import Tuple, Dict
+import config
+from utils import get_cache_namespace, get_logger
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
 
 logger = get_logger(__name__)
 
@@ -10,8 +11,10 @@ def calculate_fibonacci_retracement(df: pd.DataFrame) -> Dict[str, float]:
     if df.empty:
         return {}
     
-    highest_high = df['High'].max()
-    lowest_low = df['Low'].min()
+    return fibonacci_levels_from_range(df['High'].max(), df['Low'].min())
+
+def fibonacci_levels_from_range(highest_high: float, lowest_low: float) -> Dict[str, float]:
+    """최고가/최저가로부터 피보나치 되돌림 레벨을 만듭니다."""
     price_range = highest_high - lowest_low
     
     if price_range == 0:
@@ -28,47 +31,207 @@ def calculate_fibonacci_retracement(df: pd.DataFrame) -> Dict[str, float]:
     }
     return levels
 
-def calculate_technical_indicators(price_df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, float]]:
-    """모든 기술적 지표와 피보나치 레벨을 계산하여 반환합니다."""
+# --- 공용 지표 계산 함수 ---
+# 모두 Series(단일 종목)와 (날짜 × 종목) DataFrame에 똑같이 동작하므로, 단일/일괄 계산 결과가 동일합니다.
+
+def _sma(x, window: int):
+    return x.rolling(window=window).mean()
+
+def _rolling_std(x, window: int):
+    return x.rolling(window=window).std()
+
+def _ema(x, span: int):
+    return x.ewm(span=span, adjust=False).mean()
+
+def _rsi(close, window: int = 14, mask_before_listing: bool = False):
+    delta = close.diff()
+    # 첫 행과 종가가 빈 봉의 변화량은 0으로 취급합니다.
+    gain = delta.where(delta > 0, 0)
+    loss = -delta.where(delta < 0, 0)
+    if mask_before_listing:
+        # (날짜 × 종목) 행렬에서 첫 종가 이전(상장 전) 구간은 0이 아니라 NaN으로 남겨 단일 종목 계산과 맞춥니다.
+        listed = close.notna().cummax()
+        gain, loss = gain.where(listed), loss.where(listed)
+    avg_gain = gain.rolling(window=window).mean()
+    avg_loss = loss.rolling(window=window).mean()
+    rs = avg_gain / avg_loss
+    return 100 - (100 / (1 + rs))
+
+def _vwap(close, volume):
+    return (close * volume).cumsum() / volume.cumsum()
+
+
+# --- 지표 그래프 ---
+# 노드 키는 (종류, *파라미터) 튜플입니다. 예: ('sma', 20), ('bb_upper', 20, 2), ('macd_signal', 12, 26, 9)
+# 종류별로 (파라미터 -> 의존 노드 목록, (의존 노드 값..., *파라미터) -> 계산 결과)를 등록합니다.
+# 볼린저 밴드는 같은 윈도우의 SMA와 표준편차 노드를, MACD는 EMA 노드를 공유하므로 한 번만 계산됩니다.
+INPUT_NODES = {'close': 'Close', 'volume': 'Volume'}
+
+INDICATOR_NODES: Dict[str, Tuple[Callable, Callable]] = {
+    'sma': (lambda window: [('close',)], lambda close, window: _sma(close, window)),
+    'std': (lambda window: [('close',)], lambda close, window: _rolling_std(close, window)),
+    'ema': (lambda span: [('close',)], lambda close, span: _ema(close, span)),
+    'rsi': (lambda window: [('close',)],
+            lambda close, window: _rsi(close, window, mask_before_listing=isinstance(close, pd.DataFrame))),
+    'bb_upper': (lambda window, k: [('sma', window), ('std', window)], lambda sma, std, window, k: sma + (std * k)),
+    'bb_lower': (lambda window, k: [('sma', window), ('std', window)], lambda sma, std, window, k: sma - (std * k)),
+    'macd': (lambda fast, slow: [('ema', fast), ('ema', slow)], lambda ema_fast, ema_slow, fast, slow: ema_fast - ema_slow),
+    'macd_signal': (lambda fast, slow, signal: [('macd', fast, slow)], lambda macd, fast, slow, signal: _ema(macd, signal)),
+    'macd_hist': (lambda fast, slow, signal: [('macd', fast, slow), ('macd_signal', fast, slow, signal)],
+                  lambda macd, macd_signal, *_: macd - macd_signal),
+    'vwap': (lambda: [('close',), ('volume',)], lambda close, volume: _vwap(close, volume)),
+}
+
+# 지표 윈도우 기본값 (calculate_technical_indicators의 windows 인자로 일부만 바꿀 수 있습니다)
+DEFAULT_INDICATOR_WINDOWS = {
+    'sma': (5, 20),
+    'bollinger': (20, 2),  # (윈도우, 표준편차 배수)
+    'rsi': 14,
+    'macd': (12, 26, 9),  # (빠른 EMA, 느린 EMA, 시그널)
+}
+
+# (종목, 데이터 버전, 노드) -> 계산된 지표. 같은 데이터로 다른 윈도우를 요청하면 바뀐 노드만 새로 계산합니다.
+_indicator_cache = get_cache_namespace("technical_analysis.indicators", ttl=config.INDICATOR_CACHE_SECONDS,
+                                       max_entries=config.INDICATOR_CACHE_MAX_ENTRIES)
+
+
+def indicator_columns(windows: Optional[Dict[str, Any]] = None) -> Dict[str, tuple]:
+    """출력 컬럼명 -> 지표 노드 키. 기본 윈도우일 때 컬럼 구성과 순서는 streaming_indicators.INDICATOR_COLUMNS와 같습니다."""
+    windows = {**DEFAULT_INDICATOR_WINDOWS, **(windows or {})}
+    bb_window, bb_k = windows['bollinger']
+    fast, slow, signal = windows['macd']
+    columns = {f'SMA_{window}': ('sma', window) for window in windows['sma']}
+    columns.update({
+        'Upper': ('bb_upper', bb_window, bb_k),
+        'Lower': ('bb_lower', bb_window, bb_k),
+        'RSI': ('rsi', windows['rsi']),
+        f'EMA_{fast}': ('ema', fast),
+        f'EMA_{slow}': ('ema', slow),
+        'MACD': ('macd', fast, slow),
+        'MACD_signal': ('macd_signal', fast, slow, signal),
+        'MACD_hist': ('macd_hist', fast, slow, signal),
+        'VWAP': ('vwap',),
+    })
+    return columns
+
+
+def data_version(price_df: pd.DataFrame) -> tuple:
+    """가격 데이터 버전: 행 수, 첫/마지막 날짜, 종가/거래량 해시. (과거 봉이 수정되면 버전이 바뀝니다)"""
+    dates = (price_df['Date'] if 'Date' in price_df.columns else price_df.index).to_numpy()
+    hashes = tuple(int(pd.util.hash_pandas_object(price_df[column], index=False).sum())
+                   for column in INPUT_NODES.values() if column in price_df.columns)
+    return (len(price_df), str(dates[0]) if len(price_df) else None, str(dates[-1]) if len(price_df) else None, hashes)
+
+
+class IndicatorGraph:
+    """
+    입력(종가/거래량)에서 요청한 지표 노드와 그 의존 노드만, 노드마다 한 번씩 계산합니다.
+    memo_key(예: (종목, 데이터 버전))를 주면 계산한 노드를 프로세스 공용 캐시에 두고 다음 호출에서 재사용합니다.
+    """
+
+    def __init__(self, close, volume=None, memo_key=None):
+        self._values = {('close',): close}
+        if volume is not None:
+            self._values[('volume',)] = volume
+        self.memo_key = memo_key
+        self.computed = []  # 이번 그래프에서 실제로 계산한 노드 (캐시 적중 제외)
+
+    def get(self, key: tuple):
+        value = self._values.get(key)
+        if value is not None:
+            return value
+        kind, *params = key
+        if kind in INPUT_NODES:
+            raise KeyError(f"입력 데이터에 {INPUT_NODES[kind]} 컬럼이 없습니다.")
+        if self.memo_key is not None:
+            value = _indicator_cache.get((self.memo_key, key), None)
+        if value is None:
+            dependencies, compute = INDICATOR_NODES[kind]
+            value = compute(*(self.get(dependency) for dependency in dependencies(*params)), *params)
+            self.computed.append(key)
+            if self.memo_key is not None:
+                _indicator_cache.set((self.memo_key, key), value)
+        self._values[key] = value
+        return value
+
+
+def _requested_columns(columns: Optional[Iterable[str]], windows: Optional[Dict[str, Any]],
+                       has_volume: bool) -> Dict[str, tuple]:
+    specs = indicator_columns(windows)
+    if columns is None:
+        requested = specs
+    else:
+        unknown = [column for column in columns if column not in specs]
+        if unknown:
+            raise ValueError(f"알 수 없는 지표 컬럼: {unknown} (사용 가능: {list(specs)})")
+        requested = {column: specs[column] for column in columns}
+    if not has_volume:
+        requested.pop('VWAP', None)
+    return requested
+
+
+def get_indicator_cache_stats() -> dict:
+    return _indicator_cache.stats()
+
+
+def calculate_technical_indicators(price_df: pd.DataFrame, columns: Optional[Iterable[str]] = None,
+                                   windows: Optional[Dict[str, Any]] = None,
+                                   symbol: Optional[str] = None) -> Tuple[pd.DataFrame, Dict[str, float]]:
+    """
+    기술적 지표와 피보나치 레벨을 계산하여 반환합니다.
+    columns를 주면 그 지표(와 의존 노드)만 계산하고, windows로 기본 윈도우(DEFAULT_INDICATOR_WINDOWS)를 바꿀 수 있습니다.
+    symbol을 주면 (종목, 데이터 버전, 노드) 단위로 중간 결과를 메모이즈합니다.
+    """
     logger.info("Calculating comprehensive technical indicators...")
     
     if price_df.empty or 'Close' not in price_df.columns:
         return price_df, {}
     
     df = price_df.copy()
+    requested = _requested_columns(columns, windows, 'Volume' in df.columns)
+    graph = IndicatorGraph(df['Close'], df['Volume'] if 'Volume' in df.columns else None,
+                           memo_key=(symbol, data_version(df)) if symbol is not None else None)
+    for column, key in requested.items():
+        # 캐시된 Series는 다른 호출과 공유되므로 값만 복사해 넣습니다.
+        df[column] = graph.get(key).to_numpy()
 
-    # 이동평균선
-    df['SMA_5'] = df['Close'].rolling(window=5).mean()
-    df['SMA_20'] = df['Close'].rolling(window=20).mean()
-    
-    # 볼린저 밴드
-    df['Upper'] = df['SMA_20'] + (df['Close'].rolling(window=20).std() * 2)
-    df['Lower'] = df['SMA_20'] - (df['Close'].rolling(window=20).std() * 2)
-    
-    # RSI
-    delta = df['Close'].diff()
-    gain = delta.where(delta > 0, 0)
-    loss = -delta.where(delta < 0, 0)
-    avg_gain = gain.rolling(window=14).mean()
-    avg_loss = loss.rolling(window=14).mean()
-    rs = avg_gain / avg_loss
-    df['RSI'] = 100 - (100 / (1 + rs))
-    
-    # MACD
-    df['EMA_12'] = df['Close'].ewm(span=12, adjust=False).mean()
-    df['EMA_26'] = df['Close'].ewm(span=26, adjust=False).mean()
-    df['MACD'] = df['EMA_12'] - df['EMA_26']
-    df['MACD_signal'] = df['MACD'].ewm(span=9, adjust=False).mean()
-    df['MACD_hist'] = df['MACD'] - df['MACD_signal']
-    
-    # VWAP (Volume Weighted Average Price)
-    if 'Volume' in df.columns:
-        vwap_numerator = (df['Close'] * df['Volume']).cumsum()
-        vwap_denominator = df['Volume'].cumsum()
-        df['VWAP'] = vwap_numerator / vwap_denominator
-    
     # 피보나치 레벨 계산
     fib_levels = calculate_fibonacci_retracement(df)
 
-    logger.info("Comprehensive technical indicators calculated successfully.")
-    return df, fib_levels
\ No newline at end of file
+    logger.info(f"Technical indicators calculated: {len(requested)} columns, {len(graph.computed)} nodes computed.")
+    return df, fib_levels
+
+
+def build_price_matrix(price_frames: Dict[str, pd.DataFrame], field: str = 'Close') -> pd.DataFrame:
+    """종목별 가격 DataFrame(Date 컬럼 포함)을 (날짜 × 종목) 행렬로 합칩니다."""
+    columns = {
+        symbol: frame.set_index('Date')[field]
+        for symbol, frame in price_frames.items()
+        if not frame.empty and field in frame.columns
+    }
+    if not columns:
+        return pd.DataFrame()
+    return pd.DataFrame(columns).sort_index()
+
+
+def calculate_batch_indicators(close, volume=None, columns: Optional[Iterable[str]] = None,
+                               windows: Optional[Dict[str, Any]] = None) -> Dict[str, pd.DataFrame]:
+    """
+    (날짜 × 종목) 종가/거래량 행렬 전체에 대해 SMA, 볼린저 밴드, RSI, MACD, VWAP을 한 번에 계산합니다.
+    결과는 지표명 -> (날짜 × 종목) DataFrame 딕셔너리이며, 각 열은 calculate_technical_indicators와 같은 값입니다.
+    (종목별 상장 전 구간은 NaN으로 두면 됩니다. 중간에 빠진 봉이 있으면 단일 종목 계산과 달라질 수 있습니다.)
+    columns/windows는 calculate_technical_indicators와 같습니다.
+    """
+    if isinstance(close, np.ndarray):
+        close = pd.DataFrame(close)
+    if isinstance(volume, np.ndarray):
+        volume = pd.DataFrame(volume, index=close.index, columns=close.columns)
+    close = close.astype(float)
+    if volume is not None:
+        volume = volume.reindex(index=close.index, columns=close.columns)
+
+    graph = IndicatorGraph(close, volume)
+    result = {column: graph.get(key) for column, key in _requested_columns(columns, windows, volume is not None).items()}
+
+    logger.info(f"Batch technical indicators calculated for {close.shape[1]} symbols x {close.shape[0]} bars.")
+    return result
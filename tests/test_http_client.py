@@ -0,0 +1,242 @@
+"""http_client를 로컬 스텁 DART 서버(http.server.ThreadingHTTPServer)에 붙여 검증합니다."""
+import gzip
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+import config
+import http_client
+from http_client import DartQuotaExceeded, HttpClient
+
+
+class StubDartServer:
+    """경로별로 미리 정한 응답을 순서대로 돌려주는 스텁 서버. 각 응답은 (상태코드, 본문, 옵션) 튜플입니다."""
+
+    def __init__(self):
+        self.scripts = {}
+        self.requests = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                path = parsed.path.rsplit('/', 1)[-1]
+                with stub._lock:
+                    stub.requests.append((path, parse_qs(parsed.query), dict(self.headers), time.monotonic()))
+                    script = stub.scripts.get(path, [])
+                    status, body, options = script.pop(0) if len(script) > 1 else (script[0] if script else (404, b"", {}))
+                if options.get('delay'):
+                    time.sleep(options['delay'])
+                if options.get('gzip'):
+                    body = gzip.compress(body)
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json; charset=utf-8")
+                    if options.get('gzip'):
+                        self.send_header("Content-Encoding", "gzip")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # 클라이언트가 타임아웃으로 먼저 끊은 경우
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/api/"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def script(self, path, *responses):
+        """path에 대한 응답 순서를 정합니다. 마지막 응답은 이후 요청에도 계속 사용됩니다."""
+        self.scripts[path] = [(r[0], r[1], r[2] if len(r) > 2 else {}) for r in responses]
+
+    def calls(self, path):
+        return [request for request in self.requests if request[0] == path]
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+OK_BODY = json.dumps({"status": "000", "message": "정상", "list": [{"account_nm": "자산총계"}]}).encode()
+
+
+@pytest.fixture
+def stub():
+    with StubDartServer() as server:
+        yield server
+
+
+def make_client(stub, **kwargs):
+    options = dict(pool_size=2, max_retries=3, backoff_base=0.01, backoff_max=0.05, base_url=stub.base_url)
+    options.update(kwargs)
+    return HttpClient("DART-test", **options)
+
+
+def test_retries_5xx_with_backoff_then_succeeds(stub):
+    stub.script("fnlttSinglAcntAll.json", (503, b"busy"), (500, b"error"), (200, OK_BODY))
+    client = make_client(stub)
+
+    response = client.get("fnlttSinglAcntAll.json", params={"corp_code": "00126380"})
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "000"
+    assert len(stub.calls("fnlttSinglAcntAll.json")) == 3
+    metrics = client.metrics()
+    assert metrics['requests'] == 3
+    assert metrics['retries'] == 2
+    assert metrics['errors'] == 0
+
+
+def test_returns_last_5xx_response_when_retries_run_out(stub):
+    stub.script("fnlttSinglAcntAll.json", (502, b"bad gateway"))
+    client = make_client(stub, max_retries=2)
+
+    response = client.get("fnlttSinglAcntAll.json")
+
+    # 마지막 시도의 응답은 그대로 돌려주고, 상태코드 검사는 호출자에게 맡깁니다.
+    assert response.status_code == 502
+    assert len(stub.calls("fnlttSinglAcntAll.json")) == 3
+    assert client.metrics()['retries'] == 2
+
+
+def test_non_retryable_status_is_returned_immediately(stub):
+    stub.script("corpCode.xml", (304, b""))
+    client = make_client(stub)
+
+    assert client.get("corpCode.xml").status_code == 304
+    assert len(stub.calls("corpCode.xml")) == 1
+    assert client.metrics()['retries'] == 0
+
+
+def test_backoff_is_jittered_and_capped():
+    client = HttpClient("DART-test", backoff_base=0.5, backoff_max=2.0)
+
+    for attempt in range(6):
+        delays = [client._backoff(attempt) for _ in range(200)]
+        cap = min(2.0, 0.5 * 2 ** attempt)
+        assert all(0 <= delay <= cap for delay in delays)
+        assert len(set(delays)) > 1  # 지터: 같은 시도 횟수라도 대기 시간이 다릅니다.
+
+
+def test_timeout_is_retried_then_raised(stub):
+    stub.script("fnlttSinglAcntAll.json", (200, OK_BODY, {'delay': 0.5}))
+    client = make_client(stub, max_retries=1)
+
+    with pytest.raises(requests.exceptions.Timeout):
+        client.get("fnlttSinglAcntAll.json", timeout=0.1)
+
+    metrics = client.metrics()
+    assert metrics['requests'] == 2
+    assert metrics['errors'] == 2
+    assert metrics['retries'] == 1
+
+
+def test_timeout_then_success(stub):
+    stub.script("fnlttSinglAcntAll.json", (200, OK_BODY, {'delay': 0.5}), (200, OK_BODY))
+    client = make_client(stub)
+
+    response = client.get("fnlttSinglAcntAll.json", timeout=0.2)
+
+    assert response.status_code == 200
+    metrics = client.metrics()
+    assert metrics['errors'] == 1
+    assert metrics['retries'] == 1
+
+
+def test_gzip_response_is_decoded(stub):
+    stub.script("fnlttSinglAcntAll.json", (200, OK_BODY, {'gzip': True}))
+    client = make_client(stub)
+
+    response = client.get("fnlttSinglAcntAll.json")
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.json()["list"][0]["account_nm"] == "자산총계"
+    assert "gzip" in stub.calls("fnlttSinglAcntAll.json")[0][2].get("Accept-Encoding", "")
+
+
+def test_per_second_throttling(stub):
+    stub.script("fnlttSinglAcntAll.json", (200, OK_BODY))
+    client = make_client(stub, rate_per_second=10)
+    client.rate_limiter = http_client.TokenBucket(10, capacity=1)
+
+    started = time.monotonic()
+    for _ in range(6):
+        client.get("fnlttSinglAcntAll.json")
+    elapsed = time.monotonic() - started
+
+    # 용량 1, 초당 10개: 첫 호출 뒤 5번은 각각 약 0.1초씩 기다려야 합니다.
+    assert elapsed >= 0.45
+    arrivals = [request[3] for request in stub.calls("fnlttSinglAcntAll.json")]
+    assert min(b - a for a, b in zip(arrivals, arrivals[1:])) >= 0.08
+    assert client.metrics()['throttle_wait_seconds'] >= 0.4
+
+
+def test_daily_budget_exhaustion_raises_quota_exceeded(stub):
+    stub.script("fnlttSinglAcntAll.json", (200, OK_BODY))
+    client = make_client(stub, daily_limit=2)
+
+    client.get("fnlttSinglAcntAll.json")
+    client.get("fnlttSinglAcntAll.json")
+    with pytest.raises(DartQuotaExceeded):
+        client.get("fnlttSinglAcntAll.json")
+
+    # 한도를 넘긴 요청은 서버로 보내지 않습니다.
+    assert len(stub.calls("fnlttSinglAcntAll.json")) == 2
+    metrics = client.metrics()
+    assert metrics['quota_rejections'] == 1
+    assert metrics['quota_remaining_today'] == 0
+    # 기존 RequestException 처리 경로로 잡힙니다.
+    assert issubclass(DartQuotaExceeded, requests.exceptions.RequestException)
+
+
+def test_retries_consume_daily_budget(stub):
+    stub.script("fnlttSinglAcntAll.json", (503, b"busy"))
+    client = make_client(stub, daily_limit=2, max_retries=3)
+
+    with pytest.raises(DartQuotaExceeded):
+        client.get("fnlttSinglAcntAll.json")
+
+    assert len(stub.calls("fnlttSinglAcntAll.json")) == 2
+    assert client.metrics()['quota_rejections'] == 1
+
+
+def test_metrics_latency_counters(stub):
+    stub.script("fnlttSinglAcntAll.json", (200, OK_BODY, {'delay': 0.05}))
+    client = make_client(stub)
+
+    for _ in range(3):
+        client.get("fnlttSinglAcntAll.json")
+
+    metrics = client.metrics()
+    assert metrics['requests'] == 3
+    assert metrics['errors'] == 0
+    assert metrics['latency_max_seconds'] >= 0.05
+    assert metrics['latency_total_seconds'] >= 0.15
+    assert metrics['latency_avg_seconds'] == pytest.approx(metrics['latency_total_seconds'] / 3)
+    assert metrics['quota_remaining_today'] is None
+
+
+def test_dart_get_adds_api_key_and_uses_base_url(stub, monkeypatch):
+    stub.script("fnlttSinglAcntAll.json", (200, OK_BODY))
+    client = make_client(stub)
+    monkeypatch.setattr(http_client, "dart_client", client)
+    monkeypatch.setattr(config, "DART_API_KEY", "test-key")
+
+    response = http_client.dart_get("fnlttSinglAcntAll.json", params={"bsns_year": "2024"})
+
+    assert response.status_code == 200
+    _, query, _, _ = stub.calls("fnlttSinglAcntAll.json")[0]
+    assert query == {"crtfc_key": ["test-key"], "bsns_year": ["2024"]}
@@ -1,6 +1,11 @@
 import logging
+import sys
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
+from typing import Any, Dict, Optional, Tuple
 
 # 기본 로깅 설정
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -8,35 +13,275 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 def get_logger(name):
     return logging.getLogger(name)
 
-# 간단한 캐시 데코레이터 (메모리 기반)
-_cache = {}
-_cache_expiry = {}
+# --- 메모리 캐시 엔진 ---
+# 함수별 네임스페이스로 분리되며, 항목 수/바이트 상한을 넘으면 LRU 순으로 제거합니다.
+DEFAULT_CACHE_MAX_ENTRIES = 256
+DEFAULT_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 64MB
+CACHE_PURGE_INTERVAL_SECONDS = 60
+CACHE_REFRESH_WORKERS = 4
 
-def timed_cache(seconds):
+_MISSING = object()
+
+# lookup() 결과 상태
+CACHE_FRESH = 'fresh'
+CACHE_STALE = 'stale'
+CACHE_MISS = 'miss'
+
+# 만료된 항목의 백그라운드 재검증(stale-while-revalidate)에 쓰는 공용 스레드 풀
+_refresh_executor = ThreadPoolExecutor(max_workers=CACHE_REFRESH_WORKERS, thread_name_prefix="cache-refresh")
+
+
+def _estimate_size(value: Any) -> int:
+    """캐시 항목의 대략적인 메모리 크기(바이트)를 추정합니다. DataFrame은 deep 메모리 사용량을 사용합니다."""
+    if hasattr(value, 'memory_usage'):
+        try:
+            usage = value.memory_usage(deep=True)
+            return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+        except Exception:
+            pass
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(_estimate_size(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_estimate_size(k) + _estimate_size(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+class _InFlight:
+    """진행 중인 로드 하나를 나타내며, 같은 키의 동시 요청자들이 결과를 공유합니다."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class CacheNamespace:
+    """TTL과 LRU 상한을 가진 스레드 안전 캐시 영역"""
+
+    def __init__(self, name: str, ttl: float, max_entries: int = DEFAULT_CACHE_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_CACHE_MAX_BYTES, stale_ttl: float = 0):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (value, expires_at, stale_until, size)
+        self._data: "OrderedDict[Any, Tuple[Any, float, float, int]]" = OrderedDict()
+        self._inflight: Dict[Any, _InFlight] = {}
+        self._lock = threading.RLock()
+        self._bytes = 0
+        self._last_purge = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_hits = 0
+        self.coalesced = 0
+
+    def lookup(self, key) -> Tuple[Any, str]:
+        """(값, 상태)를 반환합니다. 상태는 CACHE_FRESH, CACHE_STALE(재검증 허용 구간), CACHE_MISS 중 하나입니다."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at, stale_until, _ = entry
+                if now < expires_at:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value, CACHE_FRESH
+                if now < stale_until:
+                    self._data.move_to_end(key)
+                    self.stale_hits += 1
+                    return value, CACHE_STALE
+                self._remove(key)
+                self.expirations += 1
+            self.misses += 1
+            return None, CACHE_MISS
+
+    def get(self, key, default=_MISSING):
+        """만료되지 않은 값을 반환합니다. 없으면 default를 반환합니다."""
+        value, state = self.lookup(key)
+        return value if state == CACHE_FRESH else default
+
+    def set(self, key, value):
+        now = time.monotonic()
+        size = _estimate_size(value)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, now + self.ttl, now + self.ttl + self.stale_ttl, size)
+            self._bytes += size
+            if now - self._last_purge > min(self.ttl, CACHE_PURGE_INTERVAL_SECONDS):
+                self._purge_expired(now)
+            self._evict()
+
+    def load(self, key, loader, cache_if=None):
+        """
+        단일 비행(single-flight) 로드: 같은 키에 대해 동시에 들어온 요청은 하나의 loader 호출 결과를 공유합니다.
+        cache_if가 주어지면 그 조건을 만족하는 결과만 저장합니다.
+        """
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = _InFlight()
+                self._inflight[key] = call
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = loader()
+            if cache_if is None or cache_if(call.result):
+                self.set(key, call.result)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.event.set()
+
+    def refresh_async(self, key, loader, cache_if=None):
+        """만료된 항목을 백그라운드에서 다시 로드합니다. 이미 로드 중인 키는 건너뜁니다."""
+        with self._lock:
+            if key in self._inflight:
+                return
+
+        def _refresh():
+            with self._lock:
+                entry = self._data.get(key)
+                if entry is not None and time.monotonic() < entry[1]:
+                    return  # 앞선 갱신이 이미 끝났습니다.
+            try:
+                self.load(key, loader, cache_if)
+            except Exception as e:
+                get_logger(__name__).warning(f"캐시 백그라운드 갱신 실패 ({self.name}): {e}")
+
+        _refresh_executor.submit(_refresh)
+
+    def invalidate(self, key):
+        """키 하나를 캐시에서 제거합니다. (없으면 무시)"""
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._purge_expired(time.monotonic())
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._data),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'stale_hits': self.stale_hits,
+                'coalesced': self.coalesced,
+                'inflight': len(self._inflight),
+            }
+
+    def _remove(self, key):
+        _, _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def _purge_expired(self, now: float) -> int:
+        expired = [k for k, (_, _, stale_until, _) in self._data.items() if stale_until <= now]
+        for k in expired:
+            self._remove(k)
+        self.expirations += len(expired)
+        self._last_purge = now
+        return len(expired)
+
+    def _evict(self):
+        # 가장 최근에 넣은 항목 하나는 상한을 넘더라도 유지합니다.
+        while len(self._data) > 1 and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+
+_namespaces: Dict[str, CacheNamespace] = {}
+_namespaces_lock = threading.Lock()
+
+
+def get_cache_namespace(name: str, ttl: float, max_entries: int = DEFAULT_CACHE_MAX_ENTRIES,
+                        max_bytes: int = DEFAULT_CACHE_MAX_BYTES, stale_ttl: float = 0) -> CacheNamespace:
+    """이름으로 캐시 영역을 가져오거나 새로 만듭니다."""
+    with _namespaces_lock:
+        namespace = _namespaces.get(name)
+        if namespace is None:
+            namespace = CacheNamespace(name, ttl, max_entries, max_bytes, stale_ttl)
+            _namespaces[name] = namespace
+        return namespace
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """모든 캐시 영역의 적중/미스/제거 통계를 반환합니다."""
+    with _namespaces_lock:
+        namespaces = list(_namespaces.values())
+    return {ns.name: ns.stats() for ns in namespaces}
+
+
+def clear_cache(name: Optional[str] = None):
+    """지정한 캐시 영역(없으면 전체)을 비웁니다."""
+    with _namespaces_lock:
+        targets = [_namespaces[name]] if name in _namespaces else ([] if name else list(_namespaces.values()))
+    for ns in targets:
+        ns.clear()
+
+
+def timed_cache(seconds, max_entries: int = DEFAULT_CACHE_MAX_ENTRIES, max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+                stale_seconds: float = 0, cache_if=None):
+    """
+    TTL 캐시 데코레이터. 같은 키의 동시 미스는 한 번의 호출로 합쳐집니다(single-flight).
+    stale_seconds > 0이면 만료 후 그 시간 동안은 기존 값을 즉시 반환하고 백그라운드에서 갱신합니다.
+    cache_if(result)가 False인 결과(예: 조회 실패)는 저장하지 않습니다.
+    """
     def decorator(func):
+        namespace = get_cache_namespace(f"{func.__module__}.{func.__qualname__}", seconds, max_entries, max_bytes,
+                                        stale_seconds)
+
         @wraps(func)
         def wrapper(*args, **kwargs):
             # 키 생성 시 kwargs도 고려 (순서 보장 위해 정렬)
-            key_parts = [func.__name__] + list(args) + \
-                        sorted([(k, v) for k, v in kwargs.items()])
-            key = tuple(key_parts)
-            
-            current_time = time.time()
-            
-            if key in _cache and current_time < _cache_expiry.get(key, 0):
-                logger = get_logger(__name__)
-                logger.info(f"Cache hit for {key}")
-                return _cache[key]
-            
-            result = func(*args, **kwargs)
-            _cache[key] = result
-            _cache_expiry[key] = current_time + seconds
-            logger = get_logger(__name__)
-            logger.info(f"Cache miss for {key}. Storing result.")
-            return result
+            key = tuple(args) + tuple(sorted(kwargs.items()))
+            try:
+                hash(key)
+            except TypeError:
+                # 해시할 수 없는 인자는 캐시하지 않습니다.
+                return func(*args, **kwargs)
+
+            value, state = namespace.lookup(key)
+            if state == CACHE_FRESH:
+                return value
+
+            loader = lambda: func(*args, **kwargs)
+            if state == CACHE_STALE:
+                namespace.refresh_async(key, loader, cache_if)
+                return value
+            return namespace.load(key, loader, cache_if)
+
+        wrapper.cache = namespace
+        wrapper.cache_clear = namespace.clear
+        wrapper.cache_stats = namespace.stats
         return wrapper
     return decorator
 
 # 예시: 문자열 날짜 포맷 변환 등 공통 함수
 def format_date_string(date_obj, fmt="%Y-%m-%d"):
-    return date_obj.strftime(fmt) if date_obj else None
\ No newline at end of file
+    return date_obj.strftime(fmt) if date_obj else None
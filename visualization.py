@@ -1,10 +1,45 @@
+import math
+from typing import Optional, Sequence
+
+import numpy as np
 import plotly.graph_objects as go
 import pandas as pd
-from utils import get_logger
+import config
+from interpret import CHART_INDICATOR_COLUMNS, build_signal_timeline
+from utils import get_cache_namespace, get_logger
 from plotly.subplots import make_subplots # <-- 수정된 부분: make_subplots 임포트 추가
 
 logger = get_logger(__name__)
 
+# 같은 입력(데이터 지문)으로 만든 Figure를 재사용합니다. 반환된 Figure는 여러 rerun/세션이 공유하므로 수정하지 마세요.
+_figure_cache = get_cache_namespace("visualization.figures", ttl=config.FIGURE_CACHE_SECONDS,
+                                    max_entries=config.FIGURE_CACHE_MAX_ENTRIES)
+
+
+def price_fingerprint(price_df: pd.DataFrame) -> tuple:
+    """
+    가격/지표 DataFrame의 가벼운 지문: 행 수, 첫/마지막 날짜, 컬럼 구성(지표 종류), 마지막 봉 값, 종가 해시.
+    종가 해시는 과거 봉이 수정(액면분할 보정 등)된 경우를 구분하기 위한 것입니다.
+    """
+    if price_df.empty:
+        return (0,)
+    numeric = price_df.select_dtypes('number')
+    last = tuple(None if np.isnan(v) else float(v) for v in numeric.iloc[-1].to_numpy(dtype=float))  # NaN은 키 비교가 안 되므로 None
+    close_hash = int(pd.util.hash_pandas_object(price_df['Close'], index=False).sum()) if 'Close' in price_df else 0
+    return (len(price_df), str(price_df['Date'].iloc[0]), str(price_df['Date'].iloc[-1]),
+            tuple(price_df.columns), last, close_hash)
+
+
+def _cached_figure(key, build):
+    figure = _figure_cache.get(key, None)
+    if figure is None:
+        figure = _figure_cache.load(key, build)
+    return figure
+
+
+def get_figure_cache_stats() -> dict:
+    return _figure_cache.stats()
+
 def create_empty_chart(title):
     """데이터가 없을 때 표시할 빈 차트를 생성합니다."""
     fig = go.Figure()
@@ -25,7 +60,12 @@ def create_empty_chart(title):
 def plot_financial_kpis(ratios: dict):
     """
     주요 재무 지표(ROE, 부채비율, 매출액)에 대한 개별 KPI 차트 3개를 생성합니다.
+    같은 값이면 캐시된 Figure를 반환합니다.
     """
+    key = ('kpis', ratios.get("ROE (%)", 0), ratios.get("부채비율 (%)", 0), ratios.get("매출액", 0))
+    return _cached_figure(key, lambda: _build_financial_kpis(ratios))
+
+def _build_financial_kpis(ratios: dict):
     theme = {'template': 'plotly_dark'}
     
     roe_val = ratios.get("ROE (%)", 0)
@@ -84,11 +124,119 @@ def plot_financial_kpis(ratios: dict):
 
     return roe_fig, debt_fig, sales_fig
 
-def plot_candlestick_with_indicators(price_df: pd.DataFrame, company_name: str) -> go.Figure:
-    """기술적 지표가 포함된 캔들스틱 차트를 생성합니다."""
+# 차트 폭(px) 대비 표시할 최대 봉 수. 봉 하나가 이 픽셀보다 좁아지면 기간 단위로 합칩니다.
+DEFAULT_CHART_WIDTH_PX = 1200
+PIXELS_PER_BAR = 3
+# 지표 선은 봉보다 촘촘해도 잘 보이므로 봉 수의 배수까지 점을 남깁니다.
+LINE_POINTS_PER_BAR = 2
+
+
+def target_point_count(chart_width: Optional[int] = None) -> int:
+    """차트 폭에 맞는 최대 봉 수"""
+    return max(50, int((chart_width or DEFAULT_CHART_WIDTH_PX) / PIXELS_PER_BAR))
+
+
+def downsample_ohlc(df: pd.DataFrame, max_bars: int) -> pd.DataFrame:
+    """
+    연속한 봉을 같은 크기의 기간 묶음으로 합쳐 max_bars개 이하로 줄입니다.
+    시가=첫 봉 시가, 고가=최고, 저가=최저, 종가=마지막 봉 종가, 거래량=합계이며 Date는 묶음의 첫 날짜입니다.
+    """
+    if len(df) <= max_bars:
+        return df
+    bucket = np.arange(len(df)) // math.ceil(len(df) / max_bars)
+    aggregations = {'Date': 'first', 'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last'}
+    if 'Volume' in df.columns:
+        aggregations['Volume'] = 'sum'
+    aggregations = {col: how for col, how in aggregations.items() if col in df.columns}
+    return df.groupby(bucket, sort=False).agg(aggregations).reset_index(drop=True)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: 선의 모양(고점/저점)을 유지하면서 threshold개 점의 위치(인덱스)를 고릅니다.
+    x는 단조 증가하는 숫자여야 합니다.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    # 첫/마지막 점을 제외한 구간을 threshold - 2개 버킷으로 나눕니다.
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(np.int64)
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # 다음 버킷의 평균점 (마지막 버킷은 끝점)
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        # 이전에 고른 점, 현재 후보, 다음 버킷 평균이 이루는 삼각형 넓이가 가장 큰 후보를 고릅니다.
+        area = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def downsample_line(dates: pd.Series, values: pd.Series, max_points: int):
+    """결측을 뺀 선을 LTTB로 max_points개 이하로 줄여 (날짜, 값)을 반환합니다."""
+    valid = values.notna().to_numpy()
+    dates, values = dates[valid], values[valid]
+    if len(values) <= max_points:
+        return dates, values
+    x = pd.to_datetime(dates).to_numpy(dtype='datetime64[ns]').astype(np.int64).astype(float)
+    keep = lttb_indices(x, values.to_numpy(dtype=float), max_points)
+    return dates.iloc[keep], values.iloc[keep]
+
+
+def plot_candlestick_with_indicators(price_df: pd.DataFrame, company_name: str,
+                                     chart_width: Optional[int] = None,
+                                     x_range: Optional[Sequence] = None,
+                                     max_points: Optional[int] = None,
+                                     show_signals: bool = False) -> go.Figure:
+    """
+    기술적 지표가 포함된 캔들스틱 차트를 생성합니다.
+    봉 수가 차트 폭(chart_width px)에 비해 많으면 OHLC는 기간 단위로 합치고, 지표 선은 LTTB로 줄여
+    전송량을 일정하게 유지합니다. x_range=(시작, 끝)을 주면 그 구간만 잘라 같은 점 수 예산으로 더 자세히 그립니다.
+    show_signals=True면 신호 이벤트(MACD 크로스, 볼린저 돌파/복귀, RSI 진입, VWAP 돌파)를 가격 위에 표시합니다.
+    입력 데이터 지문과 인자가 같으면 캐시된 Figure를 반환합니다.
+    """
+    key = ('candlestick', company_name, price_fingerprint(price_df), chart_width,
+           tuple(str(bound) for bound in x_range) if x_range is not None else None, max_points, show_signals)
+    return _cached_figure(key, lambda: _build_candlestick_with_indicators(
+        price_df, company_name, chart_width, x_range, max_points, show_signals))
+
+def _build_candlestick_with_indicators(price_df: pd.DataFrame, company_name: str, chart_width: Optional[int],
+                                       x_range: Optional[Sequence], max_points: Optional[int],
+                                       show_signals: bool) -> go.Figure:
     if price_df.empty:
         return create_empty_chart(f"{company_name} 주가 차트")
-        
+
+    # 이벤트는 잘라내기 전 전체 구간에서 찾아야 구간 첫 봉의 상태 전환도 놓치지 않습니다.
+    events = build_signal_timeline(price_df)[1] if show_signals else None
+
+    if x_range is not None:
+        dates = pd.to_datetime(price_df['Date'])
+        start, end = (pd.Timestamp(bound) if bound is not None else None for bound in x_range)
+        mask = pd.Series(True, index=price_df.index)
+        if start is not None:
+            mask &= dates >= start
+        if end is not None:
+            mask &= dates <= end
+        price_df = price_df[mask]
+        if price_df.empty:
+            return create_empty_chart(f"{company_name} 주가 차트")
+
+    max_bars = max_points or target_point_count(chart_width)
+    candles = downsample_ohlc(price_df, max_bars)
+    line_points = max_bars * LINE_POINTS_PER_BAR
+    if len(candles) < len(price_df):
+        logger.info(f"Chart downsampled: {len(price_df)} bars -> {len(candles)} candles, lines <= {line_points} points")
+
+    def line(column):
+        return downsample_line(price_df['Date'], price_df[column], line_points)
+
     fig = make_subplots( # <-- make_subplots 함수 사용
         rows=2, cols=1, 
         shared_xaxes=True, 
@@ -98,21 +246,38 @@ def plot_candlestick_with_indicators(price_df: pd.DataFrame, company_name: str)
     )
 
     fig.add_trace(go.Candlestick(
-        x=price_df['Date'],
-        open=price_df['Open'],
-        high=price_df['High'],
-        low=price_df['Low'],
-        close=price_df['Close'],
+        x=candles['Date'],
+        open=candles['Open'],
+        high=candles['High'],
+        low=candles['Low'],
+        close=candles['Close'],
         name='캔들스틱'
     ), row=1, col=1)
 
+    # 지표 선은 WebGL(Scattergl)로 그려 점이 많아도 브라우저 렌더링이 느려지지 않게 합니다.
     if 'SMA_5' in price_df.columns:
-        fig.add_trace(go.Scatter(x=price_df['Date'], y=price_df['SMA_5'], name='5일 이평선', line=dict(color='blue', width=1)), row=1, col=1)
+        x, y = line('SMA_5')
+        fig.add_trace(go.Scattergl(x=x, y=y, name='5일 이평선', line=dict(color='blue', width=1)), row=1, col=1)
     if 'SMA_20' in price_df.columns:
-        fig.add_trace(go.Scatter(x=price_df['Date'], y=price_df['SMA_20'], name='20일 이평선', line=dict(color='orange', width=1)), row=1, col=1)
+        x, y = line('SMA_20')
+        fig.add_trace(go.Scattergl(x=x, y=y, name='20일 이평선', line=dict(color='orange', width=1)), row=1, col=1)
     
+    if events is not None and not events.empty:
+        events = events[pd.to_datetime(events['Date']).between(pd.to_datetime(price_df['Date']).min(),
+                                                               pd.to_datetime(price_df['Date']).max())]
+        for direction, symbol, color, name in (('up', 'triangle-up', '#00CC96', '상승 신호'),
+                                               ('down', 'triangle-down', '#EF553B', '하락 신호')):
+            subset = events[events['direction'] == direction]
+            if not subset.empty:
+                fig.add_trace(go.Scattergl(
+                    x=subset['Date'], y=subset['Close'], mode='markers', name=name,
+                    marker=dict(symbol=symbol, size=9, color=color, line=dict(width=1, color='white')),
+                    text=subset['label'], hovertemplate="%{x|%Y-%m-%d} %{text}<br>종가 %{y:,.0f}<extra></extra>"
+                ), row=1, col=1)
+
     if 'RSI' in price_df.columns:
-        fig.add_trace(go.Scatter(x=price_df['Date'], y=price_df['RSI'], name='RSI', line=dict(color='purple', width=1)), row=2, col=1)
+        x, y = line('RSI')
+        fig.add_trace(go.Scattergl(x=x, y=y, name='RSI', line=dict(color='purple', width=1)), row=2, col=1)
         fig.add_hline(y=70, col=1, row=2, line_width=1, line_dash="dash", line_color="red")
         fig.add_hline(y=30, col=1, row=2, line_width=1, line_dash="dash", line_color="blue")
 
@@ -125,4 +290,4 @@ def plot_candlestick_with_indicators(price_df: pd.DataFrame, company_name: str)
     fig.update_yaxes(title_text="주가 (KRW)", row=1, col=1)
     fig.update_yaxes(title_text="RSI", row=2, col=1)
     
-    return fig
\ No newline at end of file
+    return fig